@@ -6,6 +6,8 @@ import sys
 import os
 import logging
 from pathlib import Path
+import requests
+from jsonschema import validators
 
 class JsonFormatter(logging.Formatter):
     def format(self, record):
@@ -23,6 +25,8 @@ handler = logging.StreamHandler(sys.stdout)
 handler.setFormatter(JsonFormatter())
 logging.basicConfig(level=logging.INFO, handlers=[handler], force=True)
 
+API_URL = os.getenv("PORC_API_URL", "http://localhost:8000")
+
 SCHEMA_DIR = Path(os.getenv("PINE_SCHEMA_DIR", 
     Path(__file__).parent 
     / "schemas"))
@@ -53,8 +57,48 @@ def lint(blueprint_path):
         logging.error(f"Schema not found: {schema_path}")
         raise BlueprintValidationError([f"Schema not found: {schema_path}"])
 
-    # TODO: Add JSON Schema validation here
-    logging.info(f"Blueprint schema path is valid: {schema_path}")
+    with open(schema_path) as f:
+        schema = json.load(f)
+
+    validator_cls = validators.validator_for(schema)
+    validator_cls.check_schema(schema)
+    validator = validator_cls(schema, format_checker=validator_cls.FORMAT_CHECKER)
+
+    # Report every violation at once, ordered by path, in the same format as the API
+    errors = []
+    for error in sorted(validator.iter_errors(blueprint),
+                        key=lambda e: [str(p) for p in e.absolute_path]):
+        path = "/".join(str(part) for part in error.absolute_path)
+        errors.append(f"{path or '<root>'}: {error.message}")
+    if errors:
+        logging.error("Schema validation failed:")
+        for err in errors:
+            logging.error(f"- {err}")
+        raise BlueprintValidationError(errors)
+    logging.info(f"Blueprint is valid against schema: {schema_path}")
+
+def render(blueprint_paths, timeout_seconds=None):
+    """Dry-run render blueprint files through the PORC API; nothing is stored."""
+    items = []
+    for path in blueprint_paths:
+        with open(path) as f:
+            loaded = json.load(f)
+        # A file may hold one blueprint or a list of them
+        for blueprint in loaded if isinstance(loaded, list) else [loaded]:
+            items.append({"kind": blueprint["kind"], "variables": blueprint.get("variables", {})})
+
+    response = requests.post(
+        f"{API_URL}/render:batch",
+        json={"items": items, "timeout_seconds": timeout_seconds}
+    )
+    response.raise_for_status()
+    result = response.json()
+    print(json.dumps(result, indent=2))
+    if result["failed"]:
+        logging.error(f"{result['failed']} of {len(items)} blueprints failed to render")
+        raise BlueprintValidationError([r.get("error") or "; ".join(r.get("errors", []))
+                                        for r in result["results"] if r["status"] != "rendered"])
+    logging.info(f"Rendered {result['rendered']} blueprints")
 
 def healthz():
     """Health check for the pine CLI process."""
@@ -65,11 +109,21 @@ if __name__ == "__main__":
     """Entry point for the pine CLI."""
     if len(sys.argv) > 1 and sys.argv[1] == "healthz":
         healthz()
+    if len(sys.argv) > 2 and sys.argv[1] == "render":
+        try:
+            render(sys.argv[2:])
+        except BlueprintValidationError:
+            sys.exit(1)  # already reported per blueprint
+        except requests.RequestException as e:
+            logging.error(f"Render request to {API_URL} failed: {str(e)}")
+            sys.exit(1)
+        sys.exit(0)
     if (len(sys.argv) != 3 
             or sys.argv[1] != "lint"):
         print("Usage: python pine/main.py lint <blueprint.json>")
+        print("       python pine/main.py render <blueprint.json> [<blueprint.json> ...]")
         sys.exit(1)
     try:
         lint(sys.argv[2])
-    except BlueprintValidationError as e:
+    except BlueprintValidationError:
         sys.exit(1)
\ No newline at end of file
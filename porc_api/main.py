@@ -6,21 +6,50 @@ import os
 import re
 import logging
 import sys
+import asyncio
+from contextlib import asynccontextmanager
+from starlette.concurrency import iterate_in_threadpool
 from datetime import datetime
 from fastapi import FastAPI, Request, Path, Depends, APIRouter, UploadFile, File, Form, HTTPException
-from pydantic import BaseModel
-from porc_common.config import DB_PATH, RUNS_PATH, get_tfe_api, get_tfe_org
+from pydantic import BaseModel, Field
+from porc_common.config import (
+    DB_PATH, RUNS_PATH, get_tfe_api, get_tfe_org,
+    get_tfe_notification_token, get_quill_preload,
+    get_render_batch_max_items, get_render_item_timeout_seconds, get_render_item_max_timeout_seconds,
+    get_deadline_seconds, get_run_events_max_seconds
+)
 from porc_core.render import render_blueprint
 from motor.motor_asyncio import AsyncIOMotorClient
-from porc_core.tfe_client import TFEClient
-from porc_common.errors import TFEServiceError
+from porc_core.tfe_client import (
+    AsyncTFEClient, get_tfe_client, validate_token, close_tfe_session,
+    CONFIRMABLE_RUN_STATUSES, FINAL_RUN_STATUSES, QUEUED_RUN_STATUSES
+)
+from porc_core.tfe_notifications import (
+    SIGNATURE_HEADER, FAILED_RUN_STATUSES, verify_signature, latest_run_status, next_run_state
+)
+from porc_core.run_poller import run_poller
+from porc_core.run_executor import run_executor
+from porc_core.run_events import SETTLED_RUN_STATES, run_events
+from porc_common.errors import TFEServiceError, BlueprintValidationError, BackendUnavailableError, DeadlineExceededError
+from porc_core import deadline
+from porc_core.circuit import circuits, get_circuit
+from pymongo.errors import ConnectionFailure
 from enum import Enum
-import time
 from porc_core.quill import quill_manager
-from porc_core.github_client import GitHubClient, get_github_client
-from porc_core.state import StateService, RunState, get_state_service
-from porc_core.storage import StorageService, get_storage_service
-from fastapi.responses import JSONResponse
+from porc_core.schema import schema_validator
+from porc_core.render_cache import render_cache, render_key
+from porc_core.plan_cache import plan_cache
+from porc_core.workspaces import (
+    ensure_workspace_exists, workspace_name_for, sanitize_workspace_name, workspace_ids, workspace_pool
+)
+from porc_core.batch_render import render_batch, get_render_pool, close_render_pool
+from porc_core.impact import impact_analyzer, iter_blueprints
+from porc_common import metrics
+from porc_core.github_client import GitHubClient, installation_token_manager
+from porc_core.state import StateService, RunState
+from porc_core.storage import StorageService
+from porc_core.bundle import read_bundle
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import traceback
 from typing import Optional
@@ -43,8 +72,76 @@ STORAGE_BUCKET = os.getenv("STORAGE_BUCKET", "porcbundles")
 if not STORAGE_ACCOUNT or not STORAGE_ACCESS_KEY:
     logging.warning("Storage service not configured - missing required environment variables")
 
+async def _create_backend(name: str, factory):
+    """Create a backend client off the event loop, logging instead of failing if it is not configured."""
+    try:
+        return await asyncio.to_thread(factory)
+    except Exception as e:
+        logging.warning(f"{name} backend not available: {str(e)}")
+        return None
+
+def _connect_state_service() -> StateService:
+    """Create the state service and eagerly open its table client."""
+    service = StateService()
+    service.table_client
+    return service
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create one shared, pooled client per backend at startup and close them at shutdown."""
+    app.state.storage_service = await _create_backend("Storage", StorageService)
+    app.state.state_service = await _create_backend("State", _connect_state_service)
+    app.state.github_client = await _create_backend("GitHub", GitHubClient)
+    if app.state.storage_service is not None:
+        quill_manager.storage_service = app.state.storage_service
+        schema_validator.storage_service = app.state.storage_service
+        preload = get_quill_preload()
+        if preload:
+            asyncio.get_running_loop().run_in_executor(None, quill_manager.preload, preload)
+    try:
+        # Validate the TFE token in the background so the first plan does not pay for it
+        get_tfe_client()
+    except Exception as e:
+        logging.warning(f"TFE client not available: {str(e)}")
+    if workspace_pool.size > 0:
+        try:
+            # Stable across restarts, so spares left by earlier pods are adopted rather than leaked
+            prefix = sanitize_workspace_name(f"porc-{TFE_ENV}-pool")
+            await workspace_pool.start(get_tfe_client(), prefix)
+        except Exception as e:
+            logging.warning(f"Workspace pool not started: {str(e)}")
+    resumer = None
+    if None not in (app.state.storage_service, app.state.github_client, app.state.state_service):
+        backends = (app.state.storage_service, app.state.github_client, app.state.state_service)
+        try:
+            await resume_applies(*backends)
+        except Exception as e:
+            logging.warning(f"Interrupted applies not resumed: {str(e)}")
+        # Leases still live at startup, e.g. of the pod this one replaces, expire later
+        resumer = asyncio.ensure_future(keep_resuming_applies(*backends, run_executor.lease_seconds))
+    try:
+        yield
+    finally:
+        if resumer is not None:
+            resumer.cancel()
+        # Cancelled applies keep their checkpoint and resume in the next process
+        await run_executor.close()
+        if app.state.github_client is not None:
+            await app.state.github_client.close()
+        await installation_token_manager.close()
+        if app.state.storage_service is not None:
+            app.state.storage_service.close()
+        if app.state.state_service is not None:
+            app.state.state_service.close()
+        await run_poller.close()
+        await run_events.close()
+        await close_tfe_session()
+        await impact_analyzer.close()
+        await workspace_pool.close()
+        close_render_pool()
+
 # Create FastAPI app
-app = FastAPI(title="PORC API")
+app = FastAPI(title="PORC API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -56,26 +153,42 @@ app.add_middleware(
 )
 
 # Dependencies
-def get_storage_service_dependency() -> StorageService:
-    return get_storage_service()
-
-def get_github_client_dependency() -> GitHubClient:
-    return get_github_client()
-
-def get_state_service_dependency() -> StateService:
-    return get_state_service()
-
-def sanitize_workspace_name(name: str) -> str:
-    """Convert repository name to valid workspace name."""
-    # Replace invalid characters with hyphens
-    name = re.sub(r'[^a-zA-Z0-9\-_]', '-', name)
-    # Ensure it starts with a letter or number
-    if not name[0].isalnum():
-        name = 'ws-' + name
-    return name.lower()
-
-def get_workspace_name() -> str:
-    """Generate workspace name based on environment."""
+def _get_backend(request: Request, attr: str, name: str):
+    """Look up a lifespan-managed backend client, failing with 503 if it was not configured."""
+    backend = getattr(request.app.state, attr, None)
+    if backend is None:
+        raise HTTPException(status_code=503, detail=f"{name} service not configured")
+    return backend
+
+def get_storage_service_dependency(request: Request) -> StorageService:
+    return _get_backend(request, "storage_service", "Storage")
+
+def get_github_client_dependency(request: Request) -> GitHubClient:
+    return _get_backend(request, "github_client", "GitHub")
+
+def get_state_service_dependency(request: Request) -> StateService:
+    return _get_backend(request, "state_service", "State")
+
+# Request header with the caller's time budget in seconds, overriding DEADLINE_{OPERATION}_SECONDS
+DEADLINE_HEADER = "X-PORC-Deadline"
+
+def operation_deadline(operation: str):
+    """Dependency that starts the deadline every backend call of the request is sized against."""
+    async def dependency(request: Request) -> float:
+        header = request.headers.get(DEADLINE_HEADER)
+        try:
+            seconds = float(header) if header is not None else get_deadline_seconds(operation)
+        except ValueError:
+            seconds = -1
+        if not seconds > 0:
+            raise HTTPException(status_code=400, detail=f"Invalid {DEADLINE_HEADER} header: {header}")
+        # Requests run in their own context, so the deadline ends with the request
+        deadline.start(seconds)
+        return seconds
+    return dependency
+
+def get_workspace_name(record: Optional[dict] = None) -> str:
+    """Workspace for a blueprint record under the configured WORKSPACE_STRATEGY."""
     if not get_tfe_org():
         raise ValueError("TFE_ORG environment variable is not set")
     
@@ -85,37 +198,103 @@ def get_workspace_name() -> str:
     except ValueError:
         raise ValueError(f"Invalid environment: {TFE_ENV}. Must be one of: {[e.value for e in Environment]}")
     
-    # Format: porc-env
-    return f"porc-{env.value}"
+    return workspace_name_for(record, env.value)
 
-def ensure_workspace_exists(tfe: TFEClient, workspace_name: str) -> str:
-    """Ensure workspace exists, create if it doesn't."""
+async def confirm_planned_run(tfe: AsyncTFEClient, plan_id: str, run_id: str) -> bool:
+    """Confirm a planned TFE run; return False if it is stale, discarded or otherwise not confirmable."""
+    if (await tfe.get_run(plan_id))["status"] in QUEUED_RUN_STATUSES:
+        # Still queued behind another run: waiting could take until the deadline, so plan afresh
+        logging.info(f"Planned run {plan_id} is still queued, discarding it")
+        await tfe.discard_run(plan_id, comment=f"Stale plan replaced by PORC run {run_id}")
+        return False
+    status = await tfe.wait_for_run(plan_id, targets=CONFIRMABLE_RUN_STATUSES + FINAL_RUN_STATUSES)
+    run = await tfe.get_run(plan_id)
+    if not run.get("actions", {}).get("is-confirmable"):
+        logging.info(f"Planned run {plan_id} is {status} and cannot be confirmed")
+        return False
     try:
-        logging.info(f"Checking if workspace {workspace_name} exists")
-        workspace_id = tfe.get_workspace_id(workspace_name)
-        logging.info(f"Found existing workspace {workspace_name} with ID {workspace_id}")
-        return workspace_id
+        await tfe.apply_run(plan_id, comment=f"Applied by PORC run {run_id}")
     except TFEServiceError as e:
-        if "not found" in str(e).lower():
-            logging.info(f"Creating workspace: {workspace_name}")
-            workspace_id = tfe.create_workspace(
-                name=workspace_name,
-                org=get_tfe_org(),
-                auto_apply=True,  # Auto-apply for dev environment
-                execution_mode="remote"
-            )
-            logging.info(f"Created new workspace {workspace_name} with ID {workspace_id}")
-            return workspace_id
-        logging.error(f"Failed to get/create workspace {workspace_name}: {str(e)}")
+        if e.status_code == 409:
+            logging.info(f"Planned run {plan_id} is no longer confirmable: {str(e)}")
+            return False
         raise
+    logging.info(f"Confirmed planned run {plan_id}")
+    return True
+
+async def start_apply(tfe: AsyncTFEClient, workspace_id: str, run_id: str, plan_id: Optional[str],
+                      bundle_key: str, storage_service: StorageService) -> str:
+    """Start applying a run and return the TFE run ID that will perform the apply."""
+    if plan_id and await confirm_planned_run(tfe, plan_id, run_id):
+        return plan_id
+    
+    logging.info(f"Starting a fresh apply run for {run_id}")
+    config_version_id, upload_url = await tfe.create_config_version(workspace_id)
+    await tfe.upload_from_url(upload_url, storage_service.get_bundle_url(bundle_key))
+    await tfe.wait_for_configuration(config_version_id)
+    return await tfe.create_run(workspace_id, config_version_id, message=f"PORC run {run_id}")
+
+def blueprint_identity(record: dict) -> str:
+    """Identity of a blueprint across runs: source repository, kind and name."""
+    blueprint = record.get("blueprint", {})
+    return f"{record.get('source_repo')}/{blueprint.get('kind')}/{blueprint.get('name') or blueprint.get('kind')}"
+
+def record_applied_bundle(state_service: StateService, run_id: str, workspace: Optional[str]) -> None:
+    """Remember the bundle a successful apply left the workspace at, for skipping unchanged plans."""
+    try:
+        with open(f"{DB_PATH}/{run_id}.json") as f:
+            record = json.load(f)
+        if record.get("bundle_digest") and workspace:
+            state_service.record_applied_bundle(workspace, record["bundle_digest"], run_id, blueprint_identity(record))
+    except Exception as e:
+        logging.warning(f"Failed to record applied bundle for run {run_id}: {str(e)}")
+
+async def find_unchanged_apply(state_service: StateService, bundle_digest: Optional[str],
+                               workspace_name: str) -> Optional[dict]:
+    """Return the last apply to the workspace if it left the workspace at the same bundle.
+
+    Keyed by workspace rather than blueprint: when blueprints share a workspace, an
+    apply of another blueprint in between changes its configuration.
+    """
+    if not bundle_digest:
+        return None
+    try:
+        applied = await state_service.get_applied_bundle(workspace_name)
+    except Exception as e:
+        logging.warning(f"Failed to look up last applied bundle: {str(e)}")
+        return None
+    if applied and applied["bundle_digest"] == bundle_digest:
+        return applied
+    return None
+
+async def find_cached_plan(tfe: AsyncTFEClient, bundle_digest: str, workspace_id: str, serial: int) -> Optional[dict]:
+    """Return a still usable plan of this bundle against the workspace state serial, with its summary."""
+    cached = plan_cache.get(bundle_digest, workspace_id, serial)
+    if cached is None:
+        return None
+    summary = await tfe.get_plan_summary(cached["plan_id"])
+    if summary["run_status"] in FAILED_RUN_STATUSES or summary["plan_status"] in ["errored", "canceled", "unreachable"]:
+        logging.info(f"Cached plan {cached['plan_id']} is {summary['run_status']}, planning again")
+        plan_cache.discard(bundle_digest, workspace_id, serial)
+        return None
+    return {**cached, "summary": summary}
 
 # MongoDB setup
 MONGO_URI = os.getenv("MONGO_URI")
 mongo_client = AsyncIOMotorClient(MONGO_URI) if MONGO_URI else None
 mongo_db = mongo_client.get_default_database() if mongo_client else None
+mongo_circuit = get_circuit("mongo", lambda e: isinstance(e, ConnectionFailure))
 
 TRUNCATE_OUTPUT = 2000
 
+# QUILL version that builds render and validate against; a blueprint's schema_version is informational
+RENDER_VERSION = "latest"
+
+# Seconds between keepalive comments on an idle event stream
+EVENTS_KEEPALIVE_SECONDS = 15
+
+SAFE_TFE_RUN_ID_RE = re.compile(r"^run-[A-Za-z0-9]+$")
+
 class JsonFormatter(logging.Formatter):
     def format(self, record):
         log_record = {
@@ -144,11 +323,102 @@ def sanitize_run_id(run_id: str):
 
 class BlueprintSubmission(BaseModel):
     kind: str
+    name: str | None = None  # Distinguishes blueprints of the same kind in one repository
     variables: dict = {}
     schema_version: str | None = None
     external_reference: str  # e.g. GitHub PR reference
     source_repo: str  # The GitHub repository where the blueprint was submitted from
 
+class RenderItem(BaseModel):
+    kind: str
+    variables: dict = {}
+    version: str = "latest"
+
+# Every timed out item restarts the shared render pool, so items get at least this long
+MIN_RENDER_ITEM_TIMEOUT_SECONDS = 1
+
+class RenderBatchRequest(BaseModel):
+    items: list[RenderItem]
+    timeout_seconds: float | None = Field(default=None, ge=MIN_RENDER_ITEM_TIMEOUT_SECONDS)  # per item
+
+@app.post("/render:batch")
+async def render_blueprints(payload: RenderBatchRequest):
+    """Dry-run render many blueprints in the render pool; nothing is stored."""
+    max_items = get_render_batch_max_items()
+    if len(payload.items) > max_items:
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"Too many items: {len(payload.items)} (max {max_items})"}
+        )
+    results = await render_batch(
+        [item.model_dump() for item in payload.items],
+        get_render_pool(),
+        quill_manager,
+        schema_validator,
+        timeout=min(payload.timeout_seconds or get_render_item_timeout_seconds(),
+                    get_render_item_max_timeout_seconds())
+    )
+    rendered = sum(1 for r in results if r["status"] == "rendered")
+    logging.info(f"Batch rendered {rendered}/{len(results)} blueprints")
+    return {"rendered": rendered, "failed": len(results) - rendered, "results": results}
+
+def validation_error_response(error: BlueprintValidationError) -> JSONResponse:
+    """422 response listing every schema violation at once."""
+    return JSONResponse(
+        status_code=422,
+        content={"error": "Blueprint variables failed validation", "details": error.errors}
+    )
+
+def backend_unavailable_response(error: BackendUnavailableError, state_service: Optional[StateService] = None,
+                                 run_id: Optional[str] = None, state: Optional[RunState] = None) -> JSONResponse:
+    """503 for a backend whose circuit is open, optionally moving the run back to a state it can be retried from."""
+    if state_service is not None and state is not None:
+        try:
+            state_service.update_state(run_id, state)
+        except Exception as e:
+            logging.warning(f"Could not restore run {run_id} to {state.value}: {str(e)}")
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(error), "backend": error.backend},
+        headers={"Retry-After": str(max(1, round(error.retry_after)))}
+    )
+
+def deadline_exceeded_response(error: DeadlineExceededError, state_service: Optional[StateService] = None,
+                               run_id: Optional[str] = None, state: Optional[RunState] = None,
+                               metadata: Optional[dict] = None,
+                               tfe_run_id: Optional[str] = None) -> JSONResponse:
+    """504 for an operation out of time, recording the deadline on the run in the state it is left in."""
+    if state_service is not None and state is not None:
+        # The cleanup itself must not be cut short by the spent deadline
+        with deadline.scope(None):
+            try:
+                state_service.update_state(
+                    run_id,
+                    state,
+                    metadata={
+                        **(metadata or {}),
+                        "error": str(error),
+                        "error_type": "deadline_exceeded",
+                        "deadline_seconds": error.budget,
+                        "deadline_at": error.deadline_at
+                    },
+                    tfe_run_id=tfe_run_id
+                )
+            except Exception as e:
+                logging.warning(f"Could not record exceeded deadline on run {run_id}: {str(e)}")
+    return JSONResponse(
+        status_code=504,
+        content={"error": str(error), "deadline_seconds": error.budget, "deadline_at": error.deadline_at}
+    )
+
+@app.exception_handler(BackendUnavailableError)
+async def backend_unavailable_handler(request: Request, exc: BackendUnavailableError):
+    return backend_unavailable_response(exc)
+
+@app.exception_handler(DeadlineExceededError)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceededError):
+    return deadline_exceeded_response(exc)
+
 @app.get("/")
 async def root():
     return {"status": "alive"}
@@ -162,10 +432,50 @@ async def health():
     logging.info(f"Health check response: {response.body}")
     return response
 
+@app.get("/ready")
+async def ready(request: Request):
+    """Readiness probe: backends are configured and the TFE token has been validated."""
+    backends = {
+        name: getattr(request.app.state, attr, None) is not None
+        for name, attr in [("storage", "storage_service"), ("state", "state_service"), ("github", "github_client")]
+    }
+    try:
+        tfe = await asyncio.wait_for(validate_token(get_tfe_client()), timeout=10)
+    except Exception as e:
+        tfe = {"valid": False, "error": str(e)}
+    ready = all(backends.values()) and tfe["valid"]
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "backends": backends, "tfe_token": tfe}
+    )
+
+@app.get("/metrics")
+async def get_metrics():
+    """In-process counters and gauges (caches, pollers, rate limits)."""
+    return metrics.snapshot()
+
+@app.get("/admin/circuits")
+async def get_circuits():
+    """State of the circuit breaker of every external backend."""
+    return {"circuits": [circuit.to_dict() for circuit in circuits()]}
+
+@app.post("/admin/circuits/{name}/reset")
+async def reset_circuit(name: str):
+    """Close a backend's circuit breaker, e.g. after the backend was repaired."""
+    try:
+        circuit = get_circuit(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown circuit: {name}")
+    circuit.reset()
+    logging.info(f"Circuit {name} reset")
+    return circuit.to_dict()
+
 @app.post("/blueprint")
 async def submit_blueprint(payload: BlueprintSubmission):
     """Submit a new blueprint and create a run record. Stores in MongoDB if configured."""
     try:
+        # Reject variables that do not match the QUILL schema before a run exists
+        await asyncio.to_thread(schema_validator.validate, payload.kind, payload.variables, RENDER_VERSION)
         run_id = f"porc-{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')[:-3]}"
         record = {
             "run_id": run_id,
@@ -177,7 +487,7 @@ async def submit_blueprint(payload: BlueprintSubmission):
         }
         # Store in MongoDB if available
         if mongo_db is not None:
-            result = await mongo_db.blueprints.insert_one(record)
+            result = await mongo_circuit.call_async(mongo_db.blueprints.insert_one, record)
             # Convert ObjectId to string for JSON serialization
             record["_id"] = str(result.inserted_id)
             logging.info(f"Blueprint stored in MongoDB: {run_id}")
@@ -190,6 +500,11 @@ async def submit_blueprint(payload: BlueprintSubmission):
         os.replace(tmp_file, meta_file)
         logging.info(f"Blueprint submitted: {run_id}")
         return {"run_id": run_id, "status": "submitted"}
+    except BlueprintValidationError as e:
+        logging.info(f"Blueprint rejected: {str(e)}")
+        return validation_error_response(e)
+    except BackendUnavailableError as e:
+        return backend_unavailable_response(e)
     except Exception as e:
         logging.error(f"Error submitting blueprint: {str(e)}", exc_info=True)
         from fastapi.responses import JSONResponse
@@ -198,7 +513,7 @@ async def submit_blueprint(payload: BlueprintSubmission):
             content={"error": "Failed to submit blueprint", "details": str(e)}
         )
 
-@app.post("/run/{run_id}/build")
+@app.post("/run/{run_id}/build", dependencies=[Depends(operation_deadline("build"))])
 async def build_from_blueprint(
     run_id: str = Path(...),
     storage_service: StorageService = Depends(get_storage_service_dependency),
@@ -217,26 +532,46 @@ async def build_from_blueprint(
         with open(meta_file) as f:
             record = json.load(f)
         
-        # Update state to BUILDING
-        state_service.update_state(run_id, RunState.BUILDING)
-        
         # Get blueprint details
         blueprint = record["blueprint"]
         kind = blueprint["kind"]
         variables = blueprint["variables"]
         
+        # Validate before rendering so bad inputs never reach TFE
         try:
-            # Render the QUILL template with blueprint variables
-            files = quill_manager.render_quill(kind, variables)
-            
-            # Store the deployment bundle
-            bundle_key = storage_service.store_deployment_bundle(run_id, files)
+            await asyncio.to_thread(schema_validator.validate, kind, variables, RENDER_VERSION)
+        except BlueprintValidationError as e:
+            state_service.update_state(
+                run_id,
+                RunState.PLAN_FAILED,  # Reuse plan_failed state for build failures
+                metadata={"error": str(e), "validation_errors": e.errors}
+            )
+            return validation_error_response(e)
+        
+        # Update state to BUILDING
+        state_service.update_state(run_id, RunState.BUILDING)
+        
+        try:
+            # Identical blueprints against the same QUILL source reuse the bundle they rendered to
+            cache_key = render_key(kind, quill_manager.resolve(kind, RENDER_VERSION), variables)
+            cached = render_cache.get(cache_key)
+            if cached is not None:
+                bundle_key, bundle_digest = cached
+                logging.info(f"Reusing bundle {bundle_key} for run {run_id}, skipping render")
+            else:
+                # Render the QUILL template with blueprint variables
+                files = quill_manager.render_quill(kind, variables, RENDER_VERSION)
+                
+                # Store the deployment bundle (content-addressed, so identical renders are not uploaded again)
+                bundle_key, bundle_digest = storage_service.store_deployment_bundle(run_id, files)
+                render_cache.put(cache_key, bundle_key, bundle_digest)
             
             # Generate bundle URL
             bundle_url = storage_service.get_bundle_url(bundle_key)
             
             # Update record with bundle key
             record["bundle_key"] = bundle_key
+            record["bundle_digest"] = bundle_digest
             record["status"] = "built"
             tmp_file = meta_file + ".tmp"
             with open(tmp_file, "w") as f:
@@ -249,12 +584,19 @@ async def build_from_blueprint(
                 RunState.BUILT,
                 metadata={
                     "bundle_key": bundle_key,
+                    "bundle_digest": bundle_digest,
                     "bundle_url": bundle_url
                 }
             )
             
             logging.info(f"Blueprint built: {run_id}")
-            return {"run_id": run_id, "status": "built", "bundle_key": bundle_key, "bundle_url": bundle_url}
+            return {
+                "run_id": run_id,
+                "status": "built",
+                "bundle_key": bundle_key,
+                "bundle_digest": bundle_digest,
+                "bundle_url": bundle_url
+            }
             
         except ValueError as e:
             # Update state to indicate build failure
@@ -272,6 +614,11 @@ async def build_from_blueprint(
             status_code=400,
             content={"error": error_msg}
         )
+    except BackendUnavailableError as e:
+        return backend_unavailable_response(e)
+    except DeadlineExceededError as e:
+        logging.warning(f"Build of run {run_id} ran out of time: {str(e)}")
+        return deadline_exceeded_response(e, state_service, run_id, RunState.SUBMITTED)
     except Exception as e:
         error_msg = f"Error building blueprint: {str(e)}"
         logging.error(error_msg)
@@ -280,14 +627,20 @@ async def build_from_blueprint(
             content={"error": error_msg}
         )
 
-@app.post("/run/{run_id}/plan")
+@app.post("/run/{run_id}/plan", dependencies=[Depends(operation_deadline("plan"))])
 async def plan_run(
     run_id: str,
+    force: bool = False,
     storage_service: StorageService = Depends(get_storage_service_dependency),
     github_client: GitHubClient = Depends(get_github_client_dependency),
     state_service: StateService = Depends(get_state_service_dependency)
 ):
-    """Run terraform plan and create/update GitHub check run."""
+    """Run terraform plan and create/update GitHub check run.
+    
+    If the bundle is identical to the one last applied to the run's workspace, the plan resolves
+    as a no-op without touching Terraform Cloud, unless force is set.
+    """
+    current_state = None
     try:
         # Get run state
         state = await state_service.get_state(run_id)
@@ -426,6 +779,8 @@ async def plan_run(
                 name="PORC Plan",
                 run_id=run_id
             )
+        except (BackendUnavailableError, DeadlineExceededError):
+            raise
         except Exception as e:
             state_service.update_state(
                 run_id,
@@ -440,22 +795,66 @@ async def plan_run(
                 content={"error": f"Failed to create GitHub check run: {str(e)}"}
             )
         
+        workspace_name = get_workspace_name(record)
+        bundle_digest = metadata.get("bundle_digest") or record.get("bundle_digest")
+        applied = None if force else await find_unchanged_apply(state_service, bundle_digest, workspace_name)
+        if applied:
+            logging.info(f"Bundle {bundle_digest} unchanged since run {applied['run_id']}, skipping plan for {run_id}")
+            await github_client.update_check_run(
+                owner, repo, check_run["id"],
+                status="completed",
+                conclusion="success",
+                output={
+                    "title": "No Changes",
+                    "summary": "The rendered bundle is identical to the one last applied. No plan was needed.",
+                    "text": f"""## Run Details
+**Run ID**: `{run_id}`
+**Bundle Digest**: `{bundle_digest}`
+**Last Applied By**: `{applied['run_id']}` at {applied['applied_at']}
+
+Plan again with `force=true` to run a Terraform plan anyway."""
+                }
+            )
+            state_service.update_state(
+                run_id,
+                RunState.PLANNED,
+                metadata={
+                    "bundle_key": metadata.get("bundle_key"),
+                    "bundle_digest": bundle_digest,
+                    "no_changes": True,
+                    "last_applied_run_id": applied["run_id"]
+                }
+            )
+            metrics.incr("plans_skipped_unchanged")
+            return {"status": "planned", "no_changes": True, "plan_id": None, "last_applied_run_id": applied["run_id"]}
+        
         try:
             # Run terraform plan
-            tfe = TFEClient()
-            workspace_name = get_workspace_name()
+            tfe = get_tfe_client()
             logging.info(f"Getting/creating workspace: {workspace_name}")
-            workspace_id = ensure_workspace_exists(tfe, workspace_name)
+            workspace_id = await ensure_workspace_exists(tfe, workspace_name)
             logging.info(f"Using workspace {workspace_name} with ID: {workspace_id}")
             
-            # Create plan
-            logging.info(f"Creating plan in workspace {workspace_id} with bundle URL: {bundle_url}")
-            plan_id = tfe.create_plan(workspace_id, bundle_url)
-            logging.info(f"Created plan {plan_id} in workspace {workspace_id}")
+            # Reuse a plan of the same bundle against the same state, unless forced
+            serial = await tfe.get_current_state_serial(workspace_id) if bundle_digest else None
+            reused = None
+            if serial is not None and not force:
+                reused = await find_cached_plan(tfe, bundle_digest, workspace_id, serial)
+            if reused:
+                plan_id, plan_url = reused["plan_id"], reused["plan_url"]
+                logging.info(f"Reusing plan {plan_id} for run {run_id}: bundle and state serial {serial} unchanged")
+            else:
+                # Create plan
+                logging.info(f"Creating plan in workspace {workspace_id} with bundle URL: {bundle_url}")
+                plan_id = await tfe.create_plan(workspace_id, bundle_url, message=f"PORC run {run_id}")
+                logging.info(f"Created plan {plan_id} in workspace {workspace_id}")
+                plan_url = f"https://app.terraform.io/app/{get_tfe_org()}/workspaces/{workspace_name}/runs/{plan_id}"
+                if bundle_digest:
+                    plan_cache.put(bundle_digest, workspace_id, serial, {"plan_id": plan_id, "plan_url": plan_url})
             
             # Update check run with plan URL
-            plan_url = f"https://app.terraform.io/app/{get_tfe_org()}/workspaces/{workspace_name}/runs/{plan_id}"
             logging.info(f"Plan URL: {plan_url}")
+            reuse_note = f"\n\nThis plan was reused: the bundle and workspace state (serial {serial}) are unchanged." if reused else ""
             await github_client.update_check_run(
                 owner, repo, check_run["id"],
                 status="completed",
@@ -470,7 +869,7 @@ async def plan_run(
 ## Plan Results
 The plan has been created in Terraform Cloud. Click the URL below to view the detailed plan output.
 
-Plan URL: {plan_url}"""
+Plan URL: {plan_url}{reuse_note}"""
                 }
             )
             
@@ -479,14 +878,56 @@ Plan URL: {plan_url}"""
                 run_id,
                 RunState.PLANNED,
                 metadata={
+                    "bundle_key": metadata.get("bundle_key"),
+                    "bundle_digest": metadata.get("bundle_digest"),
                     "plan_id": plan_id,
                     "plan_url": plan_url
-                }
+                },
+                tfe_run_id=plan_id
             )
             
-            return {"status": "planned", "plan_id": plan_id, "plan_url": plan_url}
+            response = {"status": "planned", "plan_id": plan_id, "plan_url": plan_url}
+            if reused:
+                response.update(reused=True, summary=reused["summary"])
+            return response
+            
+        except BackendUnavailableError as e:
+            try:
+                await github_client.update_check_run(
+                    owner, repo, check_run["id"],
+                    status="completed",
+                    conclusion="neutral",
+                    output={
+                        "title": "PORC Plan — Backend Unavailable",
+                        "summary": f"The plan was not run because {e.backend} is unavailable. Retry the plan later.",
+                        "text": str(e)
+                    }
+                )
+            except Exception as check_error:
+                logging.warning(f"Could not update check run for run {run_id}: {str(check_error)}")
+            raise
+            
+        except DeadlineExceededError as e:
+            with deadline.scope(None):
+                try:
+                    await github_client.update_check_run(
+                        owner, repo, check_run["id"],
+                        status="completed",
+                        conclusion="timed_out",
+                        output={
+                            "title": "PORC Plan — Timed Out",
+                            "summary": f"The plan did not finish within its {e.budget:g}s deadline. Retry the plan.",
+                            "text": str(e)
+                        }
+                    )
+                except Exception as check_error:
+                    logging.warning(f"Could not update check run for run {run_id}: {str(check_error)}")
+            raise
             
         except TFEServiceError as e:
+            if e.status_code == 404:
+                # The workspace may have been deleted; look it up again next time
+                workspace_ids.invalidate(workspace_name)
             # Update check run with error
             error_details = {
                 "title": "PORC Plan — Terraform Cloud Error",
@@ -515,16 +956,12 @@ Troubleshooting Steps:
 For more details, check the logs or contact your administrator.
 ```"""
             }
-            try:
-                await github_client.update_check_run(
-                    owner, repo, check_run["id"],
-                    status="completed",
-                    conclusion="failure",
-                    output=error_details
-                )
-            finally:
-                # Ensure client session is closed
-                await github_client.close()
+            await github_client.update_check_run(
+                owner, repo, check_run["id"],
+                status="completed",
+                conclusion="failure",
+                output=error_details
+            )
             
             # Update state to indicate plan failure
             state_service.update_state(
@@ -557,16 +994,12 @@ Stack Trace:
 For more details, check the logs or contact your administrator.
 ```"""
             }
-            try:
-                await github_client.update_check_run(
-                    owner, repo, check_run["id"],
-                    status="completed",
-                    conclusion="failure",
-                    output=error_details
-                )
-            finally:
-                # Ensure client session is closed
-                await github_client.close()
+            await github_client.update_check_run(
+                owner, repo, check_run["id"],
+                status="completed",
+                conclusion="failure",
+                output=error_details
+            )
             
             # Update state to indicate plan failure
             state_service.update_state(
@@ -583,11 +1016,17 @@ For more details, check the logs or contact your administrator.
                 content={"error": "Failed to run plan", "details": str(e)}
             )
             
+    except BackendUnavailableError as e:
+        logging.warning(f"Plan of run {run_id} rejected: {str(e)}")
+        # Nothing was applied, so the run can simply be planned again once the backend is back
+        return backend_unavailable_response(e, state_service, run_id, RunState(current_state) if current_state else None)
+    except DeadlineExceededError as e:
+        logging.warning(f"Plan of run {run_id} ran out of time: {str(e)}")
+        if not current_state:
+            return deadline_exceeded_response(e)
+        return deadline_exceeded_response(e, state_service, run_id, RunState(current_state), state.get("metadata", {}))
     except Exception as e:
         logging.error(f"Error running plan: {str(e)}", exc_info=True)
-        # Ensure client session is closed in case of early exit
-        if github_client:
-            await github_client.close()
         
         # Update state to indicate plan failure
         state_service.update_state(
@@ -604,107 +1043,48 @@ For more details, check the logs or contact your administrator.
             content={"error": "Failed to run plan", "details": str(e)}
         )
 
-@app.post("/run/{run_id}/apply")
-async def apply_run(
-    run_id: str,
-    storage_service: StorageService = Depends(get_storage_service_dependency),
-    github_client: GitHubClient = Depends(get_github_client_dependency),
-    state_service: StateService = Depends(get_state_service_dependency)
-):
-    """Run 'terraform apply' for the given run_id using Terraform Cloud."""
-    if sanitize_run_id(run_id):
-        return sanitize_run_id(run_id)
-    
+async def apply_job(run_id: str, record: dict, metadata: dict, workspace_name: str,
+                    storage_service: StorageService, github_client: GitHubClient, state_service: StateService,
+                    tfe_run_id: Optional[str] = None):
+    """Apply a run that is APPLYING and holds its workspace lock, and return the response to report.
+
+    Given the TFE run ID checkpointed by an earlier attempt, the job resumes by waiting
+    for that run instead of starting another one. The workspace lock is released when
+    the job ends, and failures are recorded on the run, since nobody may be waiting for
+    the response.
+    """
+    owner, repo = record["source_repo"].split('/')
+    check_run_id = metadata.get("check_run_id")
+    restore_state = RunState.PLANNED if tfe_run_id is None else None  # where a rejected apply leaves the run
     try:
-        # Get the blueprint record
-        meta_file = f"{DB_PATH}/{run_id}.json"
-        if not os.path.exists(meta_file):
-            return JSONResponse(status_code=404, content={"error": "Run ID not found"})
-        
-        with open(meta_file) as f:
-            record = json.load(f)
-        
-        # Get current state
-        current_state = await state_service.get_state(run_id)
-        if not current_state or current_state.get("state") != RunState.PLANNED.value:
-            return JSONResponse(
-                status_code=400,
-                content={"error": f"Run must be in PLANNED state, current state: {current_state.get('state') if current_state else 'unknown'}"}
-            )
-        
-        # Extract GitHub info
-        source_repo = record["source_repo"]
-        external_ref = record["external_reference"]
-        owner, repo = source_repo.split('/')
-        
-        # Create GitHub check run for apply
-        check_run = await github_client.create_check_run(
-            owner=owner,
-            repo=repo,
-            sha=external_ref,
-            name="PORC Apply",
-            run_id=run_id
-        )
-        check_run_id = check_run["id"]
-        
-        # Get workspace name based on GitHub repository and environment
-        workspace_name = get_workspace_name()
-        
-        # Try to acquire workspace lock
-        if not state_service.acquire_lock(workspace_name, run_id):
-            return JSONResponse(
-                status_code=409,
-                content={"error": f"Workspace {workspace_name} is locked by another operation"}
-            )
-        
         try:
-            # Update state to APPLYING
-            state_service.update_state(
-                run_id,
-                RunState.APPLYING,
-                workspace=workspace_name,
-                metadata={"check_run_id": check_run_id}
-            )
-            
             # Initialize TFE client with configuration
-            tfe = TFEClient(
-                api_url=get_tfe_api(),
-                org=get_tfe_org()
-            )
+            tfe = get_tfe_client(api_url=get_tfe_api(), org=get_tfe_org())
             
             # Ensure workspace exists
-            workspace_id = ensure_workspace_exists(tfe, workspace_name)
-            
-            # Create a new configuration version
-            config_version_id, upload_url = tfe.create_config_version(workspace_id)
-            
-            # Get deployment bundle from storage
-            bundle_key = record["bundle_key"]
-            bundle = storage_service.get_deployment_bundle(bundle_key)
+            workspace_id = await ensure_workspace_exists(tfe, workspace_name)
             
-            # Upload the configuration
-            tfe.upload_files(upload_url, bundle)
-            
-            # Wait for configuration version to be processed
-            max_retries = 10
-            retry_delay = 2
-            for attempt in range(max_retries):
-                try:
-                    # Create and start a run
-                    tfe_run_id = tfe.create_run(workspace_id, config_version_id)
-                    break
-                except TFEServiceError as e:
-                    if "Configuration version is still being processed" in str(e) and attempt < max_retries - 1:
-                        logging.info(f"Configuration version still processing, attempt {attempt + 1}/{max_retries}")
-                        time.sleep(retry_delay)
-                        continue
-                    raise
+            if tfe_run_id is None:
+                # Confirm the planned run, or start a fresh one if that plan can no longer be applied
+                tfe_run_id = await start_apply(tfe, workspace_id, run_id, metadata.get("plan_id"),
+                                               record["bundle_key"], storage_service)
+                restore_state = None  # from here on, TFE notifications settle the run's state
+                # Checkpoint: after a restart the apply resumes by waiting for this TFE run
+                metadata = {**metadata, "tfe_run_id": tfe_run_id}
+                state_service.update_state(
+                    run_id,
+                    RunState.APPLYING,
+                    workspace=workspace_name,
+                    metadata=metadata,
+                    tfe_run_id=tfe_run_id
+                )
             
-            # Wait for the run to complete
-            status = tfe.wait_for_run(tfe_run_id)
+            # Wait for the run to complete; TFE notifications wake us, polling is only a fallback
+            status = await tfe.wait_for_run(tfe_run_id)
+            plan_cache.invalidate_workspace(workspace_id)
             
             # Get the apply output
-            apply_output = tfe.get_apply_output(tfe_run_id)
+            apply_output = await tfe.get_apply_output(tfe_run_id)
             
             # Update GitHub check run for apply
             conclusion = "success" if status == "applied" else "failure"
@@ -740,6 +1120,8 @@ async def apply_run(
                     "apply_output": apply_output[:TRUNCATE_OUTPUT]
                 }
             )
+            if new_state == RunState.APPLIED:
+                record_applied_bundle(state_service, run_id, workspace_name)
             
             return {
                 "run_id": run_id,
@@ -749,22 +1131,206 @@ async def apply_run(
                 "output": apply_output[:TRUNCATE_OUTPUT]
             }
             
+        except TFEServiceError as e:
+            if e.status_code == 404:
+                # The workspace may have been deleted; look it up again next time
+                workspace_ids.invalidate(workspace_name)
+            raise
         finally:
             # Always release the workspace lock
             state_service.release_lock(workspace_name, run_id)
             
-    except ValueError as e:
-        error_msg = str(e)
+    except BackendUnavailableError as e:
+        logging.warning(f"Apply of run {run_id} rejected: {str(e)}")
+        return backend_unavailable_response(e, state_service, run_id, restore_state)
+    except DeadlineExceededError as e:
+        logging.warning(f"Apply of run {run_id} ran out of time: {str(e)}")
+        if tfe_run_id is not None:
+            # The TFE run carries on; its notifications settle the run's state
+            return deadline_exceeded_response(e, state_service, run_id, RunState.APPLYING, metadata, tfe_run_id)
+        return deadline_exceeded_response(e, state_service, run_id, restore_state, metadata)
+    except Exception as e:
+        if isinstance(e, TFEServiceError):
+            error_msg, error_type = f"Terraform Cloud error: {str(e)}", "terraform_cloud_error"
+        else:
+            error_msg, error_type = f"Error running terraform apply: {str(e)}", "unexpected_error"
         logging.error(error_msg)
+        if restore_state is not None:
+            # No TFE run was started, so nothing else will settle the run
+            try:
+                state_service.update_state(
+                    run_id,
+                    RunState.APPLY_FAILED,
+                    metadata={**metadata, "error": error_msg, "error_type": error_type}
+                )
+            except Exception as update_error:
+                logging.warning(f"Could not record failed apply of run {run_id}: {str(update_error)}")
         return JSONResponse(
-            status_code=400,
+            status_code=500,
             content={"error": error_msg}
         )
-    except TFEServiceError as e:
-        error_msg = f"Terraform Cloud error: {str(e)}"
+
+async def resume_applies(storage_service: StorageService, github_client: GitHubClient,
+                         state_service: StateService) -> None:
+    """Pick up the applies left APPLYING by a process that is gone, e.g. one restarted mid-apply.
+
+    A run is only taken over once the lease of the process that drove it has expired
+    or was released, so applies that a live replica is still driving are left alone.
+    """
+    for run in await state_service.find_runs_in_state(RunState.APPLYING):
+        run_id = run["run_id"]
+        if run_executor.get(run_id) is not None:
+            continue  # driven by this process
+        metadata = run["metadata"]
+        tfe_run_id = run.get("tfe_run_id") or metadata.get("tfe_run_id")
+        meta_file = f"{DB_PATH}/{run_id}.json"
+        if not os.path.exists(meta_file):
+            logging.warning(f"Cannot resume apply of run {run_id}: blueprint record not found")
+            continue
+        if not state_service.take_lease(run_id, run_executor.owner):
+            logging.info(f"Apply of run {run_id} is driven by {run.get('lease_owner')}, not resuming it")
+            continue
+        if (await state_service.get_state(run_id)).get("state") != RunState.APPLYING.value:
+            continue  # finished since it was listed
+        if tfe_run_id is None:
+            # Interrupted before TFE was asked to apply; the run can simply be applied again
+            logging.info(f"Apply of run {run_id} was interrupted before it started, back to PLANNED")
+            state_service.update_state(run_id, RunState.PLANNED, metadata={**metadata, "apply_interrupted": True})
+            continue
+        with open(meta_file) as f:
+            record = json.load(f)
+        workspace_name = run.get("workspace") or get_workspace_name(record)
+        if not state_service.acquire_lock(workspace_name, run_id):
+            logging.warning(f"Cannot resume apply of run {run_id}: workspace {workspace_name} is locked")
+            continue
+        logging.info(f"Resuming apply of run {run_id} by waiting for TFE run {tfe_run_id}")
+        run_executor.submit(
+            run_id,
+            lambda run_id=run_id, record=record, metadata=metadata, workspace_name=workspace_name,
+                   tfe_run_id=tfe_run_id: apply_job(run_id, record, metadata, workspace_name, storage_service,
+                                                    github_client, state_service, tfe_run_id),
+            budget=get_deadline_seconds("apply"),
+            state_service=state_service
+        )
+
+async def keep_resuming_applies(storage_service: StorageService, github_client: GitHubClient,
+                                state_service: StateService, interval: float) -> None:
+    """Look for applies to resume every interval seconds, e.g. of a replica that died without shutting down."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await resume_applies(storage_service, github_client, state_service)
+        except Exception as e:
+            logging.warning(f"Interrupted applies not resumed: {str(e)}")
+
+@app.post("/run/{run_id}/apply", dependencies=[Depends(operation_deadline("apply"))])
+async def apply_run(
+    run_id: str,
+    wait: bool = False,
+    storage_service: StorageService = Depends(get_storage_service_dependency),
+    github_client: GitHubClient = Depends(get_github_client_dependency),
+    state_service: StateService = Depends(get_state_service_dependency)
+):
+    """Run 'terraform apply' for the given run_id using Terraform Cloud.
+
+    The apply runs in the background and the endpoint answers 202 with the URL to poll
+    for its status; with wait=true it answers once the apply has finished.
+    """
+    if sanitize_run_id(run_id):
+        return sanitize_run_id(run_id)
+    
+    try:
+        # Get the blueprint record
+        meta_file = f"{DB_PATH}/{run_id}.json"
+        if not os.path.exists(meta_file):
+            return JSONResponse(status_code=404, content={"error": "Run ID not found"})
+        
+        with open(meta_file) as f:
+            record = json.load(f)
+        
+        # Get current state
+        current_state = await state_service.get_state(run_id)
+        if not current_state or current_state.get("state") != RunState.PLANNED.value:
+            return JSONResponse(
+                status_code=400,
+                content={"error": f"Run must be in PLANNED state, current state: {current_state.get('state') if current_state else 'unknown'}"}
+            )
+        
+        # Nothing to apply when the plan found the bundle unchanged since the last apply
+        if current_state.get("metadata", {}).get("no_changes"):
+            state_service.update_state(run_id, RunState.APPLIED, metadata=current_state["metadata"])
+            logging.info(f"Run {run_id} has no changes, marked applied without a TFE run")
+            return {"run_id": run_id, "status": RunState.APPLIED.value, "no_changes": True}
+        
+        # Extract GitHub info
+        source_repo = record["source_repo"]
+        external_ref = record["external_reference"]
+        owner, repo = source_repo.split('/')
+        
+        # Create GitHub check run for apply
+        check_run = await github_client.create_check_run(
+            owner=owner,
+            repo=repo,
+            sha=external_ref,
+            name="PORC Apply",
+            run_id=run_id
+        )
+        check_run_id = check_run["id"]
+        
+        # Get workspace name based on GitHub repository and environment
+        workspace_name = get_workspace_name(record)
+        
+        # Try to acquire workspace lock
+        if not state_service.acquire_lock(workspace_name, run_id):
+            return JSONResponse(
+                status_code=409,
+                content={"error": f"Workspace {workspace_name} is locked by another operation"}
+            )
+        
+        # Update state to APPLYING, keeping the plan details an interrupted apply resumes from
+        metadata = {**current_state.get("metadata", {}), "check_run_id": check_run_id}
+        try:
+            state_service.update_state(run_id, RunState.APPLYING, workspace=workspace_name, metadata=metadata,
+                                       lease_owner=run_executor.owner)
+        except BaseException:
+            state_service.release_lock(workspace_name, run_id)
+            raise
+        
+        # The job gets the apply's own budget: a short client deadline must not cut the apply short
+        task = run_executor.submit(
+            run_id,
+            lambda: apply_job(run_id, record, metadata, workspace_name, storage_service, github_client, state_service),
+            budget=get_deadline_seconds("apply"),
+            state_service=state_service
+        )
+        if task is None:
+            return JSONResponse(status_code=409, content={"error": f"Run {run_id} is already being applied"})
+        if wait:
+            # If the client's deadline runs out first, the apply carries on in the background
+            return await deadline.wait(asyncio.shield(task))
+        return JSONResponse(
+            status_code=202,
+            content={
+                "run_id": run_id,
+                "status": RunState.APPLYING.value,
+                "workspace": workspace_name,
+                "check_run_id": check_run_id,
+                "status_url": f"/run/{run_id}/status"
+            },
+            headers={"Location": f"/run/{run_id}/status"}
+        )
+            
+    except BackendUnavailableError as e:
+        logging.warning(f"Apply of run {run_id} rejected: {str(e)}")
+        return backend_unavailable_response(e)
+    except DeadlineExceededError as e:
+        logging.warning(f"Apply of run {run_id} ran out of time: {str(e)}")
+        return deadline_exceeded_response(e)
+    except ValueError as e:
+        error_msg = str(e)
         logging.error(error_msg)
         return JSONResponse(
-            status_code=500,
+            status_code=400,
             content={"error": error_msg}
         )
     except Exception as e:
@@ -775,6 +1341,59 @@ async def apply_run(
             content={"error": error_msg}
         )
 
+@app.post("/webhooks/tfe")
+async def tfe_notification(
+    request: Request,
+    state_service: StateService = Depends(get_state_service_dependency)
+):
+    """Receive Terraform Cloud run notifications and advance run state."""
+    token = get_tfe_notification_token()
+    if not token:
+        return JSONResponse(status_code=503, content={"error": "TFE notifications are not configured"})
+    
+    body = await request.body()
+    if not verify_signature(body, request.headers.get(SIGNATURE_HEADER), token):
+        logging.warning("Rejected TFE notification with invalid signature")
+        return JSONResponse(status_code=401, content={"error": "Invalid signature"})
+    
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid JSON payload"})
+    
+    tfe_run_id = payload.get("run_id")
+    tfe_status = latest_run_status(payload)
+    if not tfe_run_id or not tfe_status:
+        # Verification requests and notifications without run details
+        return {"status": "ignored"}
+    if not SAFE_TFE_RUN_ID_RE.match(tfe_run_id):
+        return JSONResponse(status_code=400, content={"error": "Invalid run_id"})
+    
+    logging.info(f"TFE notification: run {tfe_run_id} is {tfe_status}")
+    run_poller.notify(tfe_run_id, tfe_status)
+    if tfe_status == "applied" and payload.get("workspace_id"):
+        # Any apply moves the workspace state on, whoever started it
+        plan_cache.invalidate_workspace(payload["workspace_id"])
+    
+    run_id = await state_service.find_run_by_tfe_run_id(tfe_run_id)
+    if not run_id:
+        return {"status": "ignored", "tfe_run_id": tfe_run_id}
+    
+    state = await state_service.get_state(run_id)
+    new_state = next_run_state(state.get("state"), tfe_status)
+    if new_state is None:
+        return {"status": "ignored", "run_id": run_id, "tfe_run_id": tfe_run_id}
+    
+    state_service.update_state(
+        run_id,
+        new_state,
+        metadata={**state.get("metadata", {}), "tfe_status": tfe_status}
+    )
+    if new_state == RunState.APPLIED:
+        record_applied_bundle(state_service, run_id, state.get("workspace"))
+    logging.info(f"Run {run_id} advanced to {new_state.value} by TFE notification")
+    return {"status": new_state.value, "run_id": run_id, "tfe_run_id": tfe_run_id}
+
 @app.get("/run/{run_id}/status")
 async def get_status(
     run_id: str,
@@ -814,6 +1433,8 @@ async def get_status(
                 "metadata": state.get("metadata", {})
             }
         
+    except BackendUnavailableError as e:
+        return backend_unavailable_response(e)
     except Exception as e:
         error_msg = f"Error getting run status: {str(e)}"
         logging.error(error_msg)
@@ -822,6 +1443,48 @@ async def get_status(
             content={"error": error_msg}
         )
 
+def format_event(seq: int, event: dict) -> str:
+    """One Server-Sent Event carrying a run state snapshot."""
+    return f"id: {seq}\nevent: state\ndata: {json.dumps(event)}\n\n"
+
+@app.get("/run/{run_id}/events")
+async def stream_run_events(
+    run_id: str,
+    state_service: StateService = Depends(get_state_service_dependency)
+):
+    """Stream the state of a run as Server-Sent Events, from its current state until it settles.
+
+    Streams are closed after RUN_EVENTS_MAX_SECONDS; clients reconnect to keep watching.
+    """
+    if sanitize_run_id(run_id):
+        return sanitize_run_id(run_id)
+    if not os.path.exists(f"{DB_PATH}/{run_id}.json"):
+        return JSONResponse(status_code=404, content={"error": "Run ID not found"})
+    
+    async def events():
+        loop = asyncio.get_running_loop()
+        closes_at = loop.time() + get_run_events_max_seconds()
+        async with run_events.subscribe(run_id, state_service) as queue:
+            while True:
+                left = closes_at - loop.time()
+                if left <= 0:
+                    return
+                try:
+                    seq, event = await asyncio.wait_for(queue.get(), min(EVENTS_KEEPALIVE_SECONDS, left))
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event(seq, event)
+                if event["state"] in SETTLED_RUN_STATES:
+                    return
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/run/{run_id}/summary")
 async def get_summary(
     run_id: str,
@@ -853,13 +1516,9 @@ async def get_summary(
             try:
                 bundle = storage_service.get_deployment_bundle(record["bundle_key"])
                 # Extract and read files from the bundle
-                import zipfile
-                import io
-                with zipfile.ZipFile(io.BytesIO(bundle)) as zf:
-                    for fname in zf.namelist():
-                        if fname.endswith('.tf'):
-                            with zf.open(fname) as f:
-                                files[fname] = f.read().decode('utf-8')[:1000]  # truncate file previews
+                for fname, content in read_bundle(bundle).items():
+                    if fname.endswith('.tf'):
+                        files[fname] = content[:1000]  # truncate file previews
             except Exception as e:
                 logging.warning(f"Could not read deployment bundle: {str(e)}")
         
@@ -874,6 +1533,8 @@ async def get_summary(
             "files": files
         }
         
+    except BackendUnavailableError as e:
+        return backend_unavailable_response(e)
     except Exception as e:
         error_msg = f"Error getting run summary: {str(e)}"
         logging.error(error_msg)
@@ -900,7 +1561,8 @@ async def upload_quill(
         raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
 
     if mongo_db is not None:
-        await mongo_db.quills.update_one(
+        await mongo_circuit.call_async(
+            mongo_db.quills.update_one,
             {"kind": kind, "version": version},
             {"$set": {"templates": templates_json, "schema": schema_json}},
             upsert=True
@@ -911,10 +1573,43 @@ async def upload_quill(
 async def get_quill(kind: str, version: Optional[str] = "latest"):
     if mongo_db is None:
         raise HTTPException(status_code=500, detail="MongoDB not configured")
-    quill = await mongo_db.quills.find_one({"kind": kind, "version": version})
+    quill = await mongo_circuit.call_async(mongo_db.quills.find_one, {"kind": kind, "version": version})
     if not quill:
         raise HTTPException(status_code=404, detail="Quill not found")
     return {"templates": quill["templates"], "schema": quill["schema"]}
 
+class ImpactRequest(BaseModel):
+    target_version: str
+    base_version: str = "latest"
+
+@quills_router.post("/quills/{kind}/impact", status_code=202)
+async def start_quill_impact(kind: str, payload: ImpactRequest):
+    """Start re-rendering every stored blueprint of a kind with the base and target QUILL versions."""
+    job = impact_analyzer.start(
+        kind,
+        payload.base_version,
+        payload.target_version,
+        iter_blueprints(kind, mongo_db, DB_PATH, mongo_circuit),
+        get_render_pool(),
+        quill_manager
+    )
+    return {**job.to_dict(), "status_url": f"/quills/{kind}/impact/{job.job_id}"}
+
+@quills_router.get("/quills/{kind}/impact/{job_id}")
+async def get_quill_impact(kind: str, job_id: str):
+    """Progress and aggregate counts of an impact job."""
+    job = impact_analyzer.get(job_id)
+    if job is None or job.kind != kind:
+        raise HTTPException(status_code=404, detail="Impact job not found")
+    return job.to_dict()
+
+@quills_router.get("/quills/{kind}/impact/{job_id}/diffs")
+async def get_quill_impact_diffs(kind: str, job_id: str, changed_only: bool = True):
+    """Stream per-run results of an impact job as JSON Lines."""
+    job = impact_analyzer.get(job_id)
+    if job is None or job.kind != kind:
+        raise HTTPException(status_code=404, detail="Impact job not found")
+    return StreamingResponse(iterate_in_threadpool(job.iter_results(changed_only)), media_type="application/x-ndjson")
+
 # Register the router
 app.include_router(quills_router)
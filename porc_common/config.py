@@ -20,6 +20,33 @@ def get_tfe_org():
 def get_tfe_env():
     return get_env("TFE_ENV", default="dev")
 
+def get_tfe_notification_token():
+    return get_env("TFE_NOTIFICATION_TOKEN")
+
+def get_tfe_notification_url():
+    return get_env("TFE_NOTIFICATION_URL")
+
+def get_tfe_poll_fallback_seconds():
+    return float(get_env("TFE_POLL_FALLBACK_SECONDS", default="60"))
+
+def get_tfe_poll_requests_per_second():
+    return float(get_env("TFE_POLL_REQUESTS_PER_SECOND", default="10"))
+
+def get_tfe_requests_per_second():
+    return float(get_env("TFE_REQUESTS_PER_SECOND", default="25"))
+
+def get_tfe_rate_limit_burst():
+    return float(get_env("TFE_RATE_LIMIT_BURST", default="25"))
+
+def get_tfe_max_retries():
+    return int(get_env("TFE_MAX_RETRIES", default="5"))
+
+def get_tfe_retry_base_seconds():
+    return float(get_env("TFE_RETRY_BASE_SECONDS", default="1"))
+
+def get_tfe_retry_max_seconds():
+    return float(get_env("TFE_RETRY_MAX_SECONDS", default="30"))
+
 def get_github_repository():
     return get_env("GITHUB_REPOSITORY", default="")
 
@@ -44,10 +71,78 @@ def get_github_app_private_key():
 def get_github_app_type():
     return get_env("GITHUB_APP_TYPE", default="app")
 
+def get_quill_cache_size():
+    return int(get_env("QUILL_CACHE_SIZE", default="128"))
+
+def get_quill_cache_ttl_seconds():
+    return float(get_env("QUILL_CACHE_TTL_SECONDS", default="60"))
+
+def get_render_cache_size():
+    return int(get_env("RENDER_CACHE_SIZE", default="1024"))
+
+def get_render_pool_workers():
+    return int(get_env("RENDER_POOL_WORKERS", default=str(min(4, os.cpu_count() or 1))))
+
+def get_render_batch_max_items():
+    return int(get_env("RENDER_BATCH_MAX_ITEMS", default="500"))
+
+def get_render_item_timeout_seconds():
+    return float(get_env("RENDER_ITEM_TIMEOUT_SECONDS", default="10"))
+
+def get_render_item_max_timeout_seconds():
+    return float(get_env("RENDER_ITEM_MAX_TIMEOUT_SECONDS", default="60"))
+
+def get_impact_chunk_size():
+    return int(get_env("IMPACT_CHUNK_SIZE", default="50"))
+
+def get_plan_cache_size():
+    return int(get_env("PLAN_CACHE_SIZE", default="1024"))
+
+def get_workspace_strategy():
+    return get_env("WORKSPACE_STRATEGY", default="environment")
+
+def get_workspace_buckets():
+    return int(get_env("WORKSPACE_BUCKETS", default="16"))
+
+def get_workspace_id_ttl_seconds():
+    return float(get_env("WORKSPACE_ID_TTL_SECONDS", default="300"))
+
+def get_workspace_pool_size():
+    return int(get_env("WORKSPACE_POOL_SIZE", default="0"))
+
+def get_circuit_failure_threshold():
+    return int(get_env("CIRCUIT_FAILURE_THRESHOLD", default="5"))
+
+def get_circuit_reset_seconds():
+    return float(get_env("CIRCUIT_RESET_SECONDS", default="30"))
+
+def get_deadline_seconds(operation):
+    defaults = {"build": "120", "plan": "1800", "apply": "3600"}
+    return float(get_env(f"DEADLINE_{operation.upper()}_SECONDS", default=defaults[operation]))
+
+def get_run_executor_workers():
+    return int(get_env("RUN_EXECUTOR_WORKERS", default="16"))
+
+def get_run_lease_seconds():
+    return int(get_env("RUN_LEASE_SECONDS", default="60"))
+
+def get_run_events_poll_seconds():
+    return float(get_env("RUN_EVENTS_POLL_SECONDS", default="5"))
+
+def get_run_events_max_seconds():
+    return float(get_env("RUN_EVENTS_MAX_SECONDS", default="3600"))
+
+def get_quill_compiled_dir():
+    return get_env("QUILL_COMPILED_DIR", default="/tmp/porc-quills")
+
+def get_quill_preload():
+    return [k.strip() for k in get_env("QUILL_PRELOAD", default="").split(",") if k.strip()]
+
 # Use hardcoded defaults for runtime paths
 DB_PATH = "/tmp/porc-metadata"
 RUNS_PATH = "/tmp/porc-runs"
 AUDIT_PATH = "/tmp/porc-audit"
+IMPACT_PATH = "/tmp/porc-impact"
 
-for path in [DB_PATH, RUNS_PATH, AUDIT_PATH]:
+for path in [DB_PATH, RUNS_PATH, AUDIT_PATH, IMPACT_PATH]:
     os.makedirs(path, exist_ok=True)
\ No newline at end of file
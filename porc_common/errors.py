@@ -32,4 +32,31 @@ class ValidationError(PORCError):
 class TFEServiceError(PORCError):
     """Raised when a Terraform Enterprise API call fails."""
     def __init__(self, status_code, message):
-        super().__init__(f"TFE API Error ({status_code}): {message}")
\ No newline at end of file
+        self.status_code = status_code
+        super().__init__(f"TFE API Error ({status_code}): {message}")
+
+class GitHubServiceError(PORCError):
+    """Raised when a GitHub API call fails."""
+    def __init__(self, status_code, message):
+        self.status_code = status_code
+        super().__init__(f"GitHub API Error ({status_code}): {message}")
+
+class BackendUnavailableError(PORCError):
+    """Raised without calling a backend while its circuit breaker is open."""
+    def __init__(self, backend, retry_after):
+        self.backend = backend
+        self.retry_after = retry_after
+        super().__init__(f"Backend {backend} is unavailable, retry in {retry_after:.0f}s")
+
+class DeadlineExceededError(PORCError):
+    """Raised when an operation runs out of its time budget."""
+    def __init__(self, budget, deadline_at):
+        self.budget = budget
+        self.deadline_at = deadline_at
+        super().__init__(f"Deadline of {budget:g}s exceeded at {deadline_at}")
+
+class BlueprintValidationError(ValidationError):
+    """Raised when blueprint variables do not match the QUILL schema."""
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__(f"Blueprint variables failed validation: {'; '.join(self.errors)}")
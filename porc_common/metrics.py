@@ -0,0 +1,31 @@
+"""
+PORC Metrics: In-process counters and gauges, exposed by the API on /metrics.
+"""
+import threading
+from collections import defaultdict
+from typing import Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = defaultdict(float)
+_gauges: Dict[str, float] = {}
+
+def incr(name: str, value: float = 1) -> None:
+    """Increase a counter."""
+    with _lock:
+        _counters[name] += value
+
+def set_gauge(name: str, value: float) -> None:
+    """Set a gauge to its current value."""
+    with _lock:
+        _gauges[name] = value
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    """Return a copy of all counters and gauges."""
+    with _lock:
+        return {"counters": dict(_counters), "gauges": dict(_gauges)}
+
+def reset() -> None:
+    """Clear all metrics."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
@@ -0,0 +1,183 @@
+"""
+PORC Core Batch Render: Renders many blueprints in a bounded process pool.
+
+Used for previews and dry runs: nothing is stored. Template sources and schema
+validators are resolved once per kind and version in the API process; the Jinja
+work runs in pool workers, which keep their own compiled templates by source
+digest. Each item has its own timeout, counted from when it is handed to the
+pool; a batch hands over at most one item per worker at a time, so the timeout
+does not include waiting behind the batch's other items. A worker cannot be
+stopped in the middle of a render, so a timeout replaces the whole pool: the
+stuck worker is killed instead of holding its process after the item gave up.
+"""
+import asyncio
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+from jinja2 import Environment
+from porc_common import metrics
+from porc_common.config import get_render_pool_workers
+from .bundle import build_bundle
+from .quill import QUILL_ENV_OPTIONS, TEMPLATE_NAMES
+from .schema import collect_errors
+
+WORKER_CACHE_SIZE = 64
+
+# Compiled templates of the current worker process, keyed by source digest
+_worker_templates: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+def _compiled(digest: str, sources: Dict[str, str]) -> Dict[str, Any]:
+    templates = _worker_templates.get(digest)
+    if templates is None:
+        env = Environment(**QUILL_ENV_OPTIONS)
+        templates = {name: env.from_string(sources[name]) for name in TEMPLATE_NAMES}
+        _worker_templates[digest] = templates
+        while len(_worker_templates) > WORKER_CACHE_SIZE:
+            _worker_templates.popitem(last=False)
+    else:
+        _worker_templates.move_to_end(digest)
+    return templates
+
+def render_files(digest: str, sources: Dict[str, str], variables: Dict[str, Any]) -> Dict[str, str]:
+    """Render one blueprint in a worker, compiling the sources only once per process."""
+    templates = _compiled(digest, sources)
+    return {name: templates[name].render(**variables) for name in TEMPLATE_NAMES}
+
+def render_item(digest: str, sources: Dict[str, str], variables: Dict[str, Any]) -> Tuple[Dict[str, str], str]:
+    """Render one blueprint and return its files with the digest its bundle would have."""
+    files = render_files(digest, sources, variables)
+    return files, build_bundle(files)[1]
+
+class RenderPool(Executor):
+    """Spawned process pool that can be replaced when a worker is stuck on a render."""
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor = self._start()
+
+    def _start(self) -> ProcessPoolExecutor:
+        # spawn: forking a process that runs an event loop and client threads is unsafe
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    @property
+    def current(self) -> ProcessPoolExecutor:
+        return self._executor
+
+    def submit(self, fn, /, *args, **kwargs):
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def recycle(self, stale: ProcessPoolExecutor) -> None:
+        """Kill the workers of stale and start a fresh pool, unless that already happened.
+
+        Calls still running in stale fail with BrokenProcessPool.
+        """
+        with self._lock:
+            if self._executor is not stale:
+                return
+            self._executor = self._start()
+        # ProcessPoolExecutor has no way to stop a running call short of killing its process
+        for process in list((stale._processes or {}).values()):
+            process.terminate()
+        stale.shutdown(wait=False, cancel_futures=True)
+        metrics.incr("render_pool_recycles")
+        logging.warning(f"Replaced render pool with {self.workers} fresh workers")
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+def pool_size(executor: Executor) -> int:
+    """How many calls executor runs at once; callers keep at most this many in flight."""
+    return executor.workers if isinstance(executor, RenderPool) else get_render_pool_workers()
+
+async def run_in_pool(executor: Executor, timeout: float, fn, *args) -> Any:
+    """Run fn in a worker, raising asyncio.TimeoutError after timeout seconds.
+
+    With a RenderPool, a timeout recycles the pool, and a call killed by another
+    call's timeout is retried once on the new pool.
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = executor.current if isinstance(executor, RenderPool) else executor
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(pool, fn, *args), timeout)
+        except asyncio.TimeoutError:
+            if isinstance(executor, RenderPool):
+                executor.recycle(pool)
+            raise
+        except BrokenProcessPool:
+            if attempt or not isinstance(executor, RenderPool) or executor.current is pool:
+                raise
+            metrics.incr("render_pool_retries")
+
+async def render_batch(items: List[Dict[str, Any]], executor: Executor, quill_manager, schema_validator=None,
+                       timeout: float = 10, concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Render items of {kind, variables, version} and return one result per item, in order.
+
+    A timed out item is reported as failed. With a RenderPool, the pool is then
+    recycled and the items it was still rendering are retried once on the new pool.
+    """
+    pairs = {(item["kind"], item.get("version") or "latest") for item in items}
+
+    async def resolve(resolver, kind, version):
+        try:
+            return await asyncio.to_thread(resolver, kind, version), None
+        except Exception as e:
+            return None, e
+
+    keys = sorted(pairs)
+    sources = dict(zip(keys, await asyncio.gather(*(resolve(quill_manager.get_sources, *k) for k in keys))))
+    validators = {}
+    if schema_validator is not None:
+        resolved = await asyncio.gather(*(resolve(schema_validator.get_validator, *k) for k in keys))
+        validators = {k: validator for k, (validator, _) in zip(keys, resolved)}
+
+    workers = pool_size(executor)
+    slots = asyncio.Semaphore(min(concurrency or workers, workers))
+
+    async def render_one(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        kind, version = item["kind"], item.get("version") or "latest"
+        variables = item.get("variables") or {}
+        result = {"index": index, "kind": kind, "version": version}
+        resolved, error = sources[(kind, version)]
+        if error is not None:
+            return {**result, "status": "error", "error": str(error)}
+        digest, templates = resolved
+        validator = validators.get((kind, version))
+        errors = collect_errors(validator, variables) if validator is not None else []
+        if errors:
+            return {**result, "status": "invalid", "errors": errors}
+        async with slots:
+            try:
+                files, bundle_digest = await run_in_pool(executor, timeout, render_item, digest, templates, variables)
+            except asyncio.TimeoutError:
+                metrics.incr("render_batch_timeouts")
+                return {**result, "status": "error", "error": f"Render timed out after {timeout}s"}
+            except Exception as e:
+                return {**result, "status": "error", "error": f"Failed to render QUILL template: {str(e)}"}
+        return {**result, "status": "rendered", "quill_digest": digest, "bundle_digest": bundle_digest, "files": files}
+
+    results = await asyncio.gather(*(render_one(i, item) for i, item in enumerate(items)))
+    metrics.incr("render_batch_items", len(results))
+    return list(results)
+
+_render_pool: Optional[RenderPool] = None
+
+def get_render_pool() -> RenderPool:
+    """The process pool shared by batch renders, created on first use."""
+    global _render_pool
+    if _render_pool is None:
+        workers = get_render_pool_workers()
+        _render_pool = RenderPool(workers)
+        logging.info(f"Started render pool with {workers} workers")
+    return _render_pool
+
+def close_render_pool() -> None:
+    """Shut the shared render pool down."""
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
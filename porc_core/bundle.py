@@ -0,0 +1,55 @@
+"""
+PORC Core Bundle: Builds deterministic, content-addressed deployment bundles.
+
+Bundles are tar.gz archives, the layout TFE configuration versions consume.
+Entries are sorted and carry fixed metadata, so identical rendered files always
+produce identical bytes and therefore the same SHA-256 digest.
+"""
+import gzip
+import hashlib
+import io
+import tarfile
+import zipfile
+from typing import Dict, Tuple
+
+BUNDLE_PREFIX = "bundles/sha256"
+BUNDLE_MTIME = 0
+BUNDLE_FILE_MODE = 0o644
+
+def build_bundle(files: Dict[str, str]) -> Tuple[bytes, str]:
+    """Build a deterministic tar.gz archive of the files and return it with its SHA-256 digest."""
+    raw = io.BytesIO()
+    with tarfile.open(fileobj=raw, mode="w", format=tarfile.USTAR_FORMAT) as tar:
+        for name in sorted(files):
+            data = files[name].encode("utf-8")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = BUNDLE_MTIME
+            info.mode = BUNDLE_FILE_MODE
+            info.uid = info.gid = 0
+            info.uname = info.gname = ""
+            tar.addfile(info, io.BytesIO(data))
+
+    compressed = io.BytesIO()
+    with gzip.GzipFile(filename="", mode="wb", fileobj=compressed, mtime=BUNDLE_MTIME) as gz:
+        gz.write(raw.getvalue())
+    archive = compressed.getvalue()
+    return archive, hashlib.sha256(archive).hexdigest()
+
+def bundle_key(digest: str) -> str:
+    """Blob key under which a bundle with the given digest is stored."""
+    return f"{BUNDLE_PREFIX}/{digest}.tar.gz"
+
+def read_bundle(archive: bytes) -> Dict[str, str]:
+    """Read the files of a bundle; legacy zip bundles are supported as well."""
+    files = {}
+    if archive[:2] == b"PK":
+        with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+            for name in zf.namelist():
+                files[name] = zf.read(name).decode("utf-8")
+        return files
+    with tarfile.open(fileobj=io.BytesIO(archive), mode="r:gz") as tar:
+        for member in tar.getmembers():
+            if member.isfile():
+                files[member.name] = tar.extractfile(member).read().decode("utf-8")
+    return files
@@ -0,0 +1,183 @@
+"""
+PORC Core Circuit: Circuit breakers that fail fast while an external backend is down.
+
+Each backend (TFE, GitHub, Blob, Tables, Mongo) has one breaker per process.
+After failure_threshold consecutive outage errors the breaker opens and calls
+are rejected with BackendUnavailableError instead of waiting out timeouts and
+retries. Once reset_timeout has passed, a single probe call is let through
+(half-open): it closes the breaker on success and reopens it on failure.
+
+Only outages count as failures; each backend supplies a predicate, so a 404 or
+a validation error from a healthy backend never opens its breaker.
+"""
+import functools
+import inspect
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
+from porc_common import metrics
+from porc_common.config import get_circuit_failure_threshold, get_circuit_reset_seconds
+from porc_common.errors import BackendUnavailableError, DeadlineExceededError
+from . import deadline
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+def _chain(exc: BaseException) -> List[BaseException]:
+    """The exception and the errors it was raised from, e.g. an SDK error wrapped in a ValueError."""
+    seen = []
+    while exc is not None and exc not in seen and len(seen) < 10:
+        seen.append(exc)
+        exc = exc.__cause__ or exc.__context__
+    return seen
+
+class CircuitBreaker:
+    """Closed, open or half-open state of one backend; safe to share between the event loop and threads."""
+    def __init__(self, name: str, is_failure: Callable[[BaseException], bool],
+                 failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.name = name
+        self.is_failure = is_failure
+        self.failure_threshold = failure_threshold if failure_threshold is not None else get_circuit_failure_threshold()
+        self.reset_timeout = reset_timeout if reset_timeout is not None else get_circuit_reset_seconds()
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._last_error: Optional[str] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _is_outage(self, exc: BaseException) -> bool:
+        if isinstance(exc, (BackendUnavailableError, DeadlineExceededError)) or not isinstance(exc, Exception):
+            return False  # rejected by another breaker, out of budget, or cancelled
+        left = deadline.remaining()
+        if left is not None and left <= 0:
+            return False  # a timeout sized from a spent deadline says nothing about the backend
+        return any(self.is_failure(e) for e in _chain(exc))
+
+    def _retry_after(self, now: float) -> float:
+        return max(1.0, self._opened_at + self.reset_timeout - now)
+
+    def before_call(self) -> bool:
+        """Admit a call or raise BackendUnavailableError; return True if the call is the half-open probe."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_at >= self.reset_timeout:
+                self._set_state(HALF_OPEN)
+            if self.state == CLOSED:
+                return False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            retry_after = self._retry_after(now)
+        metrics.incr(f"circuit_rejected:{self.name}")
+        raise BackendUnavailableError(self.name, retry_after)
+
+    def after_call(self, probe: bool, exc: Optional[BaseException] = None) -> None:
+        """Record the outcome of an admitted call."""
+        with self._lock:
+            if probe:
+                self._probing = False
+            if exc is not None and not isinstance(exc, Exception):
+                return  # a cancelled probe proves nothing; the next call probes again
+            if exc is not None and self._is_outage(exc):
+                self._failures += 1
+                self._last_error = f"{exc.__class__.__name__}: {str(exc)}"[:500]
+                if probe or self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                    self._opened_at = time.monotonic()
+                    if self.state != OPEN:
+                        logging.error(f"Circuit {self.name} opened after {self._failures} failures: {self._last_error}")
+                    self._set_state(OPEN)
+                return
+            self._failures = 0
+            if self.state != CLOSED:
+                logging.info(f"Circuit {self.name} closed")
+                self._set_state(CLOSED)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        metrics.set_gauge(f"circuit_open:{self.name}", 0 if state == CLOSED else 1)
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Call a blocking function through the breaker."""
+        probe = self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.after_call(probe, e)
+            raise
+        self.after_call(probe)
+        return result
+
+    async def call_async(self, fn: Callable, *args, **kwargs) -> Any:
+        """Await a coroutine function through the breaker."""
+        probe = self.before_call()
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            self.after_call(probe, e)
+            raise
+        self.after_call(probe)
+        return result
+
+    def reset(self) -> None:
+        """Close the breaker, e.g. from the admin endpoint after a backend was repaired."""
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self._last_error = None
+            self._set_state(CLOSED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            state = self.state
+            if state == OPEN and now - self._opened_at >= self.reset_timeout:
+                state = HALF_OPEN  # the next call will probe
+            return {
+                "name": self.name,
+                "state": state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "retry_after": self._retry_after(now) if state == OPEN else None,
+                "last_error": self._last_error
+            }
+
+_circuits: Dict[str, CircuitBreaker] = {}
+
+def get_circuit(name: str, is_failure: Optional[Callable[[BaseException], bool]] = None) -> CircuitBreaker:
+    """The process-wide breaker of a backend, created on first use."""
+    circuit = _circuits.get(name)
+    if circuit is None:
+        if is_failure is None:
+            raise KeyError(f"Unknown circuit: {name}")
+        circuit = _circuits[name] = CircuitBreaker(name, is_failure)
+    return circuit
+
+def circuits() -> List[CircuitBreaker]:
+    """Every breaker created so far, by name."""
+    return [_circuits[name] for name in sorted(_circuits)]
+
+def guarded(circuit: CircuitBreaker):
+    """Decorate a method or coroutine method so it runs through a breaker."""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                return await circuit.call_async(fn, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return circuit.call(fn, *args, **kwargs)
+        return wrapper
+    return decorate
+
+def is_azure_outage(exc: BaseException) -> bool:
+    """Azure SDK errors that mean the service is unreachable or failing, not that a resource is missing."""
+    if isinstance(exc, (ServiceRequestError, ServiceResponseError)):
+        return True
+    return isinstance(exc, HttpResponseError) and (exc.status_code or 0) >= 500
@@ -0,0 +1,86 @@
+"""
+PORC Core Deadline: The time budget of the API operation being served.
+
+An endpoint starts a deadline for its request, from the client's header or the
+configured budget of the operation, and every TFE, GitHub and storage call made
+on its behalf sizes its timeouts from the time that is left. The deadline lives
+in a context variable, so it follows the request into coroutines and into
+threads started with asyncio.to_thread, but not across unrelated requests.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Dict, Iterator, Optional, Tuple
+from porc_common.errors import DeadlineExceededError
+
+# (monotonic expiry, budget in seconds, wall clock expiry) of the current operation
+_deadline: ContextVar[Optional[Tuple[float, float, str]]] = ContextVar("porc_deadline", default=None)
+
+def start(seconds: Optional[float]) -> Token:
+    """Give the current context a budget of seconds from now; None clears it."""
+    if seconds is None:
+        return _deadline.set(None)
+    expires_at = (datetime.utcnow() + timedelta(seconds=seconds)).isoformat()
+    return _deadline.set((time.monotonic() + seconds, seconds, expires_at))
+
+def reset(token: Token) -> None:
+    _deadline.reset(token)
+
+@contextmanager
+def scope(seconds: Optional[float]) -> Iterator[None]:
+    """Run a block under its own budget, e.g. scope(None) for cleanup after the deadline passed."""
+    token = start(seconds)
+    try:
+        yield
+    finally:
+        reset(token)
+
+def remaining() -> Optional[float]:
+    """Seconds left, or None without a deadline."""
+    current = _deadline.get()
+    return None if current is None else current[0] - time.monotonic()
+
+def exceeded() -> DeadlineExceededError:
+    """The error describing the current deadline."""
+    _, budget, expires_at = _deadline.get()
+    return DeadlineExceededError(budget, expires_at)
+
+def check() -> None:
+    """Raise DeadlineExceededError if the deadline has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise exceeded()
+
+def timeout(default: float) -> float:
+    """Timeout for one call: the default, shortened to the time left."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise exceeded()
+    return min(default, left)
+
+def azure_kwargs() -> Dict[str, Any]:
+    """Per-operation transport timeouts for Azure SDK calls, empty without a deadline."""
+    left = remaining()
+    if left is None:
+        return {}
+    if left <= 0:
+        raise exceeded()
+    return {"connection_timeout": left, "read_timeout": left}
+
+async def wait(awaitable: Awaitable, limit: Optional[float] = None) -> Any:
+    """Await within limit seconds and the deadline; asyncio.TimeoutError means limit, not the deadline, ran out."""
+    left = remaining()
+    if left is None or (limit is not None and limit < left):
+        return await asyncio.wait_for(awaitable, limit)
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise exceeded()
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        raise exceeded() from None
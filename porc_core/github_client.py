@@ -2,33 +2,191 @@
 PORC Core GitHub: Client for interacting with GitHub Checks API.
 """
 import os
+import asyncio
 import logging
 import aiohttp
 import jwt
 import time
 import json
 import re
-from typing import Dict, Any, Optional
-from datetime import datetime
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from datetime import datetime, timezone
 from porc_common.config import (
     get_github_app_id,
     get_github_app_installation_id,
     get_github_app_private_key,
     get_github_app_type
 )
+from porc_common.errors import GitHubServiceError
+from . import deadline
+from .circuit import get_circuit, guarded
+
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_TIMEOUT = 10  # seconds per request, shortened to the operation's deadline
+
+def is_github_outage(exc: BaseException) -> bool:
+    """Errors meaning GitHub is unreachable or failing, rather than rejecting one request."""
+    if isinstance(exc, GitHubServiceError):
+        return exc.status_code >= 500
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status >= 500
+    return isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError))
+
+github_circuit = get_circuit("github", is_github_outage)
+
+class InstallationTokenManager:
+    """Process-wide cache of GitHub App installation tokens keyed by installation id.
+
+    Tokens are refreshed in the background shortly before they expire. Concurrent
+    callers that find no usable token share a single in-flight exchange, which
+    runs without any caller's deadline; each caller waits for it within its own.
+    """
+    def __init__(self, refresh_margin: int = 300, min_validity: int = 60):
+        """Refresh tokens refresh_margin seconds before expiry; never hand out one with less than min_validity left."""
+        self.refresh_margin = refresh_margin
+        self.min_validity = min_validity
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+        self._credentials: Dict[str, Tuple[str, str]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._refresh_tasks: Dict[str, asyncio.Task] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Get or create the session used for token exchanges."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def get_token(self, app_id: str, installation_id: str, private_key: str) -> str:
+        """Return a valid installation token, exchanging a new one only if the cache has none."""
+        self._credentials[installation_id] = (app_id, private_key)
+        cached = self._tokens.get(installation_id)
+        if cached and time.time() < cached[1] - self.min_validity:
+            return cached[0]
+        return await self._refresh(installation_id)
+
+    async def _refresh(self, installation_id: str) -> str:
+        """Exchange a new token, sharing one in-flight exchange between concurrent callers."""
+        task = self._inflight.get(installation_id)
+        if task is None:
+            task = asyncio.ensure_future(self._exchange_shared(installation_id))
+            self._inflight[installation_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(installation_id, None))
+        return await deadline.wait(asyncio.shield(task))
+
+    async def _exchange_shared(self, installation_id: str) -> str:
+        deadline.start(None)  # shared by callers with different deadlines
+        return await self._exchange(installation_id)
+
+    async def _exchange(self, installation_id: str) -> str:
+        """Mint an app JWT and exchange it for an installation token."""
+        app_id, private_key = self._credentials[installation_id]
+        now = int(time.time())
+        payload = {
+            'iat': now - 60,  # allow for clock drift
+            'exp': now + 300,  # 5 minutes
+            'iss': app_id
+        }
+        logging.info(f"Generating JWT for GitHub App ID {app_id}")
+        jwt_token = jwt.encode(payload, private_key, algorithm='RS256')
+        headers = {
+            'Authorization': f'Bearer {jwt_token}',
+            'Accept': 'application/vnd.github.v3+json'
+        }
+        logging.info(f"Getting installation access token for installation {installation_id}")
+        async with self.session.post(
+            f'{GITHUB_API_URL}/app/installations/{installation_id}/access_tokens',
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=GITHUB_TIMEOUT)
+        ) as response:
+            response.raise_for_status()
+            result = await response.json()
+        expires_at = datetime.strptime(
+            result['expires_at'], "%Y-%m-%dT%H:%M:%SZ"
+        ).replace(tzinfo=timezone.utc).timestamp()
+        self._tokens[installation_id] = (result['token'], expires_at)
+        logging.info(f"Obtained installation access token for installation {installation_id}")
+        self._schedule_refresh(installation_id, expires_at)
+        return result['token']
+
+    def _schedule_refresh(self, installation_id: str, expires_at: float) -> None:
+        """Schedule a background refresh refresh_margin seconds before the token expires."""
+        previous = self._refresh_tasks.get(installation_id)
+        if previous and not previous.done():
+            previous.cancel()
+        self._refresh_tasks[installation_id] = asyncio.ensure_future(
+            self._refresh_later(installation_id, expires_at)
+        )
+
+    async def _refresh_later(self, installation_id: str, expires_at: float) -> None:
+        """Background refresh; on failure retry shortly while the cached token is still usable."""
+        await asyncio.sleep(max(0, expires_at - self.refresh_margin - time.time()))
+        while self._tokens.get(installation_id, (None, 0))[1] == expires_at and time.time() < expires_at:
+            try:
+                await self._refresh(installation_id)
+                return
+            except Exception as e:
+                logging.warning(f"Background refresh of installation token {installation_id} failed: {str(e)}")
+                await asyncio.sleep(min(30, max(0, expires_at - time.time())))
+
+    def invalidate(self, installation_id: str, token: Optional[str] = None) -> None:
+        """Drop a cached token, e.g. after GitHub rejected it; with token, only if it is still the cached one."""
+        cached = self._tokens.get(installation_id)
+        if cached and (token is None or cached[0] == token):
+            del self._tokens[installation_id]
+
+    async def close(self) -> None:
+        """Cancel background refreshes and close the session."""
+        for task in self._refresh_tasks.values():
+            task.cancel()
+        self._refresh_tasks.clear()
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+class CheckRunCache:
+    """Bounded in-memory record of the check runs created by this process.
+
+    Holds what update_check_run needs (head SHA, name, PORC run id and the
+    original run-details header) so updates do not have to read the check run back.
+    """
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+
+    def put(self, check_run_id, info: Dict[str, str]) -> None:
+        key = str(check_run_id)
+        self._entries[key] = info
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, check_run_id) -> Optional[Dict[str, str]]:
+        key = str(check_run_id)
+        info = self._entries.get(key)
+        if info is not None:
+            self._entries.move_to_end(key)
+        return info
+
+# Shared across all GitHubClient instances in the process
+installation_token_manager = InstallationTokenManager()
+check_run_cache = CheckRunCache()
 
 class GitHubClient:
     # SHA validation pattern - 40 character hex string
     SHA_PATTERN = re.compile(r'^[0-9a-f]{40}$')
     
-    def __init__(self, token: Optional[str] = None):
+    def __init__(self, token: Optional[str] = None,
+                 token_manager: Optional[InstallationTokenManager] = None):
         """Initialize GitHub client with token or GitHub App credentials."""
         self._token = token
-        self._headers = None
         self._app_id = get_github_app_id()
         self._installation_id = get_github_app_installation_id()
         self._private_key = get_github_app_private_key()
         self._app_type = get_github_app_type()
+        self._token_manager = token_manager or installation_token_manager
+        self._check_runs = check_run_cache
         self._session = None
     
     @property
@@ -40,61 +198,52 @@ class GitHubClient:
     
     @property
     async def token(self) -> str:
-        """Get the GitHub token, initializing it if needed."""
-        if self._token is None:
-            logging.info(f"Initializing GitHub token with app_type={self._app_type}")
-            if self._app_type == "app":
-                # Generate JWT for GitHub App
-                now = int(time.time())
-                payload = {
-                    'iat': now,
-                    'exp': now + 300,  # 5 minutes
-                    'iss': self._app_id
-                }
-                logging.info(f"Generating JWT for GitHub App ID {self._app_id}")
-                jwt_token = jwt.encode(payload, self._private_key, algorithm='RS256')
-                
-                # Get installation access token
-                headers = {
-                    'Authorization': f'Bearer {jwt_token}',
-                    'Accept': 'application/vnd.github.v3+json'
-                }
-                session = await self.session
-                logging.info(f"Getting installation access token for installation {self._installation_id}")
-                async with session.post(
-                    f'https://api.github.com/app/installations/{self._installation_id}/access_tokens',
-                    headers=headers
-                ) as response:
-                    response.raise_for_status()
-                    self._token = (await response.json())['token']
-                    logging.info("Successfully obtained installation access token")
-            else:
-                # Use PAT
-                self._token = os.getenv("GITHUB_TOKEN")
-                if not self._token:
-                    logging.error("GitHub token is required but not set")
-                    raise ValueError("GitHub token is required")
-                logging.info("Using GitHub PAT token")
+        """Get the GitHub token; App installation tokens come from the shared token manager."""
+        if self._token is not None:
+            return self._token
+        if self._app_type == "app":
+            return await self._token_manager.get_token(
+                self._app_id, self._installation_id, self._private_key
+            )
+        # Use PAT
+        self._token = os.getenv("GITHUB_TOKEN")
+        if not self._token:
+            logging.error("GitHub token is required but not set")
+            raise ValueError("GitHub token is required")
+        logging.info("Using GitHub PAT token")
         return self._token
     
     @property
     async def headers(self) -> Dict[str, str]:
-        """Get the request headers, initializing them if needed."""
-        if self._headers is None:
-            token = await self.token
-            if self._app_type == "app":
-                self._headers = {
-                    "Authorization": f"Bearer {token}",
-                    "Accept": "application/vnd.github.v3+json"
-                }
-                logging.info("Using GitHub App authentication headers")
-            else:
-                self._headers = {
-                    "Authorization": f"token {token}",
-                    "Accept": "application/vnd.github.v3+json"
-                }
-                logging.info("Using GitHub PAT authentication headers")
-        return self._headers
+        """Get the request headers for the current token."""
+        token = await self.token
+        if self._app_type == "app":
+            return {
+                "Authorization": f"Bearer {token}",
+                "Accept": "application/vnd.github.v3+json"
+            }
+        return {
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github.v3+json"
+        }
+
+    async def _request(self, method: str, url: str, data: Optional[Dict[str, Any]] = None) -> Tuple[int, str]:
+        """Send a request and return its status and body.
+
+        A 401 on an installation token drops the token and retries once with a fresh one,
+        e.g. after the installation's tokens were revoked before they expired.
+        """
+        session = await self.session
+        for attempt in range(2):
+            headers = await self.headers
+            timeout = aiohttp.ClientTimeout(total=deadline.timeout(GITHUB_TIMEOUT))
+            async with session.request(method, url, headers=headers, json=data, timeout=timeout) as response:
+                text = await response.text()
+            if response.status == 401 and self._token is None and self._app_type == "app" and not attempt:
+                logging.warning(f"GitHub rejected the installation token for {method} {url}, retrying with a new one")
+                self._token_manager.invalidate(self._installation_id, headers["Authorization"].split(" ", 1)[1])
+                continue
+            return response.status, text
 
     def _validate_sha(self, sha: str) -> bool:
         """Validate that a string is a valid Git SHA."""
@@ -113,6 +262,36 @@ class GitHubClient:
         
         return base_url
 
+    @staticmethod
+    def _extract_run_details(text: str) -> str:
+        """Extract the '## Run Details' section from a check run's output text."""
+        run_details = ""
+        for line in text.split("\n"):
+            if line.startswith("## Run Details"):
+                run_details = line
+            elif run_details and not line.startswith("##"):
+                run_details += "\n" + line
+            elif run_details and line.startswith("##"):
+                break
+        return run_details
+
+    @classmethod
+    def _check_run_info(cls, check_run: Dict[str, Any]) -> Dict[str, str]:
+        """Build the cached metadata for a check run returned by the API."""
+        text = (check_run.get("output") or {}).get("text") or ""
+        run_id = "unknown"
+        for line in text.split("\n"):
+            if "**Run ID**:" in line:
+                run_id = line.split("`")[1]
+                break
+        return {
+            "sha": check_run.get("head_sha", ""),
+            "name": check_run.get("name", ""),
+            "run_id": run_id,
+            "run_details": cls._extract_run_details(text)
+        }
+
+    @guarded(github_circuit)
     async def create_check_run(self, owner: str, repo: str, sha: str, name: str, run_id: str) -> Dict[str, Any]:
         """Create a new check run."""
         # Validate SHA format
@@ -151,69 +330,50 @@ class GitHubClient:
             "details_url": self._get_details_url(owner, repo, sha, run_id)
         }
         
-        session = await self.session
-        headers = await self.headers
         logging.info("=== GitHub Check Run API Request ===")
         logging.info("Method: POST")
         logging.info(f"URL: {url}")
-        logging.info(f"Headers: {json.dumps(headers, indent=2)}")
         logging.info(f"Request Body: {json.dumps(data, indent=2)}")
         
-        async with session.post(url, headers=headers, json=data) as response:
-            response_text = await response.text()
-            logging.info(f"Response Status: {response.status}")
-            logging.info(f"Response Body: {response_text}")
-            if response.status != 201:
-                logging.error(f"Failed to create check run: {response_text}")
-                raise Exception(f"Failed to create check run: {response_text}")
-            result = json.loads(response_text)
-            logging.info(f"Successfully created check run: {json.dumps(result, indent=2)}")
-            return result
+        status_code, response_text = await self._request("POST", url, data)
+        logging.info(f"Response Status: {status_code}")
+        logging.info(f"Response Body: {response_text}")
+        if status_code != 201:
+            logging.error(f"Failed to create check run: {response_text}")
+            raise GitHubServiceError(status_code, f"Failed to create check run: {response_text}")
+        result = json.loads(response_text)
+        logging.info(f"Successfully created check run: {json.dumps(result, indent=2)}")
+        self._check_runs.put(result["id"], {
+            "sha": sha,
+            "name": name,
+            "run_id": run_id,
+            "run_details": self._extract_run_details(text)
+        })
+        return result
     
+    @guarded(github_circuit)
     async def update_check_run(self, owner: str, repo: str, check_run_id: int, 
                         status: str, conclusion: Optional[str] = None,
                         output: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Update an existing check run."""
         url = f"https://api.github.com/repos/{owner}/{repo}/check-runs/{check_run_id}"
         
-        # Get the SHA from the existing check run to use in details_url
-        session = await self.session
-        headers = await self.headers
-        async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                check_run = await response.json()
-                sha = check_run.get("head_sha", "")
-                name = check_run.get("name", "")
-                # Extract run_id from the text field
-                text = check_run.get("output", {}).get("text", "")
-                run_id = "unknown"
-                for line in text.split("\n"):
-                    if "**Run ID**:" in line:
-                        run_id = line.split("`")[1]
-                        break
+        # Use the metadata recorded at creation; only read the check run back on a cache miss
+        info = self._check_runs.get(check_run_id)
+        if info is None:
+            status_code, response_text = await self._request("GET", url)
+            if status_code == 200:
+                info = self._check_run_info(json.loads(response_text))
+                self._check_runs.put(check_run_id, info)
             else:
-                sha = ""
-                name = ""
-                run_id = "unknown"
+                info = {"sha": "", "name": "", "run_id": "unknown", "run_details": ""}
+        sha = info["sha"]
+        run_id = info["run_id"]
         
         # If there's an existing summary, ensure it maintains the run details section
         if output and "text" in output and not output["text"].startswith("## Run Details"):
-            # Get the original run details from the check run
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    check_run = await response.json()
-                    original_text = check_run.get("output", {}).get("text", "")
-                    run_details = ""
-                    for line in original_text.split("\n"):
-                        if line.startswith("## Run Details"):
-                            run_details = line
-                        elif run_details and not line.startswith("##"):
-                            run_details += "\n" + line
-                        elif run_details and line.startswith("##"):
-                            break
-                    
-                    if run_details:
-                        output["text"] = f"{run_details}\n\n{output['text']}"
+            if info["run_details"]:
+                output["text"] = f"{info['run_details']}\n\n{output['text']}"
         
         data = {
             "status": status,
@@ -225,19 +385,17 @@ class GitHubClient:
         logging.info("=== GitHub Check Run Update API Request ===")
         logging.info("Method: PATCH")
         logging.info(f"URL: {url}")
-        logging.info(f"Headers: {json.dumps(headers, indent=2)}")
         logging.info(f"Request Body: {json.dumps(data, indent=2)}")
         
-        async with session.patch(url, headers=headers, json=data) as response:
-            response_text = await response.text()
-            logging.info(f"Response Status: {response.status}")
-            logging.info(f"Response Body: {response_text}")
-            if response.status != 200:
-                logging.error(f"Failed to update check run: {response_text}")
-                raise Exception(f"Failed to update check run: {response_text}")
-            result = json.loads(response_text)
-            logging.info(f"Successfully updated check run: {json.dumps(result, indent=2)}")
-            return result
+        status_code, response_text = await self._request("PATCH", url, data)
+        logging.info(f"Response Status: {status_code}")
+        logging.info(f"Response Body: {response_text}")
+        if status_code != 200:
+            logging.error(f"Failed to update check run: {response_text}")
+            raise GitHubServiceError(status_code, f"Failed to update check run: {response_text}")
+        result = json.loads(response_text)
+        logging.info(f"Successfully updated check run: {json.dumps(result, indent=2)}")
+        return result
     
     async def close(self):
         """Close the aiohttp session."""
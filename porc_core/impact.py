@@ -0,0 +1,220 @@
+"""
+PORC Core Impact: Shows how publishing a new QUILL version would change existing runs.
+
+An impact job streams every stored blueprint of a kind, re-renders it with the
+base and the target version in the render pool and records a unified diff per
+run. Blueprints are processed in chunks and per-run results are appended to a
+JSON Lines file, so memory stays flat however many runs there are. At most one
+item per pool worker is in flight, so an item's timeout does not include time
+queued behind the rest of its chunk. Results files go with their evicted jobs.
+"""
+import asyncio
+import difflib
+import json
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Executor
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from porc_common import metrics
+from porc_common.config import IMPACT_PATH, get_impact_chunk_size, get_render_item_timeout_seconds
+from .batch_render import pool_size, render_files, run_in_pool
+from .quill import TEMPLATE_NAMES
+
+MAX_JOBS = 100
+
+def diff_item(base: Tuple[str, str, Dict[str, str]], target: Tuple[str, str, Dict[str, str]],
+              variables: Dict[str, Any]) -> Dict[str, str]:
+    """Render one blueprint with two QUILL versions in a worker and return a unified diff per changed file."""
+    base_version, base_digest, base_sources = base
+    target_version, target_digest, target_sources = target
+    before = render_files(base_digest, base_sources, variables)
+    after = render_files(target_digest, target_sources, variables)
+    diffs = {}
+    for name in TEMPLATE_NAMES:
+        if before[name] != after[name]:
+            diffs[name] = "".join(difflib.unified_diff(
+                before[name].splitlines(keepends=True),
+                after[name].splitlines(keepends=True),
+                fromfile=f"{base_version}/{name}",
+                tofile=f"{target_version}/{name}"
+            ))
+    return diffs
+
+def _read_record(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Skipping unreadable run record {path}: {str(e)}")
+        return None
+
+async def iter_blueprints(kind: str, mongo_db=None, db_path: Optional[str] = None,
+                          circuit=None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (run_id, variables) for every stored blueprint of a kind, from MongoDB or the run records.
+
+    With a circuit, every read from MongoDB goes through that breaker.
+    """
+    if mongo_db is not None:
+        cursor = mongo_db.blueprints.find({"blueprint.kind": kind}, {"run_id": 1, "blueprint.variables": 1})
+        while True:
+            try:
+                record = await (circuit.call_async(cursor.__anext__) if circuit is not None else cursor.__anext__())
+            except StopAsyncIteration:
+                return
+            yield record["run_id"], record["blueprint"].get("variables") or {}
+    with os.scandir(db_path) as entries:
+        for entry in entries:
+            if not entry.is_file() or not entry.name.endswith(".json"):
+                continue
+            record = await asyncio.to_thread(_read_record, entry.path)
+            blueprint = (record or {}).get("blueprint") or {}
+            if blueprint.get("kind") == kind:
+                yield record["run_id"], blueprint.get("variables") or {}
+
+class ImpactJob:
+    """Progress and aggregate counts of one impact analysis."""
+    def __init__(self, kind: str, base_version: str, target_version: str, results_path: str):
+        self.job_id = f"impact-{uuid.uuid4().hex[:12]}"
+        self.kind = kind
+        self.base_version = base_version
+        self.target_version = target_version
+        self.results_path = results_path
+        self.status = "running"
+        self.error: Optional[str] = None
+        self.counts = {"total": 0, "changed": 0, "unchanged": 0, "failed": 0}
+        self.started_at = datetime.utcnow().isoformat()
+        self.finished_at: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "base_version": self.base_version,
+            "target_version": self.target_version,
+            "status": self.status,
+            "error": self.error,
+            "counts": dict(self.counts),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+    def iter_results(self, changed_only: bool = False) -> Iterator[str]:
+        """Stream the per-run result lines written so far."""
+        if not os.path.exists(self.results_path):
+            return
+        with open(self.results_path) as f:
+            for line in f:
+                if not changed_only or json.loads(line)["status"] != "unchanged":
+                    yield line
+
+class ImpactAnalyzer:
+    """Runs impact jobs in the background and keeps the most recent ones."""
+    def __init__(self, results_dir: str, chunk_size: int = 50, timeout: float = 10):
+        self.results_dir = results_dir
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self._jobs: "OrderedDict[str, ImpactJob]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, kind: str, base_version: str, target_version: str,
+              blueprints: AsyncIterator[Tuple[str, Dict[str, Any]]], executor: Executor, quill_manager) -> ImpactJob:
+        """Start an impact job and return it immediately."""
+        job = ImpactJob(kind, base_version, target_version, "")
+        job.results_path = os.path.join(self.results_dir, f"{job.job_id}.jsonl")
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > MAX_JOBS:
+            _, old = self._jobs.popitem(last=False)
+            self._evict(old)
+        task = asyncio.ensure_future(self.run(job, blueprints, executor, quill_manager))
+        self._tasks[job.job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.job_id, None))
+        return job
+
+    def get(self, job_id: str) -> Optional[ImpactJob]:
+        return self._jobs.get(job_id)
+
+    def _evict(self, job: ImpactJob) -> None:
+        task = self._tasks.pop(job.job_id, None)
+        if task is None or task.done():
+            self._remove_results(job)
+            return
+        # Remove the results once the job has stopped writing them
+        task.add_done_callback(lambda _: self._remove_results(job))
+        task.cancel()
+
+    @staticmethod
+    def _remove_results(job: ImpactJob) -> None:
+        try:
+            os.remove(job.results_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Failed to remove results of impact job {job.job_id}: {str(e)}")
+
+    async def run(self, job: ImpactJob, blueprints: AsyncIterator[Tuple[str, Dict[str, Any]]],
+                  executor: Executor, quill_manager) -> None:
+        """Diff every blueprint chunk by chunk, appending results to the job's results file."""
+        logging.info(f"Impact job {job.job_id}: {job.kind} {job.base_version} -> {job.target_version}")
+        try:
+            base = (job.base_version, *await asyncio.to_thread(quill_manager.get_sources, job.kind, job.base_version))
+            target = (job.target_version, *await asyncio.to_thread(quill_manager.get_sources, job.kind, job.target_version))
+            chunk: List[Tuple[str, Dict[str, Any]]] = []
+            async for item in blueprints:
+                chunk.append(item)
+                if len(chunk) >= self.chunk_size:
+                    await self._process(job, chunk, base, target, executor)
+                    chunk = []
+            if chunk:
+                await self._process(job, chunk, base, target, executor)
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            logging.error(f"Impact job {job.job_id} failed: {str(e)}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.utcnow().isoformat()
+            logging.info(f"Impact job {job.job_id} {job.status}: {job.counts}")
+
+    async def _process(self, job: ImpactJob, chunk, base, target, executor) -> None:
+        slots = asyncio.Semaphore(pool_size(executor))
+
+        async def diff_one(variables):
+            async with slots:
+                return await run_in_pool(executor, self.timeout, diff_item, base, target, variables)
+
+        outcomes = await asyncio.gather(*(diff_one(variables) for _, variables in chunk), return_exceptions=True)
+
+        lines = []
+        for (run_id, _), outcome in zip(chunk, outcomes):
+            if isinstance(outcome, BaseException):
+                error = f"Render timed out after {self.timeout}s" if isinstance(outcome, asyncio.TimeoutError) else str(outcome)
+                result = {"run_id": run_id, "status": "failed", "error": error}
+            elif outcome:
+                result = {"run_id": run_id, "status": "changed", "diffs": outcome}
+            else:
+                result = {"run_id": run_id, "status": "unchanged"}
+            job.counts["total"] += 1
+            job.counts[result["status"]] += 1
+            lines.append(json.dumps(result) + "\n")
+        await asyncio.to_thread(self._append, job.results_path, lines)
+        metrics.incr("impact_runs_diffed", len(chunk))
+
+    @staticmethod
+    def _append(path: str, lines: List[str]) -> None:
+        with open(path, "a") as f:
+            f.writelines(lines)
+
+    async def close(self) -> None:
+        """Cancel running jobs."""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        self._tasks.clear()
+
+# Shared by the API process
+impact_analyzer = ImpactAnalyzer(IMPACT_PATH, get_impact_chunk_size(), get_render_item_timeout_seconds())
@@ -0,0 +1,56 @@
+"""
+PORC Core Plan Cache: Reuses Terraform Cloud plans of the same bundle against the same state.
+
+A plan is fully determined by the configuration and the state it is planned
+against, so entries are keyed by bundle digest, workspace id and the serial of
+the workspace's current state version. Applies move the serial on, and every
+entry of a workspace is also dropped as soon as an apply lands on it.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from porc_common import metrics
+from porc_common.config import get_plan_cache_size
+
+class PlanCache:
+    """Bounded LRU from (bundle digest, workspace id, state serial) to plan details."""
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else get_plan_cache_size()
+        self._entries: "OrderedDict[Tuple[str, str, int], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, bundle_digest: str, workspace_id: str, serial: int) -> Optional[Dict[str, Any]]:
+        """Return the plan made for this bundle and state, if any."""
+        key = (bundle_digest, workspace_id, serial)
+        with self._lock:
+            plan = self._entries.get(key)
+            if plan is not None:
+                self._entries.move_to_end(key)
+        metrics.incr("plan_cache_hits" if plan is not None else "plan_cache_misses")
+        return dict(plan) if plan is not None else None
+
+    def put(self, bundle_digest: str, workspace_id: str, serial: int, plan: Dict[str, Any]) -> None:
+        """Remember the plan made for this bundle and state."""
+        key = (bundle_digest, workspace_id, serial)
+        with self._lock:
+            self._entries[key] = dict(plan)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            metrics.set_gauge("plan_cache_entries", len(self._entries))
+
+    def discard(self, bundle_digest: str, workspace_id: str, serial: int) -> None:
+        """Forget one plan, e.g. because it errored or was discarded."""
+        with self._lock:
+            self._entries.pop((bundle_digest, workspace_id, serial), None)
+            metrics.set_gauge("plan_cache_entries", len(self._entries))
+
+    def invalidate_workspace(self, workspace_id: str) -> None:
+        """Forget every plan of a workspace; called when an apply lands on it."""
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == workspace_id]:
+                del self._entries[key]
+            metrics.set_gauge("plan_cache_entries", len(self._entries))
+
+# Shared by every plan in the process
+plan_cache = PlanCache()
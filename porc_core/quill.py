@@ -3,46 +3,187 @@ PORC Core QUILL: Qualified Infrastructure Layout Layer
 Manages the rendering of infrastructure templates using Jinja2.
 """
 import os
+import json
+import time
+import hashlib
 import logging
-from jinja2 import Environment, FileSystemLoader
-from typing import Dict, Any
+import tempfile
+import threading
+from collections import OrderedDict
+import jinja2
+from jinja2 import Environment, FileSystemLoader, DictLoader, ModuleLoader
+from typing import Dict, Any, Iterable, Optional, Tuple
+from porc_common import metrics
+from porc_common.config import get_quill_cache_size, get_quill_cache_ttl_seconds, get_quill_compiled_dir
+from porc_common.errors import BackendUnavailableError, DeadlineExceededError
 from .storage import get_storage_service
 
+# Options every QUILL environment uses; precompiled modules are only valid for the same options
+QUILL_ENV_OPTIONS = {"trim_blocks": True, "lstrip_blocks": True}
+TEMPLATE_NAMES = ("main.tf", "terraform.tfvars.json")
+
+def source_digest(templates: Dict[str, str]) -> str:
+    """SHA-256 of a QUILL's template sources, independent of JSON formatting."""
+    return hashlib.sha256(json.dumps(templates, sort_keys=True).encode("utf-8")).hexdigest()
+
+def compiled_key(kind: str, version: str, digest: str) -> str:
+    """Blob key of the precompiled modules for a QUILL source digest and the running Jinja version."""
+    return f"quills/{kind}/{version}/compiled/jinja-{jinja2.__version__}/{digest}.zip"
+
+def compile_quill(templates: Dict[str, str], target: str) -> None:
+    """Compile a QUILL's templates into a zip of Python modules loadable by ModuleLoader."""
+    env = Environment(loader=DictLoader(templates), **QUILL_ENV_OPTIONS)
+    env.compile_templates(target, zip="deflated", ignore_errors=False)
+
+class _CachedQuill:
+    """Compiled templates for one kind and version, with the sources, blob ETag and source digest they came from."""
+    def __init__(self, templates: Dict[str, Any], sources: Dict[str, str], etag: Optional[str], digest: str,
+                 checked_at: float):
+        self.templates = templates
+        self.sources = sources
+        self.etag = etag
+        self.digest = digest
+        self.checked_at = checked_at
+
 class QuillManager:
-    def __init__(self):
-        """Initialize the QUILL manager."""
-        self.env = Environment(
-            trim_blocks=True,
-            lstrip_blocks=True
-        )
+    def __init__(self, cache_size: Optional[int] = None, ttl: Optional[float] = None):
+        """Initialize the QUILL manager.
+
+        Compiled templates are kept in an LRU of cache_size entries. After ttl seconds an
+        entry is revalidated against the blob ETag and only downloaded again if it changed.
+        """
+        self.env = Environment(**QUILL_ENV_OPTIONS)
         self._storage_service = None
-    
+        self.compiled_dir = get_quill_compiled_dir()
+        self.cache_size = cache_size if cache_size is not None else get_quill_cache_size()
+        self.ttl = ttl if ttl is not None else get_quill_cache_ttl_seconds()
+        self._cache: "OrderedDict[Tuple[str, str], _CachedQuill]" = OrderedDict()
+        self._lock = threading.Lock()
+
     @property
     def storage_service(self):
         """Lazy initialization of storage service."""
         if self._storage_service is None:
             self._storage_service = get_storage_service()
         return self._storage_service
-    
-    def get_quill(self, kind: str, version: str = "latest") -> Dict[str, str]:
-        """Get the QUILL template for a given kind and version."""
+
+    @storage_service.setter
+    def storage_service(self, service):
+        """Use a shared storage service instead of creating one."""
+        self._storage_service = service
+
+    def _compile(self, templates: Dict[str, str]) -> Dict[str, Any]:
+        """Compile the template sources of a QUILL."""
+        metrics.incr("quill_source_compiles")
+        return {name: self.env.from_string(templates[name]) for name in TEMPLATE_NAMES}
+
+    def _load_precompiled(self, kind: str, version: str, digest: str) -> Optional[Dict[str, Any]]:
+        """Load templates from the precompiled artifact published by sync_templates, if there is one."""
+        path = os.path.join(self.compiled_dir, kind, version, f"{digest}.zip")
+        try:
+            if not os.path.exists(path):
+                data = self.storage_service.get_blob_bytes(compiled_key(kind, version, digest))
+                if data is None:
+                    return None
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as tmp:
+                    tmp.write(data)
+                os.replace(tmp.name, path)
+            env = Environment(loader=ModuleLoader(path), **QUILL_ENV_OPTIONS)
+            compiled = {name: env.get_template(name) for name in TEMPLATE_NAMES}
+        except Exception as e:
+            logging.warning(f"Could not load precompiled QUILL {kind}/{version}, compiling from source: {str(e)}")
+            return None
+        metrics.incr("quill_precompiled_loads")
+        return compiled
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[_CachedQuill]:
+        """Return a cache entry that is fresh or still matches the blob ETag."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+        if entry is None:
+            return None
+
+        now = time.monotonic()
+        if now - entry.checked_at < self.ttl:
+            return entry
+        try:
+            etag = self.storage_service.get_quill_etag(*key)
+        except ValueError:
+            return None
+        except BackendUnavailableError:
+            return entry  # serve the cached templates until storage is back
+        metrics.incr("quill_cache_revalidations")
+        if etag != entry.etag:
+            logging.info(f"QUILL template {key[0]}/{key[1]} changed, reloading")
+            return None
+        entry.checked_at = now
+        return entry
+
+    def get_quill(self, kind: str, version: str = "latest") -> Dict[str, Any]:
+        """Get the compiled QUILL templates for a given kind and version."""
+        return self._entry(kind, version).templates
+
+    def resolve(self, kind: str, version: str = "latest") -> str:
+        """Source digest of the templates a kind and version currently resolve to, e.g. for 'latest'."""
+        return self._entry(kind, version).digest
+
+    def get_sources(self, kind: str, version: str = "latest") -> Tuple[str, Dict[str, str]]:
+        """Source digest and template sources of a QUILL, e.g. to render in another process."""
+        entry = self._entry(kind, version)
+        return entry.digest, entry.sources
+
+    def _entry(self, kind: str, version: str) -> _CachedQuill:
+        key = (kind, version)
+        entry = self._cached(key)
+        if entry is not None:
+            metrics.incr("quill_cache_hits")
+            return entry
+
+        metrics.incr("quill_cache_misses")
         try:
             # Get template from storage
-            templates = self.storage_service.get_quill(kind, version)
-            
-            # Create Jinja2 templates
-            return {
-                "main.tf": self.env.from_string(templates["main.tf"]),
-                "terraform.tfvars.json": self.env.from_string(templates["terraform.tfvars.json"])
-            }
+            templates, etag = self.storage_service.get_quill_with_etag(kind, version)
+            digest = source_digest(templates)
+            compiled = self._load_precompiled(kind, version, digest) or self._compile(templates)
+        except (BackendUnavailableError, DeadlineExceededError):
+            raise
         except Exception as e:
             logging.error(f"Failed to load QUILL template for kind {kind}: {str(e)}")
             raise ValueError(f"No QUILL template found for kind: {kind}")
-    
+
+        entry = _CachedQuill(compiled, templates, etag, digest, time.monotonic())
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            metrics.set_gauge("quill_cache_entries", len(self._cache))
+        return entry
+
+    def preload(self, kinds: Iterable[str], version: str = "latest") -> None:
+        """Warm the cache for the given kinds, e.g. at startup."""
+        for kind in kinds:
+            try:
+                self.get_quill(kind, version)
+                logging.info(f"Preloaded QUILL template {kind}/{version}")
+            except ValueError as e:
+                logging.warning(f"Could not preload QUILL template {kind}/{version}: {str(e)}")
+
+    def invalidate(self, kind: Optional[str] = None, version: Optional[str] = None) -> None:
+        """Drop cached templates for a kind/version, a whole kind, or everything."""
+        with self._lock:
+            for key in list(self._cache):
+                if (kind is None or key[0] == kind) and (version is None or key[1] == version):
+                    del self._cache[key]
+            metrics.set_gauge("quill_cache_entries", len(self._cache))
+
     def render_quill(self, kind: str, variables: Dict[str, Any], version: str = "latest") -> Dict[str, str]:
         """Render a QUILL template with the given variables."""
         templates = self.get_quill(kind, version)
-        
+
         try:
             return {
                 "main.tf": templates["main.tf"].render(**variables),
@@ -53,4 +194,4 @@ class QuillManager:
             raise ValueError(f"Failed to render QUILL template: {str(e)}")
 
 # Initialize the QUILL manager
-quill_manager = QuillManager() 
\ No newline at end of file
+quill_manager = QuillManager()
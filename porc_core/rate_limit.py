@@ -0,0 +1,111 @@
+"""
+PORC Core Rate Limit: Process-wide token buckets and retry backoff for upstream APIs.
+
+Every client of the same API token and organization draws from one bucket, so a
+burst of plans is spread out instead of tripping the upstream rate limit. A
+request reserves a token and waits until it is due, which keeps waiting
+requests in arrival order. When the upstream answers 429, the whole bucket is
+paused for the Retry-After period rather than each request retrying on its own.
+"""
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from porc_common import metrics
+from porc_common.config import get_tfe_rate_limit_burst, get_tfe_requests_per_second
+
+class TokenBucket:
+    """Refills rate tokens per second up to burst; usable from the event loop and from threads."""
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def level(self) -> float:
+        """Tokens currently available; negative while requests are queued."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def reserve(self) -> float:
+        """Take one token and return how many seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = max(-self._tokens / self.rate, self._paused_until - now, 0.0)
+            metrics.set_gauge(f"rate_limit_tokens:{self.name}", self._tokens)
+        if wait > 0:
+            metrics.incr("rate_limit_throttled_requests")
+            metrics.incr("rate_limit_throttled_seconds", wait)
+        return wait
+
+    async def acquire(self) -> None:
+        """Wait for a token without blocking the event loop."""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self) -> None:
+        """Wait for a token in a synchronous client."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every request of this bucket back for seconds, e.g. after a 429."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._paused_until = max(self._paused_until, now + seconds)
+            # Nothing accrues while paused, so requests resume at rate instead of in a burst
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = self._paused_until
+            metrics.set_gauge(f"rate_limit_tokens:{self.name}", self._tokens)
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+def get_bucket(name: str, rate: Optional[float] = None, burst: Optional[float] = None) -> TokenBucket:
+    """The process-wide bucket for name, created with the configured TFE limits on first use."""
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            rate = rate if rate is not None else get_tfe_requests_per_second()
+            burst = burst if burst is not None else get_tfe_rate_limit_burst()
+            bucket = _buckets[name] = TokenBucket(name, rate, burst)
+        return bucket
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for the given zero-based retry attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
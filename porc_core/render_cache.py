@@ -0,0 +1,59 @@
+"""
+PORC Core Render Cache: Remembers which bundle a blueprint rendered to.
+
+Entries are keyed by the QUILL kind, the source digest its version resolved to
+and a canonical hash of the variables, so a resubmitted blueprint can reuse the
+stored bundle without rendering or uploading again. Only bundle references are
+kept, and the least recently used entries are evicted beyond max_entries.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from porc_common import metrics
+from porc_common.config import get_render_cache_size
+
+def variables_hash(variables: Dict[str, Any]) -> str:
+    """SHA-256 of the variables, independent of key order and whitespace."""
+    canonical = json.dumps(variables, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def render_key(kind: str, quill_digest: str, variables: Dict[str, Any]) -> str:
+    """Cache key of one render: kind, resolved QUILL source and variables."""
+    return f"{kind}:{quill_digest}:{variables_hash(variables)}"
+
+class RenderCache:
+    """Bounded LRU from render keys to (bundle_key, bundle_digest)."""
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else get_render_cache_size()
+        self._entries: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """Return the bundle a render key produced, if known."""
+        with self._lock:
+            bundle = self._entries.get(key)
+            if bundle is not None:
+                self._entries.move_to_end(key)
+        metrics.incr("render_cache_hits" if bundle is not None else "render_cache_misses")
+        return bundle
+
+    def put(self, key: str, bundle_key: str, bundle_digest: str) -> None:
+        """Remember the bundle a render key produced."""
+        with self._lock:
+            self._entries[key] = (bundle_key, bundle_digest)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.incr("render_cache_evictions")
+            metrics.set_gauge("render_cache_entries", len(self._entries))
+
+    def clear(self) -> None:
+        """Forget every render."""
+        with self._lock:
+            self._entries.clear()
+            metrics.set_gauge("render_cache_entries", 0)
+
+# Shared by every build in the process
+render_cache = RenderCache()
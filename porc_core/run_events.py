@@ -0,0 +1,126 @@
+"""
+PORC Core Run Events: In-process pub/sub of run state changes for streaming clients.
+
+StateService.update_state publishes every change it writes, and all
+subscribers of a run share one topic. Changes written by other API replicas
+(e.g. a TFE notification delivered elsewhere) only reach this process through
+the state table, so each topic also has a single upstream watcher that reads
+the run's state every poll_interval seconds, however many clients subscribe.
+The watcher stops once the run settles or when the last subscriber leaves.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+from porc_common import metrics
+from porc_common.config import get_run_events_poll_seconds
+
+# Events a slow subscriber may fall behind by before its oldest ones are dropped
+QUEUE_SIZE = 100
+
+# RunState values a run does not leave on its own; streams close and watchers stop
+# on them (values, as the state module publishes through this one)
+SETTLED_RUN_STATES = ["plan_failed", "applied", "apply_failed", "cancelled"]
+
+class _Topic:
+    def __init__(self, run_id: str, loop: asyncio.AbstractEventLoop):
+        self.run_id = run_id
+        self.loop = loop
+        self.current: Optional[Dict[str, Any]] = None
+        self.seq = 0
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.watcher: Optional[asyncio.Task] = None
+
+class RunEvents:
+    """Run state snapshots fanned out to the subscribers of each run."""
+    def __init__(self, poll_interval: float):
+        self.poll_interval = poll_interval
+        self._topics: Dict[str, _Topic] = {}
+
+    @asynccontextmanager
+    async def subscribe(self, run_id: str, state_service) -> AsyncIterator[asyncio.Queue]:
+        """Queue of (sequence number, run state) events, starting with the current state."""
+        topic = self._topics.get(run_id)
+        if topic is None:
+            topic = self._topics[run_id] = _Topic(run_id, asyncio.get_running_loop())
+            topic.watcher = asyncio.ensure_future(self._watch(topic, state_service))
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        if topic.current is not None:
+            queue.put_nowait((topic.seq, topic.current))
+        topic.subscribers.add(queue)
+        self._set_gauges()
+        try:
+            yield queue
+        finally:
+            topic.subscribers.discard(queue)
+            if not topic.subscribers and self._topics.get(run_id) is topic:
+                del self._topics[run_id]
+                topic.watcher.cancel()
+            self._set_gauges()
+
+    def publish(self, run_id: str, state: str, workspace: Optional[str] = None,
+                metadata: Optional[Dict[str, Any]] = None, updated_at: Optional[str] = None) -> None:
+        """Announce a state change written by this process; callable from any thread."""
+        topic = self._topics.get(run_id)
+        if topic is None:
+            return  # nobody is listening
+        change = {"state": state, "workspace": workspace, "metadata": metadata, "updated_at": updated_at}
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is topic.loop:
+            self._update(topic, change, upstream=False)
+            return
+        try:
+            topic.loop.call_soon_threadsafe(self._update, topic, change, False)
+        except RuntimeError:
+            pass  # the loop serving the subscribers has shut down
+
+    def _update(self, topic: _Topic, change: Dict[str, Any], upstream: bool) -> None:
+        current = topic.current
+        if upstream:
+            if current is not None:
+                if (change.get("updated_at") or "") < (current.get("updated_at") or ""):
+                    return  # read before a change this process has already published
+                if all(change.get(k) == current.get(k) for k in ("state", "workspace", "metadata")):
+                    return
+            snapshot = change
+        else:
+            # Like the table's merge upserts, fields left out of an update keep their value
+            snapshot = {**(current or {"workspace": None, "metadata": {}}),
+                        **{k: v for k, v in change.items() if v is not None}}
+        topic.current = {"run_id": topic.run_id, **{k: snapshot.get(k) for k in ("state", "workspace", "metadata", "updated_at")}}
+        topic.seq += 1
+        metrics.incr("run_events_published")
+        for queue in topic.subscribers:
+            if queue.full():
+                queue.get_nowait()
+                metrics.incr("run_events_dropped")
+            queue.put_nowait((topic.seq, topic.current))
+
+    async def _watch(self, topic: _Topic, state_service) -> None:
+        while True:
+            try:
+                state = await state_service.get_state(topic.run_id)
+                metrics.incr("run_events_upstream_reads")
+                self._update(topic, state, upstream=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Failed to read state of run {topic.run_id} for its subscribers: {str(e)}")
+            if topic.current is not None and topic.current["state"] in SETTLED_RUN_STATES:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    def _set_gauges(self) -> None:
+        metrics.set_gauge("run_events_topics", len(self._topics))
+        metrics.set_gauge("run_events_subscribers", sum(len(t.subscribers) for t in self._topics.values()))
+
+    async def close(self) -> None:
+        for topic in list(self._topics.values()):
+            topic.watcher.cancel()
+        self._topics.clear()
+
+# Shared by the StateService and the events endpoint
+run_events = RunEvents(get_run_events_poll_seconds())
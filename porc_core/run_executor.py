@@ -0,0 +1,120 @@
+"""
+PORC Core Run Executor: Runs long operations such as applies in the background.
+
+Endpoints enqueue a job for a run and answer 202 right away; the job runs on
+the API's event loop, at most max_concurrent at a time and one per run. Jobs
+checkpoint their progress in the StateService, so the ones cancelled by a
+shutdown are picked up again by the next process instead of starting over.
+
+While a job runs, its process renews a lease on the run. Other replicas only
+resume a run whose lease has expired, i.e. whose process is gone; a process
+that shuts down releases the leases of the jobs it cancels, so the next one
+can resume them right away.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+from porc_common import metrics
+from porc_common.config import get_run_executor_workers, get_run_lease_seconds
+from . import deadline
+
+class RunExecutor:
+    """Background jobs keyed by run id."""
+    def __init__(self, max_concurrent: int, lease_seconds: int):
+        self.max_concurrent = max_concurrent
+        self.lease_seconds = lease_seconds
+        # Lease owner of this process's runs
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # State services holding the leases of running jobs, by run id
+        self._leases: Dict[str, object] = {}
+
+    @property
+    def active(self) -> int:
+        return len(self._tasks)
+
+    def get(self, run_id: str) -> Optional[asyncio.Task]:
+        """The job of a run, while it is queued or running."""
+        return self._tasks.get(run_id)
+
+    def submit(self, run_id: str, job: Callable[[], Awaitable], budget: Optional[float] = None,
+               state_service=None) -> Optional[asyncio.Task]:
+        """Start a job for a run; returns None if the run already has one.
+
+        The job runs under its own deadline of budget seconds from when it starts, not
+        the deadline of the request that submitted it. With a state_service, the run's
+        lease is renewed while the job is queued or running, and the job is cancelled
+        if the lease is lost to another process.
+        """
+        if run_id in self._tasks:
+            return None
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        task = asyncio.ensure_future(self._run(run_id, job, budget, state_service))
+        self._tasks[run_id] = task
+        if state_service is not None:
+            self._leases[run_id] = state_service
+        task.add_done_callback(lambda _: self._done(run_id, task))
+        metrics.set_gauge("run_executor_jobs", len(self._tasks))
+        return task
+
+    async def _run(self, run_id: str, job: Callable[[], Awaitable], budget: Optional[float], state_service):
+        deadline.start(None)  # the submitting request's deadline stays with the request
+        keeper = None
+        if state_service is not None:
+            keeper = asyncio.ensure_future(self._keep_lease(run_id, state_service, asyncio.current_task()))
+        try:
+            async with self._slots:
+                logging.info(f"Running background job for run {run_id}")
+                deadline.start(budget)
+                return await job()
+        finally:
+            if keeper is not None:
+                keeper.cancel()
+
+    async def _keep_lease(self, run_id: str, state_service, task: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                held = await asyncio.to_thread(state_service.take_lease, run_id, self.owner, self.lease_seconds)
+            except Exception as e:
+                logging.warning(f"Failed to renew the lease on run {run_id}: {str(e)}")
+                continue
+            if not held:
+                metrics.incr("run_executor_leases_lost")
+                logging.error(f"Lease on run {run_id} was taken by another process, stopping its job")
+                task.cancel()
+                return
+
+    def _done(self, run_id: str, task: asyncio.Task) -> None:
+        if self._tasks.get(run_id) is task:
+            del self._tasks[run_id]
+            self._leases.pop(run_id, None)
+        metrics.set_gauge("run_executor_jobs", len(self._tasks))
+        if not task.cancelled() and task.exception() is not None:
+            metrics.incr("run_executor_failures")
+            logging.error(f"Background job for run {run_id} failed: {str(task.exception())}")
+
+    async def close(self) -> None:
+        """Cancel every job and release its lease; checkpointed jobs resume in the next process."""
+        leases = dict(self._leases)
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for run_id, state_service in leases.items():
+            try:
+                await asyncio.to_thread(state_service.release_lease, run_id, self.owner)
+            except Exception as e:
+                logging.warning(f"Failed to release the lease on run {run_id}: {str(e)}")
+        self._tasks.clear()
+        self._leases.clear()
+        self._slots = None
+
+# Shared by the API process
+run_executor = RunExecutor(get_run_executor_workers(), get_run_lease_seconds())
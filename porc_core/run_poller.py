@@ -0,0 +1,212 @@
+"""
+PORC Core Run Poller: One background poller shared by every waiter on a TFE run
+or configuration version.
+
+Each tracked id is checked on its own schedule, with exponential backoff and
+jitter chosen from the phase it was last seen in. All checks share a global
+request budget, and waiters are woken through futures. Webhook notifications
+can short-circuit a wait through notify().
+"""
+import asyncio
+import heapq
+import logging
+import random
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from porc_common.config import (
+    get_tfe_notification_token,
+    get_tfe_poll_fallback_seconds,
+    get_tfe_poll_requests_per_second
+)
+from porc_common.errors import TFEServiceError
+
+# Base seconds between checks for each phase; unknown phases use DEFAULT_INTERVAL
+RUN_PHASE_INTERVALS = {
+    "pending": 10,
+    "fetching": 5,
+    "queuing": 5,
+    "plan_queued": 10,
+    "apply_queued": 10,
+    "planning": 5,
+    "cost_estimating": 3,
+    "policy_checking": 3,
+    "post_plan_running": 3,
+    "confirmed": 3,
+    "applying": 5,
+}
+CONFIG_PHASE_INTERVALS = {
+    "pending": 1,
+    "fetching": 1,
+}
+DEFAULT_INTERVAL = 5
+
+class _Tracked:
+    """Polling state for one run or configuration version."""
+    def __init__(self, key: Tuple[str, str], fetch: Callable[[], Awaitable[str]],
+                 intervals: Dict[str, float], notifiable: bool):
+        self.key = key
+        self.fetch = fetch
+        self.intervals = intervals
+        self.notifiable = notifiable
+        self.waiters: List[Tuple[asyncio.Future, frozenset, frozenset]] = []
+        self.status: Optional[str] = None
+        self.attempts = 0
+        self.errors = 0
+        self.next_at = 0.0
+
+class RunPoller:
+    """Multiplexes status checks for all outstanding TFE runs and configuration versions."""
+    def __init__(self, requests_per_second: float = 10, backoff: float = 1.5, max_interval: float = 60,
+                 jitter: float = 0.2, fallback_interval: Optional[float] = None, max_errors: int = 5):
+        """fallback_interval, if set, is the minimum interval for runs whose completion is also notified by webhook."""
+        self.requests_per_second = requests_per_second
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.fallback_interval = fallback_interval
+        self.max_errors = max_errors
+        self._tracked: Dict[Tuple[str, str], _Tracked] = {}
+        self._schedule: List[Tuple[float, Tuple[str, str]]] = []
+        self._next_slot = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def outstanding(self) -> int:
+        """Number of ids currently being polled."""
+        return len(self._tracked)
+
+    async def wait_run(self, run_id: str, fetch: Callable[[], Awaitable[str]], targets: Iterable[str],
+                       failures: Iterable[str] = ()) -> str:
+        """Wait until a run reaches one of the target statuses and return it."""
+        return await self._wait(("run", run_id), fetch, RUN_PHASE_INTERVALS, True, targets, failures)
+
+    async def wait_configuration(self, config_version_id: str, fetch: Callable[[], Awaitable[str]],
+                                 targets: Iterable[str], failures: Iterable[str] = ()) -> str:
+        """Wait until a configuration version reaches one of the target statuses and return it."""
+        return await self._wait(("configuration-version", config_version_id), fetch,
+                                CONFIG_PHASE_INTERVALS, False, targets, failures)
+
+    def notify(self, run_id: str, status: str) -> None:
+        """Feed a status reported out of band (e.g. by a TFE notification) for a run."""
+        tracked = self._tracked.get(("run", run_id))
+        if tracked is not None:
+            self._observe(tracked, status, asyncio.get_running_loop().time())
+
+    async def close(self) -> None:
+        """Stop polling and cancel all waiters."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for tracked in self._tracked.values():
+            for future, _, _ in tracked.waiters:
+                future.cancel()
+        self._tracked.clear()
+        self._schedule.clear()
+
+    async def _wait(self, key, fetch, intervals, notifiable, targets, failures) -> str:
+        loop = asyncio.get_running_loop()
+        tracked = self._tracked.get(key)
+        if tracked is None:
+            tracked = _Tracked(key, fetch, intervals, notifiable)
+            self._tracked[key] = tracked
+            self._reschedule(tracked, loop.time())
+        future = loop.create_future()
+        tracked.waiters.append((future, frozenset(targets), frozenset(failures)))
+        self._ensure_running()
+        try:
+            return await future
+        finally:
+            tracked.waiters = [w for w in tracked.waiters if w[0] is not future]
+            if not tracked.waiters and self._tracked.get(key) is tracked:
+                del self._tracked[key]
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+        self._wakeup.set()
+
+    def _reschedule(self, tracked: _Tracked, now: float, delay: float = 0.0) -> None:
+        tracked.next_at = now + delay
+        heapq.heappush(self._schedule, (tracked.next_at, tracked.key))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _interval(self, tracked: _Tracked) -> float:
+        """Seconds until the next check: phase base, backed off, jittered and floored by the fallback."""
+        base = tracked.intervals.get(tracked.status, DEFAULT_INTERVAL)
+        delay = min(self.max_interval, base * (self.backoff ** tracked.attempts))
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        if tracked.notifiable and self.fallback_interval:
+            delay = max(delay, self.fallback_interval)
+        return delay
+
+    def _observe(self, tracked: _Tracked, status: str, now: float) -> None:
+        """Record a status, resolve matching waiters and schedule the next check."""
+        if status != tracked.status:
+            tracked.status = status
+            tracked.attempts = 0
+        else:
+            tracked.attempts += 1
+        tracked.errors = 0
+        for future, targets, failures in list(tracked.waiters):
+            if future.done():
+                continue
+            if status in targets:
+                future.set_result(status)
+            elif status in failures:
+                future.set_exception(TFEServiceError(-1, f"{tracked.key[0]} {tracked.key[1]} reached status: {status}"))
+        if any(not w[0].done() for w in tracked.waiters):
+            self._reschedule(tracked, now, self._interval(tracked))
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._tracked:
+            self._wakeup.clear()
+            now = loop.time()
+            while self._schedule and self._schedule[0][0] <= now:
+                due_at, key = heapq.heappop(self._schedule)
+                tracked = self._tracked.get(key)
+                if tracked is None or tracked.next_at != due_at:
+                    continue  # stale entry
+                # Global request budget: space checks 1/requests_per_second apart
+                if self._next_slot > now:
+                    self._reschedule(tracked, self._next_slot)
+                    continue
+                self._next_slot = now + 1.0 / self.requests_per_second
+                asyncio.ensure_future(self._check(tracked))
+            timeout = self._schedule[0][0] - loop.time() if self._schedule else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0, timeout) if timeout is not None else None)
+            except asyncio.TimeoutError:
+                pass
+        self._schedule.clear()
+        self._task = None
+
+    async def _check(self, tracked: _Tracked) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            status = await tracked.fetch()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            tracked.errors += 1
+            permanent = getattr(e, "status_code", None) == 404
+            if permanent or tracked.errors >= self.max_errors:
+                logging.error(f"Giving up polling {tracked.key[0]} {tracked.key[1]}: {str(e)}")
+                for future, _, _ in tracked.waiters:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            logging.warning(f"Polling {tracked.key[0]} {tracked.key[1]} failed ({tracked.errors}/{self.max_errors}): {str(e)}")
+            tracked.attempts += 1
+            self._reschedule(tracked, loop.time(), self._interval(tracked))
+            return
+        if self._tracked.get(tracked.key) is tracked:
+            self._observe(tracked, status, loop.time())
+
+# Shared by every TFE client in the process
+run_poller = RunPoller(
+    requests_per_second=get_tfe_poll_requests_per_second(),
+    fallback_interval=get_tfe_poll_fallback_seconds() if get_tfe_notification_token() else None
+)
@@ -0,0 +1,107 @@
+"""
+PORC Core Schema: Validates blueprint variables against the JSON Schema a QUILL ships.
+
+Each schema is compiled into a validator once and cached per kind and version,
+so validating a submission costs no storage round trip while the entry is fresh.
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from jsonschema import validators
+from jsonschema.exceptions import SchemaError
+from porc_common import metrics
+from porc_common.config import get_quill_cache_size, get_quill_cache_ttl_seconds
+from porc_common.errors import BlueprintValidationError
+from .storage import get_storage_service
+
+def format_error(error) -> str:
+    """Render a jsonschema error as '<path>: <message>'."""
+    path = "/".join(str(part) for part in error.absolute_path)
+    return f"{path or '<root>'}: {error.message}"
+
+def compile_schema(schema: Dict[str, Any]):
+    """Check a schema and return a validator for the draft it declares."""
+    cls = validators.validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema, format_checker=cls.FORMAT_CHECKER)
+
+def collect_errors(validator, variables: Dict[str, Any]) -> List[str]:
+    """Return every validation error, ordered by path so responses are stable."""
+    errors = sorted(validator.iter_errors(variables), key=lambda e: [str(p) for p in e.absolute_path])
+    return [format_error(e) for e in errors]
+
+class SchemaValidator:
+    def __init__(self, cache_size: Optional[int] = None, ttl: Optional[float] = None):
+        """Validators are kept in an LRU of cache_size entries and refetched after ttl seconds."""
+        self._storage_service = None
+        self.cache_size = cache_size if cache_size is not None else get_quill_cache_size()
+        self.ttl = ttl if ttl is not None else get_quill_cache_ttl_seconds()
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def storage_service(self):
+        """Lazy initialization of storage service."""
+        if self._storage_service is None:
+            self._storage_service = get_storage_service()
+        return self._storage_service
+
+    @storage_service.setter
+    def storage_service(self, service):
+        """Use a shared storage service instead of creating one."""
+        self._storage_service = service
+
+    def get_validator(self, kind: str, version: str = "latest"):
+        """Return the compiled validator for a QUILL, or None if it ships no schema."""
+        key = (kind, version)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and now - cached[1] < self.ttl:
+                self._cache.move_to_end(key)
+                metrics.incr("schema_cache_hits")
+                return cached[0]
+
+        metrics.incr("schema_cache_misses")
+        try:
+            schema = self.storage_service.get_quill_schema(kind, version)
+        except Exception as e:
+            # Validation is skipped rather than blocking submissions when storage is unavailable
+            logging.warning(f"Could not load schema for QUILL {kind}/{version}: {str(e)}")
+            return None
+        try:
+            validator = compile_schema(schema) if schema is not None else None
+        except SchemaError as e:
+            logging.error(f"Invalid schema for QUILL {kind}/{version}: {e.message}")
+            validator = None
+
+        with self._lock:
+            self._cache[key] = (validator, now)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return validator
+
+    def validate(self, kind: str, variables: Dict[str, Any], version: str = "latest") -> None:
+        """Raise BlueprintValidationError listing every schema violation in the variables."""
+        validator = self.get_validator(kind, version)
+        if validator is None:
+            metrics.incr("schema_validation_skipped")
+            logging.warning(f"No usable schema for QUILL {kind}/{version}, variables of this kind are not validated")
+            return
+        errors = collect_errors(validator, variables)
+        if errors:
+            metrics.incr("schema_validation_failures")
+            raise BlueprintValidationError(errors)
+
+    def invalidate(self, kind: Optional[str] = None, version: Optional[str] = None) -> None:
+        """Drop cached validators for a kind/version, a whole kind, or everything."""
+        with self._lock:
+            for key in list(self._cache):
+                if (kind is None or key[0] == kind) and (version is None or key[1] == version):
+                    del self._cache[key]
+
+# Initialize the schema validator
+schema_validator = SchemaValidator()
@@ -5,12 +5,21 @@ import os
 import logging
 import json
 import time
+import hashlib
 from datetime import datetime
 from enum import Enum
-from typing import Dict, Any, Optional
-from azure.data.tables import TableServiceClient, TableClient
-from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from typing import Dict, Any, List, Optional, Tuple
+from azure.data.tables import TableServiceClient, TableClient, UpdateMode
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
 import asyncio
+from porc_common.config import get_run_lease_seconds
+from porc_common.errors import BackendUnavailableError, DeadlineExceededError
+from . import deadline
+from .circuit import get_circuit, guarded, is_azure_outage
+from .run_events import run_events
+
+tables_circuit = get_circuit("tables", is_azure_outage)
 
 class RunState(str, Enum):
     SUBMITTED = "submitted"
@@ -24,6 +33,17 @@ class RunState(str, Enum):
     APPLY_FAILED = "apply_failed"
     CANCELLED = "cancelled"
 
+# States of the run driving a TFE run, in order of preference
+TFE_RUN_OWNER_STATES = [RunState.APPLYING.value, RunState.PLANNING.value]
+
+def pick_tfe_run_owner(runs: List[Tuple[str, Optional[str]]]) -> Optional[str]:
+    """The run id, of (run id, state) pairs sharing a TFE run, that the TFE run's progress belongs to."""
+    for state in TFE_RUN_OWNER_STATES:
+        for run_id, run_state in runs:
+            if run_state == state:
+                return run_id
+    return runs[0][0] if runs else None
+
 class StateService:
     def __init__(self, table_name: Optional[str] = None):
         """Initialize state service with Azure Table Storage."""
@@ -52,6 +72,13 @@ class StateService:
             self._table_client = self.table_service.get_table_client(self.table_name)
         return self._table_client
     
+    def close(self):
+        """Close the table clients and their connection pools."""
+        if self._table_client is not None:
+            self._table_client.close()
+        if self._table_service is not None:
+            self._table_service.close()
+    
     def _ensure_table_exists(self):
         """Ensure the state table exists."""
         try:
@@ -60,15 +87,15 @@ class StateService:
         except ResourceExistsError:
             logging.info(f"Using existing state table: {self.table_name}")
     
+    @guarded(tables_circuit)
+    def _get_entity(self, key: str):
+        return self.table_client.get_entity(partition_key=key, row_key=key, **deadline.azure_kwargs())
+    
     async def get_state(self, run_id: str) -> Dict[str, Any]:
         """Get the current state of a run."""
         try:
             # Run the synchronous Azure Table Storage operation in a thread pool
-            loop = asyncio.get_event_loop()
-            entity = await loop.run_in_executor(
-                None,
-                lambda: self.table_client.get_entity(partition_key=run_id, row_key=run_id)
-            )
+            entity = await asyncio.to_thread(self._get_entity, run_id)
             
             # Convert entity to dictionary and parse metadata if present
             state_dict = {
@@ -96,6 +123,8 @@ class StateService:
                 "state": RunState.SUBMITTED.value,
                 "metadata": {}
             }
+        except (BackendUnavailableError, DeadlineExceededError):
+            raise
         except Exception as e:
             logging.error(f"Failed to get state for run {run_id}: {str(e)}")
             # Return default state on error
@@ -104,15 +133,18 @@ class StateService:
                 "metadata": {}
             }
     
+    @guarded(tables_circuit)
     def update_state(self, run_id: str, state: RunState, 
                     workspace: Optional[str] = None,
-                    metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Update the state of a run."""
+                    metadata: Optional[Dict[str, Any]] = None,
+                    tfe_run_id: Optional[str] = None,
+                    lease_owner: Optional[str] = None) -> Dict[str, Any]:
+        """Update the state of a run; with lease_owner, the owner also takes the run's lease."""
         try:
-            # Check for concurrent operations on the same workspace
+            # Check for concurrent operations on the same workspace by other runs
             if workspace:
-                query = f"workspace eq '{workspace}' and (state eq '{RunState.PLANNING.value}' or state eq '{RunState.APPLYING.value}')"
-                entities = self.table_client.query_entities(query)
+                query = f"workspace eq '{workspace}' and PartitionKey ne '{run_id}' and (state eq '{RunState.PLANNING.value}' or state eq '{RunState.APPLYING.value}')"
+                entities = self.table_client.query_entities(query, **deadline.azure_kwargs())
                 if list(entities):
                     raise ValueError(f"Workspace {workspace} has a concurrent operation in progress")
             
@@ -127,12 +159,133 @@ class StateService:
                 entity['workspace'] = workspace
             if metadata:
                 entity['metadata'] = json.dumps(metadata)
+            if tfe_run_id:
+                entity['tfe_run_id'] = tfe_run_id
+            if lease_owner:
+                entity['lease_owner'] = lease_owner
+                entity['lease_expires_at'] = int(time.time()) + get_run_lease_seconds()
             
-            self.table_client.upsert_entity(entity)
+            self.table_client.upsert_entity(entity, **deadline.azure_kwargs())
+            run_events.publish(run_id, state.value, workspace=workspace, metadata=metadata,
+                               updated_at=entity['updated_at'])
             return entity
+        except DeadlineExceededError:
+            raise
         except Exception as e:
             raise ValueError(f"Failed to update state: {str(e)}")
     
+    @guarded(tables_circuit)
+    async def find_run_by_tfe_run_id(self, tfe_run_id: str) -> Optional[str]:
+        """Find the PORC run that owns a TFE run.
+
+        Runs that reused a plan share its TFE run; the one applying or planning it wins.
+        """
+        query = f"tfe_run_id eq '{tfe_run_id}'"
+        entities = await asyncio.to_thread(
+            lambda: list(self.table_client.query_entities(query, select=["PartitionKey", "state"], **deadline.azure_kwargs()))
+        )
+        return pick_tfe_run_owner([(entity["PartitionKey"], entity.get("state")) for entity in entities])
+    
+    @guarded(tables_circuit)
+    async def find_runs_in_state(self, state: RunState) -> List[Dict[str, Any]]:
+        """Runs currently in a state, e.g. applies to resume after a restart."""
+        query = f"state eq '{state.value}'"
+        entities = await asyncio.to_thread(
+            lambda: list(self.table_client.query_entities(query, **deadline.azure_kwargs()))
+        )
+        return [
+            {
+                "run_id": entity["PartitionKey"],
+                "workspace": entity.get("workspace"),
+                "tfe_run_id": entity.get("tfe_run_id"),
+                "lease_owner": entity.get("lease_owner"),
+                "lease_expires_at": entity.get("lease_expires_at"),
+                "metadata": json.loads(entity["metadata"]) if entity.get("metadata") else {}
+            }
+            for entity in entities
+        ]
+    
+    @guarded(tables_circuit)
+    def take_lease(self, run_id: str, owner: str, ttl: Optional[int] = None) -> bool:
+        """Take or renew the lease of the process driving a run; False while another owner's lease is live.
+
+        The write is conditional on the entity being unchanged since it was read, so of
+        two processes taking an expired lease at once only one succeeds.
+        """
+        ttl = ttl if ttl is not None else get_run_lease_seconds()
+        for _ in range(3):
+            try:
+                entity = self.table_client.get_entity(partition_key=run_id, row_key=run_id)
+            except ResourceNotFoundError:
+                return False
+            now = int(time.time())
+            if entity.get("lease_owner") not in (None, "", owner) and (entity.get("lease_expires_at") or 0) > now:
+                return False
+            try:
+                self.table_client.update_entity(
+                    {'PartitionKey': run_id, 'RowKey': run_id, 'lease_owner': owner, 'lease_expires_at': now + ttl},
+                    mode=UpdateMode.MERGE,
+                    etag=entity.metadata["etag"],
+                    match_condition=MatchConditions.IfNotModified
+                )
+                return True
+            except ResourceModifiedError:
+                continue  # written in between, e.g. a state update; look at the lease again
+        return False
+    
+    @guarded(tables_circuit)
+    def release_lease(self, run_id: str, owner: str) -> None:
+        """Give up owner's lease on a run so another process can resume it without waiting for expiry."""
+        try:
+            entity = self.table_client.get_entity(partition_key=run_id, row_key=run_id)
+        except ResourceNotFoundError:
+            return
+        if entity.get("lease_owner") != owner:
+            return
+        try:
+            self.table_client.update_entity(
+                {'PartitionKey': run_id, 'RowKey': run_id, 'lease_owner': "", 'lease_expires_at': 0},
+                mode=UpdateMode.MERGE,
+                etag=entity.metadata["etag"],
+                match_condition=MatchConditions.IfNotModified
+            )
+        except ResourceModifiedError:
+            logging.warning(f"Lease on run {run_id} changed while being released, leaving it to expire")
+    
+    @staticmethod
+    def _applied_key(workspace: str) -> str:
+        return f"applied:{hashlib.sha256(workspace.encode('utf-8')).hexdigest()}"
+    
+    async def get_applied_bundle(self, workspace: str) -> Optional[Dict[str, Any]]:
+        """Get the bundle digest, run and blueprint identity last applied to a workspace."""
+        key = self._applied_key(workspace)
+        try:
+            entity = await asyncio.to_thread(self._get_entity, key)
+        except ResourceNotFoundError:
+            return None
+        return {
+            "bundle_digest": entity.get("bundle_digest"),
+            "run_id": entity.get("run_id"),
+            "workspace": entity.get("workspace"),
+            "identity": entity.get("identity"),
+            "applied_at": entity.get("applied_at")
+        }
+    
+    @guarded(tables_circuit)
+    def record_applied_bundle(self, workspace: str, bundle_digest: str, run_id: str, identity: Optional[str] = None):
+        """Remember the bundle a successful apply left a workspace at, whichever blueprint it belongs to."""
+        key = self._applied_key(workspace)
+        self.table_client.upsert_entity({
+            'PartitionKey': key,
+            'RowKey': key,
+            'workspace': workspace,
+            'bundle_digest': bundle_digest,
+            'run_id': run_id,
+            'identity': identity,
+            'applied_at': datetime.utcnow().isoformat()
+        })
+    
+    @guarded(tables_circuit)
     def acquire_lock(self, workspace: str, run_id: str, ttl: int = 300) -> bool:
         """Acquire a lock for a workspace operation."""
         try:
@@ -149,6 +302,7 @@ class StateService:
             logging.error(f"Failed to acquire lock: {str(e)}")
             return False
     
+    @guarded(tables_circuit)
     def release_lock(self, workspace: str, run_id: str):
         """Release a workspace lock."""
         try:
@@ -4,12 +4,15 @@ PORC Core Storage: Manages storage of deployment bundles and QUILLs.
 import os
 import logging
 import json
-import tempfile
-import zipfile
-from typing import Dict, Any, Optional, BinaryIO
+from typing import Dict, Any, Optional, BinaryIO, Tuple
 from datetime import datetime, timedelta
-from azure.storage.blob import BlobServiceClient, ContainerClient, generate_blob_sas, BlobSasPermissions
-from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobServiceClient, ContainerClient, ContentSettings, generate_blob_sas, BlobSasPermissions
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from .bundle import build_bundle, bundle_key
+from . import deadline
+from .circuit import get_circuit, guarded, is_azure_outage
+
+blob_circuit = get_circuit("blob", is_azure_outage)
 
 class StorageService:
     def __init__(self, bucket_name: Optional[str] = None):
@@ -28,6 +31,10 @@ class StorageService:
         self.blob_service = BlobServiceClient.from_connection_string(connection_string)
         self._ensure_container_exists()
     
+    def close(self):
+        """Close the underlying blob service client and its connection pool."""
+        self.blob_service.close()
+    
     def _ensure_container_exists(self):
         """Ensure the storage container exists."""
         try:
@@ -36,33 +43,40 @@ class StorageService:
             self.blob_service.create_container(self.bucket_name)
             logging.info(f"Created storage container: {self.bucket_name}")
     
-    def store_deployment_bundle(self, run_id: str, files: Dict[str, str]) -> str:
-        """Store deployment bundle in Azure Blob Storage and return the bundle key."""
-        # Create a temporary zip file
-        with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tmp:
-            with zipfile.ZipFile(tmp.name, 'w') as zf:
-                for name, content in files.items():
-                    zf.writestr(name, content)
+    @guarded(blob_circuit)
+    def store_deployment_bundle(self, run_id: str, files: Dict[str, str]) -> Tuple[str, str]:
+        """Store a deployment bundle by content digest and return its key and digest.
         
-        # Upload to Azure Blob Storage
-        bundle_key = f"bundles/{run_id}/{datetime.utcnow().isoformat()}.zip"
+        Identical renders produce the same digest, so an existing blob is reused instead of uploaded again.
+        """
+        archive, digest = build_bundle(files)
+        key = bundle_key(digest)
+        blob_client = self.blob_service.get_blob_client(container=self.bucket_name, blob=key)
+        if blob_client.exists(**deadline.azure_kwargs()):
+            logging.info(f"Reusing deployment bundle {key} for run {run_id}")
+            return key, digest
         try:
-            blob_client = self.blob_service.get_blob_client(container=self.bucket_name, blob=bundle_key)
-            with open(tmp.name, 'rb') as data:
-                blob_client.upload_blob(data, overwrite=True)
-            logging.info(f"Stored deployment bundle: {bundle_key}")
-            return bundle_key
-        finally:
-            os.unlink(tmp.name)  # Clean up temp file
+            blob_client.upload_blob(
+                archive,
+                overwrite=False,
+                content_settings=ContentSettings(content_type='application/gzip'),
+                **deadline.azure_kwargs()
+            )
+            logging.info(f"Stored deployment bundle {key} for run {run_id}")
+        except ResourceExistsError:
+            logging.info(f"Deployment bundle {key} was stored concurrently, reusing it")
+        return key, digest
     
+    @guarded(blob_circuit)
     def get_deployment_bundle(self, bundle_key: str) -> BinaryIO:
         """Get deployment bundle from Azure Blob Storage."""
         try:
             blob_client = self.blob_service.get_blob_client(container=self.bucket_name, blob=bundle_key)
-            return blob_client.download_blob().readall()
+            return blob_client.download_blob(**deadline.azure_kwargs()).readall()
         except ResourceNotFoundError:
             raise ValueError(f"Deployment bundle not found: {bundle_key}")
     
+    @guarded(blob_circuit)
     def store_quill(self, kind: str, version: str, templates: Dict[str, str]) -> str:
         """Store QUILL template in Azure Blob Storage and return the template key."""
         template_key = f"quills/{kind}/{version}/templates.json"
@@ -71,7 +85,8 @@ class StorageService:
             blob_client.upload_blob(
                 json.dumps(templates),
                 overwrite=True,
-                content_settings={'content_type': 'application/json'}
+                content_settings={'content_type': 'application/json'},
+                **deadline.azure_kwargs()
             )
             logging.info(f"Stored QUILL template: {template_key}")
             return template_key
@@ -80,13 +95,44 @@ class StorageService:
     
     def get_quill(self, kind: str, version: str) -> Dict[str, str]:
         """Get QUILL template from Azure Blob Storage."""
+        return self.get_quill_with_etag(kind, version)[0]
+    
+    @guarded(blob_circuit)
+    def get_quill_with_etag(self, kind: str, version: str) -> Tuple[Dict[str, str], str]:
+        """Get QUILL template from Azure Blob Storage along with the blob's ETag."""
+        template_key = f"quills/{kind}/{version}/templates.json"
+        try:
+            blob_client = self.blob_service.get_blob_client(container=self.bucket_name, blob=template_key)
+            downloader = blob_client.download_blob(**deadline.azure_kwargs())
+            templates = json.loads(downloader.readall().decode('utf-8'))
+            return templates, downloader.properties.etag
+        except ResourceNotFoundError:
+            raise ValueError(f"QUILL template not found: {template_key}")
+    
+    @guarded(blob_circuit)
+    def get_quill_etag(self, kind: str, version: str) -> str:
+        """Get the ETag of a QUILL template without downloading it."""
         template_key = f"quills/{kind}/{version}/templates.json"
         try:
             blob_client = self.blob_service.get_blob_client(container=self.bucket_name, blob=template_key)
-            return json.loads(blob_client.download_blob().readall().decode('utf-8'))
+            return blob_client.get_blob_properties(**deadline.azure_kwargs()).etag
         except ResourceNotFoundError:
             raise ValueError(f"QUILL template not found: {template_key}")
     
+    def get_quill_schema(self, kind: str, version: str) -> Optional[Dict[str, Any]]:
+        """Get the JSON Schema of a QUILL's variables, or None if none was published."""
+        data = self.get_blob_bytes(f"quills/{kind}/{version}/schema.json")
+        return json.loads(data.decode('utf-8')) if data is not None else None
+    
+    @guarded(blob_circuit)
+    def get_blob_bytes(self, key: str) -> Optional[bytes]:
+        """Download a blob, returning None if it does not exist."""
+        try:
+            blob_client = self.blob_service.get_blob_client(container=self.bucket_name, blob=key)
+            return blob_client.download_blob(**deadline.azure_kwargs()).readall()
+        except ResourceNotFoundError:
+            return None
+    
     def get_bundle_url(self, bundle_key: str, expiry_hours: int = 1) -> str:
         """Generate a temporary URL for accessing a bundle."""
         try:
@@ -3,12 +3,28 @@ TFE Client: Handles communication with Terraform Enterprise API.
 """
 import requests
 import time
+import asyncio
 import logging
 import sys
 import json
-from typing import Dict, Any, Optional
-from porc_common.config import get_tfe_token, get_tfe_api, get_tfe_org
-from porc_common.errors import TFEServiceError
+import hashlib
+import aiohttp
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from porc_common import metrics
+from porc_common.config import (
+    get_tfe_token,
+    get_tfe_api,
+    get_tfe_org,
+    get_tfe_max_retries,
+    get_tfe_retry_base_seconds,
+    get_tfe_retry_max_seconds
+)
+from porc_common.errors import BackendUnavailableError, TFEServiceError
+from porc_core import deadline
+from porc_core.circuit import get_circuit, guarded
+from porc_core.rate_limit import backoff_delay, get_bucket, retry_after_seconds
+from porc_core.run_poller import run_poller
 
 class JsonFormatter(logging.Formatter):
     def format(self, record):
@@ -26,6 +42,68 @@ handler = logging.StreamHandler(sys.stdout)
 handler.setFormatter(JsonFormatter())
 logging.basicConfig(level=logging.INFO, handlers=[handler], force=True)
 
+def is_tfe_outage(exc: BaseException) -> bool:
+    """Errors meaning Terraform Cloud is unreachable or failing, rather than rejecting one request."""
+    if isinstance(exc, TFEServiceError):
+        return exc.status_code == -1 or exc.status_code >= 500
+    return isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError, requests.RequestException))
+
+tfe_circuit = get_circuit("tfe", is_tfe_outage)
+
+# Permissions that allow creating configuration versions
+WRITE_PERMISSIONS = ["can_create_configuration_versions", "can_write"]
+
+# Token validation results by token fingerprint, shared by every client in the process
+_token_validations: Dict[str, Tuple[Dict[str, Any], Optional[float]]] = {}
+_token_validation_tasks: Dict[str, "asyncio.Task"] = {}
+# Seconds an inconclusive validation (TFE unreachable or failing) is trusted before checking again
+INCONCLUSIVE_VALIDATION_TTL = 30
+# Statuses that settle whether a token is usable, as opposed to outages
+DEFINITIVE_VALIDATION_STATUSES = [200, 401, 403, 404]
+
+def token_fingerprint(token: str) -> str:
+    """Identify a token in caches and logs without revealing it."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:12]
+
+def _record_validation(token: str, can_read: bool, permissions: List[str], error: Optional[str],
+                       definitive: bool = True) -> Dict[str, Any]:
+    """Cache a validation result: for good if TFE answered, briefly if it could not be reached."""
+    fingerprint = token_fingerprint(token)
+    result = {
+        "fingerprint": fingerprint,
+        "valid": can_read and any(p in permissions for p in WRITE_PERMISSIONS),
+        "can_read": can_read,
+        "permissions": permissions,
+        "error": error,
+        "checked_at": datetime.utcnow().isoformat(),
+        "definitive": definitive
+    }
+    _token_validations[fingerprint] = (result, None if definitive else time.monotonic() + INCONCLUSIVE_VALIDATION_TTL)
+    return result
+
+def _cached_validation(fingerprint: str) -> Optional[Dict[str, Any]]:
+    cached = _token_validations.get(fingerprint)
+    if cached is None:
+        return None
+    result, expires_at = cached
+    if expires_at is not None and time.monotonic() >= expires_at:
+        _token_validations.pop(fingerprint, None)
+        return None
+    return result
+
+def _throttle(client, attempt: int, retry_after: Optional[str]) -> float:
+    """Pause a client's shared rate limiter after a 429 and return how long the request should wait."""
+    metrics.incr("tfe_rate_limited_responses")
+    delay = retry_after_seconds(retry_after)
+    if delay is None:
+        delay = backoff_delay(attempt, client.retry_base, client.retry_max)
+    client.rate_limiter.pause(delay)
+    return delay
+
+def get_token_validation(token: str) -> Optional[Dict[str, Any]]:
+    """Return the cached validation result for a token, if it has been validated."""
+    return _cached_validation(token_fingerprint(token))
+
 class TFEClient:
     """Client for interacting with the Terraform Enterprise (TFE) API."""
     def __init__(self, token=None, api_url=None, org=None):
@@ -69,16 +147,27 @@ class TFEClient:
             "Content-Type": "application/vnd.api+json"
         }
         self.timeout = 10  # seconds
-        self.max_retries = 3
-        self.retry_delay = 2
+        self.max_retries = get_tfe_max_retries()
+        self.retry_base = get_tfe_retry_base_seconds()
+        self.retry_max = get_tfe_retry_max_seconds()
+        # Shared by every client of this token and organization in the process
+        self.rate_limiter = get_bucket(f"tfe:{self.org}:{token_fingerprint(self.token)}")
         
-        # Test token permissions
+        # Test token permissions once per token, not on every client
+        if _cached_validation(token_fingerprint(self.token)) is None:
+            self.check_token_permissions()
+
+    def check_token_permissions(self) -> Dict[str, Any]:
+        """Check whether the token can read the organization and create configuration versions, caching the result."""
+        can_read, permissions, error, definitive = False, [], None, True
         try:
             # First test read permissions
             logging.info("Testing token read permissions...")
             test_url = f"{self.api_url}/api/v2/organizations/{self.org}"
             r = requests.get(test_url, headers=self.headers, timeout=self.timeout)
+            definitive = r.status_code in DEFINITIVE_VALIDATION_STATUSES
             if r.status_code == 200:
+                can_read = True
                 logging.info("✓ Token has read permissions")
             else:
                 logging.error(f"✗ Token lacks read permissions (status: {r.status_code})")
@@ -89,12 +178,13 @@ class TFEClient:
             logging.info("Testing token write permissions...")
             test_url = f"{self.api_url}/api/v2/account/details"
             r = requests.get(test_url, headers=self.headers, timeout=self.timeout)
+            definitive = definitive and r.status_code in DEFINITIVE_VALIDATION_STATUSES
             if r.status_code == 200:
                 data = r.json()
                 if "data" in data and "attributes" in data["data"]:
-                    entitlements = data["data"]["attributes"].get("permissions", [])
-                    logging.info(f"Token permissions: {', '.join(entitlements)}")
-                    if not any(p in entitlements for p in ["can_create_configuration_versions", "can_write"]):
+                    permissions = data["data"]["attributes"].get("permissions", [])
+                    logging.info(f"Token permissions: {', '.join(permissions)}")
+                    if not any(p in permissions for p in WRITE_PERMISSIONS):
                         logging.error("✗ Token lacks required write permissions for configuration versions")
                 else:
                     logging.error("✗ Could not determine token permissions")
@@ -102,9 +192,11 @@ class TFEClient:
                 logging.error(f"✗ Failed to check token permissions (status: {r.status_code})")
                 
         except Exception as e:
+            error, definitive = str(e), False
             logging.error(f"Failed to validate token permissions: {str(e)}")
             # Don't raise here - just warn and continue
             logging.warning("Token validation failed but continuing - some operations may fail")
+        return _record_validation(self.token, can_read, permissions, error, definitive)
 
     def _log_request_details(self, method: str, url: str, headers: Dict[str, str], **kwargs) -> None:
         """Log request details with sensitive information redacted."""
@@ -150,6 +242,7 @@ class TFEClient:
         # Combine with base URL
         return f"{self.api_url}/{endpoint}"
 
+    @guarded(tfe_circuit)
     def _request_with_retries(self, method: str, url: str, **kwargs) -> requests.Response:
         """Helper to perform HTTP requests with retries, timeout, and logging."""
         # Build complete URL if relative path provided
@@ -164,9 +257,14 @@ class TFEClient:
 
         for attempt in range(self.max_retries):
             try:
-                response = requests.request(method, url, headers=self.headers, timeout=self.timeout, **kwargs)
+                self.rate_limiter.acquire_blocking()
+                response = requests.request(method, url, headers=self.headers, timeout=deadline.timeout(self.timeout), **kwargs)
                 self._log_response_details(response)
 
+                if response.status_code == 429 and attempt < self.max_retries - 1:
+                    delay = _throttle(self, attempt, response.headers.get("Retry-After"))
+                    logging.warning(f"Rate limited by TFE on {url}; retrying in {delay:.1f}s")
+                    continue  # the paused rate limiter holds the retry back
                 if response.status_code == 401:
                     raise TFEServiceError(response.status_code, 
                         "Authentication failed. Please check your TFE_TOKEN is valid and has correct permissions.")
@@ -196,9 +294,11 @@ class TFEClient:
 
                 return response
             except requests.RequestException as e:
+                deadline.check()
                 if attempt < self.max_retries - 1:
-                    logging.warning(f"Request attempt {attempt + 1} failed: {str(e)}. Retrying...")
-                    time.sleep(self.retry_delay)
+                    delay = backoff_delay(attempt, self.retry_base, self.retry_max)
+                    logging.warning(f"Request attempt {attempt + 1} failed: {str(e)}. Retrying in {delay:.1f}s...")
+                    time.sleep(deadline.timeout(delay))
                 else:
                     logging.error(f"Request to {url} failed after {self.max_retries} attempts: {e}")
                     raise TFEServiceError(-1, f"Request to {url} failed after {self.max_retries} attempts: {e}")
@@ -308,6 +408,7 @@ class TFEClient:
         start_time = time.time()
         
         while True:
+            deadline.check()
             if time.time() - start_time > max_wait_seconds:
                 raise TFEServiceError(-1, f"Configuration version {config_version_id} did not finish processing within {max_wait_seconds} seconds")
                 
@@ -329,7 +430,7 @@ class TFEClient:
             elif status in ["errored", "failed"]:
                 raise TFEServiceError(-1, f"Configuration version {config_version_id} failed processing with status: {status}")
                 
-            time.sleep(2)  # Wait 2 seconds before checking again
+            time.sleep(deadline.timeout(2))  # Wait 2 seconds before checking again
 
     def create_plan(self, workspace_id, bundle_url):
         """Create a new plan using a configuration bundle URL."""
@@ -379,6 +480,7 @@ class TFEClient:
         """Wait for a run to complete and return its final status."""
         endpoint = f"runs/{run_id}"
         while True:
+            deadline.check()
             r = self._request_with_retries("GET", endpoint)
             if r.status_code != 200:
                 logging.error(f"Failed to get run status: {r.text}")
@@ -390,7 +492,7 @@ class TFEClient:
             status = data["data"]["attributes"]["status"]
             if status in ["planned_and_finished", "applied", "errored", "canceled", "discarded"]:
                 return status
-            time.sleep(5)  # Wait 5 seconds before checking again
+            time.sleep(deadline.timeout(5))  # Wait 5 seconds before checking again
 
     def get_plan_output(self, run_id):
         """Get the plan output for a run."""
@@ -435,4 +537,520 @@ class TFEClient:
         if r.status_code != 202:
             logging.error(f"Failed to apply run: {r.text}")
             raise TFEServiceError(r.status_code, f"{endpoint}: {r.text}")
-        return True
\ No newline at end of file
+        return True
+
+
+
+
+# 5xx statuses that mean a request never reached TFE, so even writes are safe to retry
+GATEWAY_ERROR_STATUSES = [502, 503, 504]
+# Run statuses after which TFE will not make further progress on its own.
+FINAL_RUN_STATUSES = ["planned_and_finished", "applied", "errored", "canceled", "discarded", "force_canceled"]
+# Run statuses in which a plan is finished and waiting to be confirmed
+CONFIRMABLE_RUN_STATUSES = ["planned", "cost_estimated", "policy_checked", "policy_override", "post_plan_completed"]
+# Run statuses of a run still queued behind another run in its workspace
+QUEUED_RUN_STATUSES = ["pending", "plan_queued"]
+# Message prefix of the runs PORC creates
+PORC_RUN_MESSAGE_PREFIX = "PORC run "
+
+
+class AsyncTFEClient:
+    """Asynchronous client for the TFE API built on a pooled keep-alive aiohttp session.
+
+    Mirrors the operations of TFEClient but never blocks the event loop, so it is
+    safe to use from FastAPI request handlers.
+    """
+    def __init__(self, token=None, api_url=None, org=None, session: Optional[aiohttp.ClientSession] = None):
+        """Initialize the client. A session may be shared between clients; otherwise one is created lazily."""
+        self.token = token or get_tfe_token()
+        if not self.token:
+            raise ValueError("TFE_TOKEN environment variable is not set")
+
+        raw_api_url = api_url or get_tfe_api()
+        if not raw_api_url:
+            raise ValueError("TFE_API environment variable is not set")
+
+        self.api_url = raw_api_url.rstrip('/')
+        if self.api_url.endswith('/api/v2'):
+            self.api_url = self.api_url[:-len('/api/v2')]
+        if not self.api_url.startswith(('http://', 'https://')):
+            raise ValueError(f"Invalid API URL format: {self.api_url}")
+
+        self.org = org or get_tfe_org()
+        if not self.org:
+            raise ValueError("TFE_ORG environment variable is not set")
+
+        self.headers = {
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": "application/vnd.api+json"
+        }
+        self.timeout = 10  # seconds
+        self.max_retries = get_tfe_max_retries()
+        self.retry_base = get_tfe_retry_base_seconds()
+        self.retry_max = get_tfe_retry_max_seconds()
+        # Shared by every client of this token and organization in the process
+        self.rate_limiter = get_bucket(f"tfe:{self.org}:{token_fingerprint(self.token)}")
+        self._session = session
+        self._owns_session = session is None
+
+    @staticmethod
+    def create_session(limit: int = 100, keepalive_timeout: int = 30) -> aiohttp.ClientSession:
+        """Create a keep-alive session suitable for sharing between many clients."""
+        connector = aiohttp.TCPConnector(limit=limit, keepalive_timeout=keepalive_timeout)
+        return aiohttp.ClientSession(connector=connector)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Get the underlying session, creating a private one if none was supplied."""
+        if self._session is None or self._session.closed:
+            self._session = self.create_session()
+            self._owns_session = True
+        return self._session
+
+    async def close(self):
+        """Close the session if this client created it."""
+        if self._owns_session and self._session and not self._session.closed:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _build_url(self, endpoint: str) -> str:
+        """Build a complete API URL from an endpoint path."""
+        if endpoint.startswith(('http://', 'https://')):
+            return endpoint
+        endpoint = endpoint.strip('/')
+        if not endpoint.startswith('api/v2'):
+            endpoint = f"api/v2/{endpoint}"
+        return f"{self.api_url}/{endpoint}"
+
+    @staticmethod
+    def _error_message(prefix: str, text: str) -> str:
+        """Append JSON:API error details (or the raw body) to an error message."""
+        try:
+            error_data = json.loads(text)
+            if 'errors' in error_data:
+                return f"{prefix}\nError details:\n{json.dumps(error_data['errors'], indent=2)}"
+        except ValueError:
+            pass
+        return f"{prefix}\nResponse text: {text}"
+
+    @guarded(tfe_circuit)
+    async def _request_with_retries(self, method: str, url: str, **kwargs) -> Tuple[int, Dict[str, Any]]:
+        """Perform an API request with retries and return the status code and decoded JSON body."""
+        url = self._build_url(url)
+        logging.info(f"Making request: {method} {url}")
+        if kwargs.get('json'):
+            logging.debug(f"Request body: {json.dumps(kwargs['json'], indent=2)}")
+
+        for attempt in range(self.max_retries):
+            try:
+                await self.rate_limiter.acquire()
+                timeout = aiohttp.ClientTimeout(total=deadline.timeout(self.timeout))
+                async with self.session.request(method, url, headers=self.headers, timeout=timeout, **kwargs) as response:
+                    status = response.status
+                    text = await response.text()
+                    retry_after = response.headers.get("Retry-After")
+                logging.info(f"Response status: {status}")
+
+                if status == 429 and attempt < self.max_retries - 1:
+                    delay = _throttle(self, attempt, retry_after)
+                    logging.warning(f"Rate limited by TFE on {url}; retrying in {delay:.1f}s")
+                    continue  # the paused rate limiter holds the retry back
+                if status >= 500 and attempt < self.max_retries - 1 and (
+                        method == "GET" or status in GATEWAY_ERROR_STATUSES):
+                    delay = backoff_delay(attempt, self.retry_base, self.retry_max)
+                    logging.warning(f"TFE answered {status} on {url}; retrying in {delay:.1f}s...")
+                    await asyncio.sleep(deadline.timeout(delay))
+                    continue
+                if status == 401:
+                    # Validate the token again on next use
+                    _token_validations.pop(token_fingerprint(self.token), None)
+                    raise TFEServiceError(status,
+                        "Authentication failed. Please check your TFE_TOKEN is valid and has correct permissions.")
+                elif status == 403:
+                    raise TFEServiceError(status,
+                        "Authorization failed. Your token does not have permission to perform this action.")
+                elif status == 404:
+                    raise TFEServiceError(status, self._error_message(f"Resource not found: {url}", text))
+                elif status >= 400:
+                    logging.error(f"Error response body: {text}")
+                    raise TFEServiceError(status, self._error_message(f"TFE API Error ({status}): {url}", text))
+
+                try:
+                    data = json.loads(text) if text else {}
+                except ValueError:
+                    data = {}
+                return status, data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                deadline.check()
+                if attempt < self.max_retries - 1:
+                    delay = backoff_delay(attempt, self.retry_base, self.retry_max)
+                    logging.warning(f"Request attempt {attempt + 1} failed: {str(e)}. Retrying in {delay:.1f}s...")
+                    await asyncio.sleep(deadline.timeout(delay))
+                else:
+                    logging.error(f"Request to {url} failed after {self.max_retries} attempts: {e}")
+                    raise TFEServiceError(-1, f"Request to {url} failed after {self.max_retries} attempts: {e}")
+
+    @staticmethod
+    def _require(data: Dict[str, Any], endpoint: str, status: int, *attributes: str) -> Dict[str, Any]:
+        """Validate that a JSON:API document has an id and the given attributes."""
+        body = data.get("data") if isinstance(data, dict) else None
+        if not body or "id" not in body or any(a not in body.get("attributes", {}) for a in attributes):
+            logging.error(f"Malformed response from {endpoint}: {data}")
+            raise TFEServiceError(status, f"Malformed response from {endpoint}: {data}")
+        return body
+
+    async def check_token_permissions(self) -> Dict[str, Any]:
+        """Check whether the token can read the organization and create configuration versions, caching the result."""
+        can_read, permissions, error, definitive = False, [], None, True
+        try:
+            await self._request_with_retries("GET", f"organizations/{self.org}")
+            can_read = True
+            logging.info("✓ Token has read permissions")
+            status, data = await self._request_with_retries("GET", "account/details")
+            permissions = data.get("data", {}).get("attributes", {}).get("permissions", [])
+            logging.info(f"Token permissions: {', '.join(permissions)}")
+            if not any(p in permissions for p in WRITE_PERMISSIONS):
+                logging.error("✗ Token lacks required write permissions for configuration versions")
+        except (TFEServiceError, BackendUnavailableError) as e:
+            error = str(e)
+            # Only an answer about the token settles it; outages are checked again soon
+            definitive = isinstance(e, TFEServiceError) and e.status_code in DEFINITIVE_VALIDATION_STATUSES
+            logging.error(f"Failed to validate token permissions: {str(e)}")
+            logging.warning("Token validation failed but continuing - some operations may fail")
+        return _record_validation(self.token, can_read, permissions, error, definitive)
+
+    async def get_workspace_id(self, name: str) -> str:
+        """Get the workspace ID for a given workspace name."""
+        endpoint = f"organizations/{self.org}/workspaces/{name}"
+        status, data = await self._request_with_retries("GET", endpoint)
+        return self._require(data, endpoint, status)["id"]
+
+    async def get_workspace_name(self, workspace_id: str) -> str:
+        """Get the current name of a workspace by ID."""
+        endpoint = f"workspaces/{workspace_id}"
+        status, data = await self._request_with_retries("GET", endpoint)
+        return self._require(data, endpoint, status, "name")["attributes"]["name"]
+
+    async def create_workspace(self, name: str, org: Optional[str] = None, auto_apply: bool = False,
+                               execution_mode: str = "remote") -> str:
+        """Create a new workspace in the organization."""
+        endpoint = f"organizations/{org or self.org}/workspaces"
+        payload = {
+            "data": {
+                "type": "workspaces",
+                "attributes": {
+                    "name": name,
+                    "auto-apply": auto_apply,
+                    "execution-mode": execution_mode
+                }
+            }
+        }
+        status, data = await self._request_with_retries("POST", endpoint, json=payload)
+        return self._require(data, endpoint, status)["id"]
+
+    async def list_workspaces(self, search: str) -> List[Dict[str, str]]:
+        """List the id and name of workspaces whose name contains the search string."""
+        endpoint = f"organizations/{self.org}/workspaces"
+        workspaces, page = [], 1
+        while page:
+            status, data = await self._request_with_retries(
+                "GET", endpoint, params={"search[name]": search, "page[size]": 100, "page[number]": page})
+            workspaces.extend({"id": w["id"], "name": w["attributes"]["name"]} for w in data.get("data", []))
+            page = data.get("meta", {}).get("pagination", {}).get("next-page")
+        return workspaces
+
+    async def rename_workspace(self, workspace_id: str, name: str) -> None:
+        """Rename a workspace."""
+        endpoint = f"workspaces/{workspace_id}"
+        payload = {"data": {"type": "workspaces", "attributes": {"name": name}}}
+        status, data = await self._request_with_retries("PATCH", endpoint, json=payload)
+        self._require(data, endpoint, status, "name")
+
+    async def create_notification_configuration(self, workspace_id: str, url: str, token: str,
+                                                name: str = "porc") -> str:
+        """Subscribe a webhook URL to run notifications for a workspace."""
+        endpoint = f"workspaces/{workspace_id}/notification-configurations"
+        payload = {
+            "data": {
+                "type": "notification-configurations",
+                "attributes": {
+                    "destination-type": "generic",
+                    "enabled": True,
+                    "name": name,
+                    "url": url,
+                    "token": token,
+                    "triggers": [
+                        "run:planning", "run:needs_attention", "run:applying",
+                        "run:completed", "run:errored"
+                    ]
+                }
+            }
+        }
+        status, data = await self._request_with_retries("POST", endpoint, json=payload)
+        return self._require(data, endpoint, status)["id"]
+
+    async def create_config_version(self, workspace_id: str) -> Tuple[str, str]:
+        """Create a new configuration version and return its ID and upload URL."""
+        endpoint = f"api/v2/workspaces/{workspace_id}/configuration-versions"
+        payload = {
+            "data": {
+                "type": "configuration-versions",
+                "attributes": {"auto-queue-runs": False}
+            }
+        }
+        status, data = await self._request_with_retries("POST", endpoint, json=payload)
+        body = self._require(data, endpoint, status, "upload-url")
+        return body["id"], body["attributes"]["upload-url"]
+
+    @guarded(tfe_circuit)
+    async def upload_files(self, upload_url: str, data: bytes) -> None:
+        """Upload a configuration archive to the given upload URL."""
+        timeout = aiohttp.ClientTimeout(total=deadline.timeout(self.timeout))
+        async with self.session.put(upload_url, data=data, timeout=timeout,
+                                    headers={"Content-Type": "application/octet-stream"}) as r:
+            if r.status != 200:
+                text = await r.text()
+                logging.error(f"Failed to upload files to {upload_url}: {text}")
+                raise TFEServiceError(r.status, f"{upload_url}: {text}")
+
+    @guarded(tfe_circuit)
+    async def upload_from_url(self, upload_url: str, source_url: str, chunk_size: int = 64 * 1024) -> int:
+        """Stream a configuration archive from source_url (e.g. a blob SAS URL) to a TFE upload URL.
+        
+        Chunks are piped from the download into the upload, so memory use is bounded by
+        chunk_size regardless of bundle size. Returns the number of bytes transferred.
+        """
+        step = deadline.timeout(self.timeout)
+        timeout = aiohttp.ClientTimeout(total=deadline.remaining(), sock_connect=step, sock_read=step)
+        async with self.session.get(source_url, timeout=timeout) as source:
+            if source.status != 200:
+                error_msg = f"Failed to download bundle (status: {source.status})"
+                logging.error(error_msg)
+                raise TFEServiceError(source.status, error_msg)
+            headers = {"Content-Type": "application/octet-stream"}
+            if source.content_length is not None:
+                headers["Content-Length"] = str(source.content_length)
+            transferred = 0
+
+            async def chunks():
+                nonlocal transferred
+                async for chunk in source.content.iter_chunked(chunk_size):
+                    transferred += len(chunk)
+                    yield chunk
+
+            async with self.session.put(upload_url, data=chunks(), headers=headers, timeout=timeout) as r:
+                if r.status != 200:
+                    text = await r.text()
+                    logging.error(f"Failed to upload configuration to {upload_url}: {text}")
+                    raise TFEServiceError(r.status, f"{upload_url}: {text}")
+        logging.info(f"Streamed {transferred} bytes of configuration to TFE")
+        return transferred
+
+    async def create_run(self, workspace_id: str, config_version_id: str, auto_apply: bool = True,
+                         message: Optional[str] = None) -> str:
+        """Create a new run in the workspace; with auto_apply=False it stops for confirmation after planning."""
+        endpoint = "runs"
+        attributes = {"auto-apply": auto_apply}
+        if message:
+            attributes["message"] = message
+        payload = {
+            "data": {
+                "type": "runs",
+                "attributes": attributes,
+                "relationships": {
+                    "workspace": {
+                        "data": {"type": "workspaces", "id": workspace_id}
+                    },
+                    "configuration-version": {
+                        "data": {"type": "configuration-versions", "id": config_version_id}
+                    }
+                }
+            }
+        }
+        status, data = await self._request_with_retries("POST", endpoint, json=payload)
+        return self._require(data, endpoint, status)["id"]
+
+    async def get_run(self, run_id: str) -> Dict[str, Any]:
+        """Get the attributes of a run, including its status and available actions."""
+        endpoint = f"runs/{run_id}"
+        status, data = await self._request_with_retries("GET", endpoint)
+        return self._require(data, endpoint, status, "status")["attributes"]
+
+    async def list_runs(self, workspace_id: str, statuses: List[str]) -> List[Dict[str, Any]]:
+        """List the id, status and message of a workspace's runs in any of the given statuses."""
+        endpoint = f"workspaces/{workspace_id}/runs"
+        runs, page = [], 1
+        while page:
+            status, data = await self._request_with_retries(
+                "GET", endpoint, params={"filter[status]": ",".join(statuses), "page[size]": 100, "page[number]": page})
+            runs.extend({"id": r["id"], "status": r["attributes"].get("status"), "message": r["attributes"].get("message") or ""}
+                        for r in data.get("data", []))
+            page = data.get("meta", {}).get("pagination", {}).get("next-page")
+        return runs
+
+    async def discard_run(self, run_id: str, comment: Optional[str] = None) -> bool:
+        """Discard a run waiting for confirmation; return False if it can no longer be discarded."""
+        endpoint = f"runs/{run_id}/actions/discard"
+        payload = {"comment": comment} if comment else None
+        try:
+            await self._request_with_retries("POST", endpoint, json=payload)
+        except TFEServiceError as e:
+            if e.status_code == 409:
+                return False
+            raise
+        return True
+
+    async def discard_unconfirmed_runs(self, workspace_id: str) -> List[str]:
+        """Discard PORC runs waiting for confirmation, which would hold up the workspace's run queue."""
+        discarded = []
+        for run in await self.list_runs(workspace_id, CONFIRMABLE_RUN_STATUSES):
+            if not run["message"].startswith(PORC_RUN_MESSAGE_PREFIX):
+                continue  # not ours to discard
+            if await self.discard_run(run["id"], comment="Superseded by a newer PORC plan"):
+                logging.info(f"Discarded unconfirmed run {run['id']} in workspace {workspace_id}")
+                discarded.append(run["id"])
+        return discarded
+
+    async def get_run_status(self, run_id: str) -> str:
+        """Get the current status of a run."""
+        return (await self.get_run(run_id))["status"]
+
+    async def get_plan_summary(self, run_id: str) -> Dict[str, Any]:
+        """Get a run's status together with the status and resource counts of its plan."""
+        endpoint = f"runs/{run_id}"
+        status, data = await self._request_with_retries("GET", endpoint, params={"include": "plan"})
+        run = self._require(data, endpoint, status, "status")
+        plan = next((i for i in data.get("included", []) if i.get("type") == "plans"), {})
+        attributes = plan.get("attributes", {})
+        return {
+            "run_status": run["attributes"]["status"],
+            "plan_status": attributes.get("status"),
+            "resource_additions": attributes.get("resource-additions"),
+            "resource_changes": attributes.get("resource-changes"),
+            "resource_destructions": attributes.get("resource-destructions")
+        }
+
+    async def get_current_state_serial(self, workspace_id: str) -> int:
+        """Get the serial of a workspace's current state version, 0 if it has no state yet."""
+        endpoint = f"workspaces/{workspace_id}/current-state-version"
+        try:
+            status, data = await self._request_with_retries("GET", endpoint)
+        except TFEServiceError as e:
+            if e.status_code == 404:
+                return 0
+            raise
+        return self._require(data, endpoint, status, "serial")["attributes"]["serial"]
+
+    async def get_config_version_status(self, config_version_id: str) -> str:
+        """Get the current status of a configuration version."""
+        endpoint = f"configuration-versions/{config_version_id}"
+        status, data = await self._request_with_retries("GET", endpoint)
+        return self._require(data, endpoint, status, "status")["attributes"]["status"]
+
+    async def wait_for_configuration(self, config_version_id: str, max_wait_seconds: Optional[float] = None) -> None:
+        """Wait for a configuration version to be processed, by default for as long as the deadline allows."""
+        if max_wait_seconds is None and deadline.remaining() is None:
+            max_wait_seconds = 30
+        try:
+            await deadline.wait(
+                run_poller.wait_configuration(
+                    config_version_id,
+                    lambda: self.get_config_version_status(config_version_id),
+                    targets=["uploaded"],
+                    failures=["errored", "failed"]
+                ),
+                max_wait_seconds
+            )
+        except asyncio.TimeoutError:
+            raise TFEServiceError(-1, f"Configuration version {config_version_id} did not finish processing within {max_wait_seconds} seconds")
+
+    async def create_plan(self, workspace_id: str, bundle_url: str, message: Optional[str] = None) -> str:
+        """Create a plan-only run from a configuration bundle URL; it waits for confirmation before applying.
+
+        Earlier PORC plans still waiting for confirmation in the workspace are discarded first.
+        """
+        logging.info(f"Creating plan for workspace {workspace_id} with bundle {bundle_url}")
+        config_version_id, upload_url = await self.create_config_version(workspace_id)
+        logging.info(f"Created configuration version {config_version_id}")
+
+        await self.upload_from_url(upload_url, bundle_url)
+        await self.wait_for_configuration(config_version_id)
+
+        # An unconfirmed earlier plan would keep this one pending until it is confirmed or discarded
+        await self.discard_unconfirmed_runs(workspace_id)
+        run_id = await self.create_run(workspace_id, config_version_id, auto_apply=False, message=message)
+        logging.info(f"Created run {run_id} for workspace {workspace_id}")
+        return run_id
+
+    async def wait_for_run(self, run_id: str, targets=FINAL_RUN_STATUSES) -> str:
+        """Wait for a run to reach one of the target statuses (by default a final one) and return it."""
+        return await deadline.wait(run_poller.wait_run(run_id, lambda: self.get_run_status(run_id), targets=targets))
+
+    async def _get_log(self, endpoint: str) -> str:
+        """Fetch the log behind a plan or apply resource."""
+        status, data = await self._request_with_retries("GET", endpoint)
+        log_url = self._require(data, endpoint, status, "log-read-url")["attributes"]["log-read-url"]
+        timeout = aiohttp.ClientTimeout(total=deadline.timeout(self.timeout))
+        async with self.session.get(log_url, timeout=timeout) as r:
+            text = await r.text()
+            if r.status != 200:
+                logging.error(f"Failed to get log: {text}")
+                raise TFEServiceError(r.status, f"{log_url}: {text}")
+            return text
+
+    async def get_plan_output(self, run_id: str) -> str:
+        """Get the plan output for a run."""
+        return await self._get_log(f"runs/{run_id}/plan")
+
+    async def get_apply_output(self, run_id: str) -> str:
+        """Get the apply output for a run."""
+        return await self._get_log(f"runs/{run_id}/apply")
+
+    async def apply_run(self, run_id: str, comment: Optional[str] = None) -> None:
+        """Apply a run that has been planned."""
+        endpoint = f"runs/{run_id}/actions/apply"
+        payload = {"comment": comment} if comment else None
+        await self._request_with_retries("POST", endpoint, json=payload)
+
+
+_shared_session: Optional[aiohttp.ClientSession] = None
+
+def get_tfe_session() -> aiohttp.ClientSession:
+    """Get the process-wide keep-alive session used for TFE traffic."""
+    global _shared_session
+    if _shared_session is None or _shared_session.closed:
+        _shared_session = AsyncTFEClient.create_session()
+    return _shared_session
+
+async def close_tfe_session() -> None:
+    """Close the process-wide TFE session."""
+    global _shared_session
+    if _shared_session is not None and not _shared_session.closed:
+        await _shared_session.close()
+    _shared_session = None
+
+def get_tfe_client(token=None, api_url=None, org=None) -> AsyncTFEClient:
+    """Create a TFE client on the shared session; the token is validated in the background on first use."""
+    client = AsyncTFEClient(token=token, api_url=api_url, org=org, session=get_tfe_session())
+    fingerprint = token_fingerprint(client.token)
+    if _cached_validation(fingerprint) is None and fingerprint not in _token_validation_tasks:
+        task = asyncio.ensure_future(client.check_token_permissions())
+        _token_validation_tasks[fingerprint] = task
+        task.add_done_callback(lambda _: _token_validation_tasks.pop(fingerprint, None))
+    return client
+
+async def validate_token(client: AsyncTFEClient) -> Dict[str, Any]:
+    """Return the validation result for a client's token, waiting for a check already in flight."""
+    fingerprint = token_fingerprint(client.token)
+    cached = _cached_validation(fingerprint)
+    if cached is not None:
+        return cached
+    task = _token_validation_tasks.get(fingerprint)
+    if task is not None:
+        return await asyncio.shield(task)
+    return await client.check_token_permissions()
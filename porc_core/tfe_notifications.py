@@ -0,0 +1,46 @@
+"""
+PORC Core TFE Notifications: Verifies Terraform Cloud run notifications and
+turns them into run state transitions.
+"""
+import hashlib
+import hmac
+from typing import Any, Dict, List, Optional
+from .state import RunState
+
+SIGNATURE_HEADER = "X-TFE-Notification-Signature"
+
+# Run statuses TFE reports once a plan is ready for confirmation or finished
+PLANNED_RUN_STATUSES = ["planned", "cost_estimated", "policy_checked", "policy_override", "planned_and_finished"]
+FAILED_RUN_STATUSES = ["errored", "canceled", "discarded", "force_canceled"]
+
+def sign(body: bytes, token: str) -> str:
+    """Compute the HMAC-SHA512 signature TFE sends for a notification body."""
+    return hmac.new(token.encode("utf-8"), body, hashlib.sha512).hexdigest()
+
+def verify_signature(body: bytes, signature: Optional[str], token: str) -> bool:
+    """Check a notification body against its X-TFE-Notification-Signature header."""
+    if not signature or not token:
+        return False
+    return hmac.compare_digest(sign(body, token), signature.strip().lower())
+
+def latest_run_status(payload: Dict[str, Any]) -> Optional[str]:
+    """Return the most recent run status carried by a notification payload."""
+    notifications: List[Dict[str, Any]] = payload.get("notifications") or []
+    for notification in reversed(notifications):
+        if notification.get("run_status"):
+            return notification["run_status"]
+    return None
+
+def next_run_state(current_state: str, tfe_status: str) -> Optional[RunState]:
+    """Map a TFE run status onto the PORC state it advances a run to, if any."""
+    if current_state == RunState.PLANNING.value:
+        if tfe_status in PLANNED_RUN_STATUSES:
+            return RunState.PLANNED
+        if tfe_status in FAILED_RUN_STATUSES:
+            return RunState.PLAN_FAILED
+    elif current_state == RunState.APPLYING.value:
+        if tfe_status == "applied":
+            return RunState.APPLIED
+        if tfe_status in FAILED_RUN_STATUSES:
+            return RunState.APPLY_FAILED
+    return None
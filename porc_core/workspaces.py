@@ -0,0 +1,247 @@
+"""
+PORC Core Workspaces: Maps runs onto Terraform Cloud workspaces and creates them on demand.
+
+Applies are serialized per workspace, so the mapping strategy decides how many
+applies can run at once:
+
+- environment: one porc-{env} workspace for everything (the original layout)
+- repo: one workspace per source repository
+- blueprint: one workspace per source repository, blueprint kind and name
+- hash: identities spread over a fixed number of porc-{env}-NN buckets
+
+Workspace ids are cached by name. With WORKSPACE_POOL_SIZE set, a background
+pool keeps configured spare workspaces ready, and a new workspace is claimed by
+renaming a spare instead of being created on the critical path.
+"""
+import asyncio
+import hashlib
+import logging
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from porc_common import metrics
+from porc_common.config import (
+    get_tfe_org,
+    get_tfe_notification_token,
+    get_tfe_notification_url,
+    get_workspace_buckets,
+    get_workspace_id_ttl_seconds,
+    get_workspace_pool_size,
+    get_workspace_strategy
+)
+from porc_common.errors import TFEServiceError
+
+WORKSPACE_STRATEGIES = ["environment", "repo", "blueprint", "hash"]
+MAX_WORKSPACE_NAME_LENGTH = 90
+
+def sanitize_workspace_name(name: str) -> str:
+    """Convert repository name to valid workspace name."""
+    # Replace invalid characters with hyphens
+    name = re.sub(r'[^a-zA-Z0-9\-_]', '-', name)
+    # Ensure it starts with a letter or number
+    if not name[0].isalnum():
+        name = 'ws-' + name
+    name = name.lower()
+    # Keep long names unique by replacing their tail with a hash
+    if len(name) > MAX_WORKSPACE_NAME_LENGTH:
+        suffix = hashlib.sha256(name.encode("utf-8")).hexdigest()[:8]
+        name = f"{name[:MAX_WORKSPACE_NAME_LENGTH - 9]}-{suffix}"
+    return name
+
+def workspace_name_for(record: Optional[Dict[str, Any]], env: str, strategy: Optional[str] = None,
+                       buckets: Optional[int] = None) -> str:
+    """Name of the workspace a blueprint record is planned and applied in."""
+    strategy = strategy or get_workspace_strategy()
+    if strategy not in WORKSPACE_STRATEGIES:
+        raise ValueError(f"Invalid workspace strategy: {strategy}. Must be one of: {WORKSPACE_STRATEGIES}")
+    if strategy == "environment" or record is None:
+        return f"porc-{env}"
+
+    blueprint = record.get("blueprint", {})
+    source_repo = record.get("source_repo") or "unknown"
+    kind = blueprint.get("kind") or "unknown"
+    name = blueprint.get("name") or kind
+    if strategy == "repo":
+        return sanitize_workspace_name(f"porc-{env}-{source_repo}")
+    if strategy == "blueprint":
+        return sanitize_workspace_name(f"porc-{env}-{source_repo}-{kind}-{name}")
+
+    buckets = buckets or get_workspace_buckets()
+    identity = f"{source_repo}/{kind}/{name}"
+    bucket = int(hashlib.sha256(identity.encode("utf-8")).hexdigest(), 16) % buckets
+    return f"porc-{env}-{bucket:02d}"
+
+class WorkspaceIdCache:
+    """Workspace name to id, trusted for ttl seconds or until a call on the workspace returns 404."""
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl if ttl is not None else get_workspace_id_ttl_seconds()
+        self._ids: Dict[str, Tuple[str, float]] = {}
+
+    def get(self, name: str) -> Optional[str]:
+        cached = self._ids.get(name)
+        if cached is None or time.monotonic() - cached[1] >= self.ttl:
+            self._ids.pop(name, None)
+            metrics.incr("workspace_id_cache_misses")
+            return None
+        metrics.incr("workspace_id_cache_hits")
+        return cached[0]
+
+    def put(self, name: str, workspace_id: str) -> None:
+        self._ids[name] = (workspace_id, time.monotonic())
+
+    def invalidate(self, name: str) -> None:
+        self._ids.pop(name, None)
+
+class WorkspacePool:
+    """Spare, already configured workspaces that are renamed when a new workspace is needed."""
+    def __init__(self, size: int):
+        self.size = size
+        self.prefix: Optional[str] = None
+        self._ready: List[str] = []
+        self._tfe = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def available(self) -> int:
+        return len(self._ready)
+
+    def is_spare(self, name: str) -> bool:
+        """Whether a workspace name is one of this pool's spares, not another pool's or a claimed one."""
+        return re.fullmatch(rf"{re.escape(self.prefix)}-[0-9a-f]{{8}}", name) is not None
+
+    async def start(self, tfe, prefix: str) -> None:
+        """Adopt the spares already in TFE under this prefix, e.g. left by an earlier process, and start refilling."""
+        if self.size <= 0:
+            return
+        self._tfe, self.prefix = tfe, prefix
+        self._ready = [w["id"] for w in await tfe.list_workspaces(prefix) if self.is_spare(w["name"])]
+        logging.info(f"Workspace pool {prefix}: adopted {len(self._ready)} spare workspaces")
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._fill())
+
+    async def claim(self, tfe, name: str) -> Optional[str]:
+        """Rename a spare workspace to name and return its id, or None if no spare is ready."""
+        if self.size <= 0:
+            return None
+        while self._ready:
+            workspace_id = self._ready.pop()
+            self._wakeup.set()
+            try:
+                # Replicas share the pool, so the spare may have been claimed elsewhere since it was listed
+                if not self.is_spare(await tfe.get_workspace_name(workspace_id)):
+                    continue
+                await tfe.rename_workspace(workspace_id, name)
+            except TFEServiceError as e:
+                if e.status_code == 404:
+                    continue  # the spare was deleted behind our back
+                if e.status_code == 422:
+                    self._ready.append(workspace_id)  # the name was taken concurrently
+                raise
+            metrics.incr("workspace_pool_claims")
+            metrics.set_gauge("workspace_pool_ready", len(self._ready))
+            logging.info(f"Claimed pooled workspace {workspace_id} as {name}")
+            return workspace_id
+        metrics.incr("workspace_pool_misses")
+        return None
+
+    async def _fill(self) -> None:
+        delay = 1
+        while True:
+            if len(self._ready) >= self.size:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            name = f"{self.prefix}-{uuid.uuid4().hex[:8]}"
+            try:
+                workspace_id = await self._tfe.create_workspace(
+                    name=name, org=get_tfe_org(), auto_apply=False, execution_mode="remote")
+                await _configure_workspace(self._tfe, workspace_id, name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Failed to pre-provision workspace {name}: {str(e)}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+                continue
+            delay = 1
+            self._ready.append(workspace_id)
+            metrics.set_gauge("workspace_pool_ready", len(self._ready))
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+# Shared by every plan and apply in the process
+workspace_ids = WorkspaceIdCache()
+workspace_pool = WorkspacePool(get_workspace_pool_size())
+
+# Workspace creations in progress, so concurrent first runs of a blueprint create it once
+_creating: Dict[str, asyncio.Future] = {}
+
+async def ensure_workspace_exists(tfe, workspace_name: str) -> str:
+    """Ensure workspace exists, create if it doesn't."""
+    workspace_id = workspace_ids.get(workspace_name)
+    if workspace_id is not None:
+        return workspace_id
+    try:
+        logging.info(f"Checking if workspace {workspace_name} exists")
+        workspace_id = await tfe.get_workspace_id(workspace_name)
+        logging.info(f"Found existing workspace {workspace_name} with ID {workspace_id}")
+        workspace_ids.put(workspace_name, workspace_id)
+        return workspace_id
+    except TFEServiceError as e:
+        if e.status_code != 404:
+            logging.error(f"Failed to get/create workspace {workspace_name}: {str(e)}")
+            raise
+
+    pending = _creating.get(workspace_name)
+    if pending is not None:
+        return await asyncio.shield(pending)
+    future = asyncio.get_running_loop().create_future()
+    _creating[workspace_name] = future
+    try:
+        workspace_id = await _create_workspace(tfe, workspace_name)
+        workspace_ids.put(workspace_name, workspace_id)
+        future.set_result(workspace_id)
+        return workspace_id
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # retrieved here so failures without waiters are not logged as unhandled
+        raise
+    finally:
+        del _creating[workspace_name]
+
+async def _create_workspace(tfe, workspace_name: str) -> str:
+    try:
+        workspace_id = await workspace_pool.claim(tfe, workspace_name)
+        if workspace_id is not None:
+            return workspace_id
+        logging.info(f"Creating workspace: {workspace_name}")
+        workspace_id = await tfe.create_workspace(
+            name=workspace_name,
+            org=get_tfe_org(),
+            auto_apply=False,  # Plans wait for confirmation by /apply
+            execution_mode="remote"
+        )
+    except TFEServiceError as e:
+        if e.status_code == 422:
+            # Created concurrently by another PORC instance
+            logging.info(f"Workspace {workspace_name} was created concurrently: {str(e)}")
+            return await tfe.get_workspace_id(workspace_name)
+        raise
+    logging.info(f"Created new workspace {workspace_name} with ID {workspace_id}")
+    await _configure_workspace(tfe, workspace_id, workspace_name)
+    return workspace_id
+
+async def _configure_workspace(tfe, workspace_id: str, workspace_name: str) -> None:
+    notification_url = get_tfe_notification_url()
+    notification_token = get_tfe_notification_token()
+    if notification_url and notification_token:
+        await tfe.create_notification_configuration(workspace_id, notification_url, notification_token)
+        logging.info(f"Subscribed {notification_url} to run notifications for {workspace_name}")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Script to send Terraform Cloud style run notifications to a PORC API.
+Useful for driving a run through /webhooks/tfe locally without Terraform Cloud.
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from porc_core.tfe_notifications import SIGNATURE_HEADER, sign
+
+
+def send_notification(base_url: str, tfe_run_id: str, run_status: str, token: str, workspace: str):
+    """Sign and post a single run notification."""
+    body = json.dumps({
+        "payload_version": 1,
+        "run_id": tfe_run_id,
+        "workspace_name": workspace,
+        "notifications": [{
+            "message": f"Run {run_status}",
+            "trigger": "run:completed",
+            "run_status": run_status
+        }]
+    }).encode()
+    response = requests.post(
+        f"{base_url.rstrip('/')}/webhooks/tfe",
+        data=body,
+        headers={"Content-Type": "application/json", SIGNATURE_HEADER: sign(body, token)},
+        timeout=10
+    )
+    print(f"{run_status}: {response.status_code} {response.text}")
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Send fake TFE run notifications to PORC')
+    parser.add_argument('tfe_run_id', help='TFE run ID recorded for the PORC run (run-...)')
+    parser.add_argument('--base-url', default='http://localhost:8000', help='PORC API base URL')
+    parser.add_argument('--statuses', default='planning,planned,applying,applied',
+                        help='Comma-separated run statuses to send in order')
+    parser.add_argument('--workspace', default='porc-dev', help='Workspace name to report')
+    parser.add_argument('--token', default=os.getenv("TFE_NOTIFICATION_TOKEN"),
+                        help='Notification HMAC token (defaults to TFE_NOTIFICATION_TOKEN)')
+    args = parser.parse_args()
+
+    if not args.token:
+        parser.error("a notification token is required")
+    for status in args.statuses.split(','):
+        send_notification(args.base_url, args.tfe_run_id, status.strip(), args.token, args.workspace)
+
+
+if __name__ == "__main__":
+    main()
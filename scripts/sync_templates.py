@@ -2,12 +2,17 @@
 Template Sync: Syncs QUILL templates from local filesystem to Azure Storage.
 """
 import os
+import sys
 import json
 import logging
+import tempfile
 from pathlib import Path
 from azure.storage.blob import BlobServiceClient, ContentSettings
 from azure.core.exceptions import ResourceNotFoundError
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from porc_core.quill import compile_quill, compiled_key, source_digest
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
@@ -31,6 +36,20 @@ def ensure_container_exists(client, container_name):
         client.create_container(container_name)
         logging.info(f"Created container: {container_name}")
 
+def upload_compiled(client, bucket_name, kind, versions, templates):
+    """Compile templates to Python modules once and publish the artifact for each version key."""
+    digest = source_digest(templates)
+    with tempfile.TemporaryDirectory() as tmp:
+        zip_path = os.path.join(tmp, f"{digest}.zip")
+        compile_quill(templates, zip_path)
+        content_settings = ContentSettings(content_type='application/zip')
+        for version in versions:
+            compiled = compiled_key(kind, version, digest)
+            blob_client = client.get_blob_client(container=bucket_name, blob=compiled)
+            with open(zip_path, "rb") as f:
+                blob_client.upload_blob(f, overwrite=True, content_settings=content_settings)
+            logging.info(f"Stored compiled templates: {compiled}")
+
 def sync_templates():
     """Sync templates from local filesystem to Azure Storage."""
     client, bucket_name = get_storage_client()
@@ -89,5 +108,20 @@ def sync_templates():
             )
             logging.info(f"Updated latest: {latest_key}")
 
+            # Variables schema, validated by the API before rendering
+            schema_file = version_dir / "schema.json"
+            if schema_file.exists():
+                with open(schema_file, "r") as f:
+                    schema = f.read()
+                json.loads(schema)
+                for schema_version in [version, "latest"]:
+                    schema_key = f"quills/{kind}/{schema_version}/schema.json"
+                    blob_client = client.get_blob_client(container=bucket_name, blob=schema_key)
+                    blob_client.upload_blob(schema, overwrite=True, content_settings=content_settings)
+                    logging.info(f"Stored schema: {schema_key}")
+
+            # Precompiled modules, so the API can skip parsing and compiling on cold start
+            upload_compiled(client, bucket_name, kind, [version, "latest"], templates)
+
 if __name__ == "__main__":
     sync_templates() 
\ No newline at end of file
@@ -0,0 +1,73 @@
+import pytest
+
+from porc_core.batch_render import RenderPool, render_batch, render_item
+from porc_core.bundle import build_bundle
+from porc_core.schema import compile_schema
+
+TEMPLATES = {
+    "main.tf": 'module "{{ name }}" {}',
+    "terraform.tfvars.json": '{"name": "{{ name }}"}',
+}
+SLOW = {
+    "main.tf": "{% for i in range(10 ** 8) %}{% endfor %}",
+    "terraform.tfvars.json": "{}",
+}
+
+
+class FakeQuillManager:
+    def get_sources(self, kind, version):
+        if kind == "missing":
+            raise ValueError(f"No QUILL template found for kind: {kind}")
+        return (kind, SLOW if kind == "slow" else TEMPLATES)
+
+
+class FakeSchemaValidator:
+    def get_validator(self, kind, version):
+        return compile_schema({"type": "object", "required": ["name"]})
+
+
+@pytest.fixture(scope="module")
+def pool():
+    executor = RenderPool(2)
+    # Start both workers up front so timeouts only measure rendering
+    list(executor.map(render_item, ["warmup"] * 2, [TEMPLATES] * 2, [{"name": "x"}] * 2))
+    yield executor
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_each_item(pool):
+    items = [
+        {"kind": "gke-cluster", "variables": {"name": "a"}},
+        {"kind": "missing", "variables": {"name": "b"}},
+        {"kind": "gke-cluster", "variables": {}},
+        {"kind": "gke-cluster", "variables": {"name": "c"}},
+    ]
+    results = await render_batch(items, pool, FakeQuillManager(), FakeSchemaValidator(), timeout=30)
+    assert [r["status"] for r in results] == ["rendered", "error", "invalid", "rendered"]
+    assert results[0]["files"]["main.tf"] == 'module "a" {}'
+    assert results[0]["bundle_digest"] == build_bundle(results[0]["files"])[1]
+    assert "No QUILL template found" in results[1]["error"]
+    assert results[2]["errors"] == ["<root>: 'name' is a required property"]
+
+
+@pytest.mark.asyncio
+async def test_slow_items_time_out_without_failing_the_batch(pool):
+    items = [{"kind": "slow"}, {"kind": "gke-cluster", "variables": {"name": "a"}}]
+    results = await render_batch(items, pool, FakeQuillManager(), timeout=1)
+    assert results[0]["status"] == "error"
+    assert "timed out" in results[0]["error"]
+    assert results[1]["status"] == "rendered"
+
+
+@pytest.mark.asyncio
+async def test_timed_out_items_do_not_keep_their_workers(pool):
+    stale = pool.current
+    results = await render_batch([{"kind": "slow"}, {"kind": "slow"}], pool, FakeQuillManager(), timeout=1)
+    assert [r["status"] for r in results] == ["error", "error"]
+    assert pool.current is not stale
+
+    # Both old workers would still be rendering for seconds
+    items = [{"kind": "gke-cluster", "variables": {"name": n}} for n in ("a", "b")]
+    results = await render_batch(items, pool, FakeQuillManager(), timeout=3)
+    assert [r["status"] for r in results] == ["rendered", "rendered"]
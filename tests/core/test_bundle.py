@@ -0,0 +1,45 @@
+import gzip
+import io
+import tarfile
+import zipfile
+
+from porc_core.bundle import build_bundle, bundle_key, read_bundle
+
+FILES = {
+    "terraform.tfvars.json": '{"name": "demo"}',
+    "main.tf": 'module "demo" {}',
+}
+
+
+def test_bundle_is_deterministic_and_order_independent():
+    archive, digest = build_bundle(FILES)
+    again, again_digest = build_bundle(dict(reversed(list(FILES.items()))))
+    assert archive == again
+    assert digest == again_digest
+    assert bundle_key(digest) == f"bundles/sha256/{digest}.tar.gz"
+
+
+def test_bundle_is_a_sorted_tar_gz_with_fixed_metadata():
+    archive, _ = build_bundle(FILES)
+    with tarfile.open(fileobj=io.BytesIO(archive), mode="r:gz") as tar:
+        members = tar.getmembers()
+    assert [m.name for m in members] == ["main.tf", "terraform.tfvars.json"]
+    assert all(m.mtime == 0 and m.uid == 0 and m.mode == 0o644 for m in members)
+    assert gzip.decompress(archive)
+
+
+def test_different_content_changes_digest():
+    _, digest = build_bundle(FILES)
+    _, other = build_bundle({**FILES, "main.tf": 'module "other" {}'})
+    assert digest != other
+
+
+def test_read_bundle_supports_tar_gz_and_legacy_zip():
+    archive, _ = build_bundle(FILES)
+    assert read_bundle(archive) == FILES
+
+    legacy = io.BytesIO()
+    with zipfile.ZipFile(legacy, "w") as zf:
+        for name, content in FILES.items():
+            zf.writestr(name, content)
+    assert read_bundle(legacy.getvalue()) == FILES
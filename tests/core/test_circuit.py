@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import pytest
+from azure.core.exceptions import ResourceNotFoundError, ServiceRequestError
+
+from porc_common.errors import BackendUnavailableError, TFEServiceError
+from porc_core.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, is_azure_outage
+from porc_core.tfe_client import is_tfe_outage
+
+
+def fail(exc):
+    raise exc
+
+
+def test_opens_after_consecutive_outages_and_fails_fast():
+    circuit = CircuitBreaker("tfe", is_tfe_outage, failure_threshold=3, reset_timeout=60)
+    for _ in range(3):
+        with pytest.raises(TFEServiceError):
+            circuit.call(fail, TFEServiceError(503, "unavailable"))
+
+    assert circuit.state == OPEN
+    with pytest.raises(BackendUnavailableError) as excinfo:
+        circuit.call(lambda: pytest.fail("backend called while open"))
+    assert excinfo.value.backend == "tfe"
+    assert excinfo.value.retry_after > 50
+
+
+def test_client_errors_do_not_count():
+    circuit = CircuitBreaker("tfe", is_tfe_outage, failure_threshold=2, reset_timeout=60)
+    for status in (404, 422, 429):
+        with pytest.raises(TFEServiceError):
+            circuit.call(fail, TFEServiceError(status, "rejected"))
+
+    assert circuit.state == CLOSED
+    assert circuit.to_dict()["consecutive_failures"] == 0
+
+
+def test_wrapped_azure_errors_count():
+    circuit = CircuitBreaker("tables", is_azure_outage, failure_threshold=1, reset_timeout=60)
+
+    def update():
+        try:
+            raise ServiceRequestError("connection refused")
+        except Exception as e:
+            raise ValueError(f"Failed to update state: {str(e)}")
+
+    with pytest.raises(ValueError):
+        circuit.call(update)
+    assert circuit.state == OPEN
+    assert not is_azure_outage(ResourceNotFoundError("missing"))
+
+
+@pytest.mark.asyncio
+async def test_half_open_admits_one_probe():
+    circuit = CircuitBreaker("github", lambda e: isinstance(e, ConnectionError), failure_threshold=1, reset_timeout=0.05)
+    with pytest.raises(ConnectionError):
+        circuit.call(fail, ConnectionError())
+    await asyncio.sleep(0.06)
+    assert circuit.to_dict()["state"] == HALF_OPEN
+
+    release = asyncio.Event()
+
+    async def probe():
+        await release.wait()
+        return "ok"
+
+    task = asyncio.ensure_future(circuit.call_async(probe))
+    await asyncio.sleep(0)
+    with pytest.raises(BackendUnavailableError):
+        await circuit.call_async(probe)
+    release.set()
+
+    assert await task == "ok"
+    assert circuit.state == CLOSED
+
+
+def test_failed_probe_reopens():
+    circuit = CircuitBreaker("mongo", lambda e: isinstance(e, ConnectionError), failure_threshold=1, reset_timeout=0.05)
+    with pytest.raises(ConnectionError):
+        circuit.call(fail, ConnectionError())
+    time.sleep(0.06)
+
+    with pytest.raises(ConnectionError):
+        circuit.call(fail, ConnectionError())
+    assert circuit.state == OPEN
+    with pytest.raises(BackendUnavailableError):
+        circuit.call(lambda: None)
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from porc_common.errors import DeadlineExceededError
+from porc_core import deadline
+from porc_core.tfe_client import AsyncTFEClient, tfe_circuit
+
+
+def test_timeouts_are_sized_from_the_time_left():
+    assert deadline.timeout(10) == 10
+    with deadline.scope(2):
+        assert 1.9 < deadline.timeout(10) <= 2
+        assert deadline.timeout(1) == 1
+        assert set(deadline.azure_kwargs()) == {"connection_timeout", "read_timeout"}
+        with deadline.scope(None):
+            assert deadline.remaining() is None
+    assert deadline.azure_kwargs() == {}
+
+
+def test_spent_deadline_raises():
+    with deadline.scope(0.001):
+        asyncio.run(asyncio.sleep(0.01))
+        with pytest.raises(DeadlineExceededError) as excinfo:
+            deadline.timeout(10)
+    assert excinfo.value.budget == 0.001
+    assert excinfo.value.deadline_at
+
+
+@pytest.mark.asyncio
+async def test_wait_tells_its_own_limit_from_the_deadline():
+    with pytest.raises(asyncio.TimeoutError):
+        await deadline.wait(asyncio.sleep(1), 0.01)
+    with deadline.scope(0.01):
+        with pytest.raises(DeadlineExceededError):
+            await deadline.wait(asyncio.sleep(1), 5)
+
+
+@pytest_asyncio.fixture
+async def slow_api():
+    async def workspace(request):
+        await asyncio.sleep(1)
+        return web.json_response({"data": {"id": "ws-1"}})
+
+    app = web.Application()
+    app.router.add_get("/api/v2/organizations/porc/workspaces/{name}", workspace)
+    test_server = TestServer(app)
+    await test_server.start_server()
+    yield str(test_server.make_url(""))
+    await test_server.close()
+
+
+@pytest.mark.asyncio
+async def test_tfe_request_stops_at_the_deadline_without_tripping_the_circuit(slow_api):
+    tfe_circuit.reset()
+    async with AsyncTFEClient(token="at-deadline", api_url=slow_api, org="porc") as tfe:
+        with deadline.scope(0.2):
+            with pytest.raises(DeadlineExceededError):
+                await tfe.get_workspace_id("porc-dev")
+
+    assert tfe_circuit.to_dict()["consecutive_failures"] == 0
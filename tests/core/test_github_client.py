@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+import pytest
+
+from porc_common.errors import DeadlineExceededError, GitHubServiceError
+from porc_core import deadline
+from porc_core.github_client import CheckRunCache, GitHubClient, InstallationTokenManager
+
+
+class CountingTokenManager(InstallationTokenManager):
+    """Token manager with the GitHub exchange replaced by a counter."""
+    def __init__(self, lifetime=3600, delay=0.01, **kwargs):
+        super().__init__(**kwargs)
+        self.lifetime = lifetime
+        self.delay = delay
+        self.exchanges = 0
+
+    async def _exchange(self, installation_id):
+        self.exchanges += 1
+        await asyncio.sleep(self.delay)
+        expires_at = time.time() + self.lifetime
+        self._tokens[installation_id] = (f"token-{self.exchanges}", expires_at)
+        self._schedule_refresh(installation_id, expires_at)
+        return f"token-{self.exchanges}"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_exchange():
+    manager = CountingTokenManager()
+    tokens = await asyncio.gather(*[manager.get_token("app", "123", "key") for _ in range(20)])
+    assert set(tokens) == {"token-1"}
+    assert manager.exchanges == 1
+    assert await manager.get_token("app", "123", "key") == "token-1"
+    assert manager.exchanges == 1
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_cached_per_installation():
+    manager = CountingTokenManager()
+    assert await manager.get_token("app", "1", "key") == "token-1"
+    assert await manager.get_token("app", "2", "key") == "token-2"
+    assert await manager.get_token("app", "1", "key") == "token-1"
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_token_is_refreshed_before_expiry():
+    manager = CountingTokenManager(lifetime=0.2, refresh_margin=0.1, min_validity=0)
+    assert await manager.get_token("app", "1", "key") == "token-1"
+    await asyncio.sleep(0.2)
+    assert manager.exchanges >= 2
+    assert await manager.get_token("app", "1", "key") != "token-1"
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_callers_wait_for_a_shared_exchange_within_their_own_deadline():
+    manager = CountingTokenManager(delay=0.2)
+    with deadline.scope(0.05):
+        with pytest.raises(DeadlineExceededError):
+            await manager.get_token("app", "1", "key")
+    # The exchange was not cut short by the impatient caller
+    assert await manager.get_token("app", "1", "key") == "token-1"
+    assert manager.exchanges == 1
+    await manager.close()
+
+
+class FakeResponse:
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+
+    async def text(self):
+        return self.body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    closed = False
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.tokens = []
+
+    def request(self, method, url, headers=None, json=None, timeout=None):
+        self.tokens.append(headers["Authorization"])
+        return FakeResponse(*self.responses.pop(0))
+
+
+@pytest.fixture
+def app_client(monkeypatch):
+    for name, value in [("GITHUB_APP_ID", "app"), ("GITHUB_APP_INSTALLATION_ID", "1"), ("GITHUB_APP_PRIVATE_KEY", "key")]:
+        monkeypatch.setenv(name, value)
+
+    def make(manager, session):
+        client = GitHubClient(token_manager=manager)
+        client._session = session
+        return client
+    return make
+
+
+@pytest.mark.asyncio
+async def test_rejected_installation_token_is_replaced_once(app_client):
+    manager = CountingTokenManager()
+    session = FakeSession((401, "Bad credentials"), (201, '{"id": 7}'))
+    result = await app_client(manager, session).create_check_run("acme", "infra", "a" * 40, "PORC Plan", "porc-1")
+
+    assert result == {"id": 7}
+    assert session.tokens == ["Bearer token-1", "Bearer token-2"]
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_token_rejected_twice_is_not_retried_again(app_client):
+    manager = CountingTokenManager()
+    session = FakeSession((401, "Bad credentials"), (401, "Bad credentials"))
+    with pytest.raises(GitHubServiceError) as error:
+        await app_client(manager, session).update_check_run("acme", "infra", 7, "completed", "success")
+
+    assert error.value.status_code == 401
+    assert manager.exchanges == 2
+    await manager.close()
+
+
+def test_check_run_cache_evicts_least_recently_used():
+    cache = CheckRunCache(max_entries=2)
+    cache.put(1, {"sha": "a"})
+    cache.put(2, {"sha": "b"})
+    assert cache.get(1) == {"sha": "a"}
+    cache.put(3, {"sha": "c"})
+    assert cache.get(2) is None
+    assert cache.get("1") == {"sha": "a"}
+    assert cache.get(3) == {"sha": "c"}
+
+
+def test_check_run_info_recovers_run_details():
+    text = "## Run Details\n**Run ID**: `porc-1`\n**Commit**: abc\n\n## Plan Results\nok"
+    info = GitHubClient._check_run_info({"head_sha": "abc", "name": "PORC Plan", "output": {"text": text}})
+    assert info == {
+        "sha": "abc",
+        "name": "PORC Plan",
+        "run_id": "porc-1",
+        "run_details": "## Run Details\n**Run ID**: `porc-1`\n**Commit**: abc\n",
+    }
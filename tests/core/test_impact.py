@@ -0,0 +1,123 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import porc_core.impact as impact
+from porc_common.errors import BackendUnavailableError
+from porc_core.circuit import CircuitBreaker
+from porc_core.impact import ImpactAnalyzer, ImpactJob, iter_blueprints
+
+VERSIONS = {
+    "1.0.0": {"main.tf": 'module "{{ name }}" {}\n', "terraform.tfvars.json": '{"name": "{{ name }}"}'},
+    "2.0.0": {
+        "main.tf": 'module "{{ name }}" {% if name == "b" %}{ size = 2 }{% else %}{}{% endif %}\n',
+        "terraform.tfvars.json": '{"name": "{{ name }}"}',
+    },
+}
+
+
+class FakeQuillManager:
+    def get_sources(self, kind, version):
+        return version, VERSIONS[version]
+
+
+def write_run(db_path, run_id, kind, variables):
+    record = {"run_id": run_id, "blueprint": {"kind": kind, "variables": variables}}
+    (db_path / f"{run_id}.json").write_text(json.dumps(record))
+
+
+@pytest.mark.asyncio
+async def test_impact_reports_changed_runs_with_diffs(tmp_path):
+    db_path = tmp_path / "runs"
+    db_path.mkdir()
+    for name in ["a", "b", "c"]:
+        write_run(db_path, f"porc-{name}", "gke-cluster", {"name": name})
+    write_run(db_path, "porc-other", "postgres-db", {"name": "b"})
+    write_run(db_path, "porc-broken", "gke-cluster", {})
+
+    analyzer = ImpactAnalyzer(str(tmp_path), chunk_size=2, timeout=5)
+    job = ImpactJob("gke-cluster", "1.0.0", "2.0.0", str(tmp_path / "job.jsonl"))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        await analyzer.run(job, iter_blueprints("gke-cluster", db_path=str(db_path)), executor, FakeQuillManager())
+
+    assert job.status == "completed"
+    assert job.counts == {"total": 4, "changed": 1, "unchanged": 3, "failed": 0}
+    changed = [json.loads(line) for line in job.iter_results(changed_only=True)]
+    assert [r["run_id"] for r in changed] == ["porc-b"]
+    diff = changed[0]["diffs"]["main.tf"]
+    assert "--- 1.0.0/main.tf" in diff
+    assert '+module "b" { size = 2 }' in diff
+    assert len(list(job.iter_results())) == 4
+
+
+
+@pytest.mark.asyncio
+async def test_queued_items_do_not_use_up_their_timeout(tmp_path, monkeypatch):
+    def slow_diff(base, target, variables):
+        time.sleep(0.3)
+        return {}
+
+    monkeypatch.setattr(impact, "diff_item", slow_diff)
+    monkeypatch.setenv("RENDER_POOL_WORKERS", "1")
+
+    async def blueprints():
+        for name in ["a", "b", "c", "d"]:
+            yield f"porc-{name}", {"name": name}
+
+    analyzer = ImpactAnalyzer(str(tmp_path), chunk_size=4, timeout=0.5)
+    job = ImpactJob("gke-cluster", "1.0.0", "2.0.0", str(tmp_path / "job.jsonl"))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        await analyzer.run(job, blueprints(), executor, FakeQuillManager())
+
+    assert job.counts == {"total": 4, "changed": 0, "unchanged": 4, "failed": 0}
+
+
+@pytest.mark.asyncio
+async def test_evicted_jobs_take_their_results_along(tmp_path, monkeypatch):
+    monkeypatch.setattr(impact, "MAX_JOBS", 1)
+
+    async def blueprints():
+        yield "porc-a", {"name": "a"}
+
+    analyzer = ImpactAnalyzer(str(tmp_path), timeout=5)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        first = analyzer.start("gke-cluster", "1.0.0", "2.0.0", blueprints(), executor, FakeQuillManager())
+        await analyzer._tasks[first.job_id]
+        second = analyzer.start("gke-cluster", "1.0.0", "2.0.0", blueprints(), executor, FakeQuillManager())
+        await analyzer._tasks[second.job_id]
+
+    assert analyzer.get(first.job_id) is None
+    assert [p.name for p in tmp_path.iterdir()] == [f"{second.job_id}.jsonl"]
+
+
+class FakeCursor:
+    def __init__(self, records):
+        self.records = iter(records)
+
+    async def __anext__(self):
+        try:
+            return next(self.records)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeMongo:
+    def __init__(self, records):
+        self.blueprints = self
+        self.records = records
+
+    def find(self, query, projection):
+        return FakeCursor(self.records)
+
+
+@pytest.mark.asyncio
+async def test_mongo_blueprints_are_read_through_the_circuit():
+    mongo = FakeMongo([{"run_id": "porc-a", "blueprint": {"variables": {"name": "a"}}}])
+    circuit = CircuitBreaker("mongo", lambda e: True, failure_threshold=1, reset_timeout=60)
+    assert [item async for item in iter_blueprints("gke-cluster", mongo, circuit=circuit)] == [("porc-a", {"name": "a"})]
+
+    circuit.after_call(False, ConnectionError("down"))
+    with pytest.raises(BackendUnavailableError):
+        [item async for item in iter_blueprints("gke-cluster", mongo, circuit=circuit)]
@@ -0,0 +1,31 @@
+from porc_core.plan_cache import PlanCache
+
+PLAN = {"plan_id": "run-abc", "plan_url": "https://app.terraform.io/app/acme/workspaces/porc-dev/runs/run-abc"}
+
+
+def test_hit_requires_same_bundle_workspace_and_serial():
+    cache = PlanCache(max_entries=8)
+    cache.put("digest", "ws-1", 4, PLAN)
+    assert cache.get("digest", "ws-1", 4) == PLAN
+    assert cache.get("digest", "ws-1", 5) is None
+    assert cache.get("digest", "ws-2", 4) is None
+    assert cache.get("other", "ws-1", 4) is None
+
+
+def test_apply_invalidates_the_workspace():
+    cache = PlanCache(max_entries=8)
+    cache.put("a", "ws-1", 4, PLAN)
+    cache.put("b", "ws-1", 4, PLAN)
+    cache.put("a", "ws-2", 1, PLAN)
+    cache.invalidate_workspace("ws-1")
+    assert cache.get("a", "ws-1", 4) is None
+    assert cache.get("b", "ws-1", 4) is None
+    assert cache.get("a", "ws-2", 1) == PLAN
+
+
+def test_cache_is_bounded():
+    cache = PlanCache(max_entries=2)
+    for serial in range(3):
+        cache.put("digest", "ws-1", serial, PLAN)
+    assert cache.get("digest", "ws-1", 0) is None
+    assert cache.get("digest", "ws-1", 2) == PLAN
@@ -0,0 +1,104 @@
+from porc_common import metrics
+from porc_core.quill import QuillManager, compile_quill, compiled_key, source_digest
+
+TEMPLATES = {
+    "main.tf": 'module "{{ name }}" {}',
+    "terraform.tfvars.json": '{"name": "{{ name }}"}',
+}
+
+
+class FakeStorage:
+    """Serves one QUILL and counts downloads and ETag checks."""
+    def __init__(self):
+        self.templates = dict(TEMPLATES)
+        self.etag = '"v1"'
+        self.downloads = 0
+        self.etag_checks = 0
+
+    def get_quill_with_etag(self, kind, version):
+        self.downloads += 1
+        return dict(self.templates), self.etag
+
+    def get_quill_etag(self, kind, version):
+        self.etag_checks += 1
+        return self.etag
+
+    def get_blob_bytes(self, key):
+        return None
+
+
+def make_manager(ttl):
+    manager = QuillManager(cache_size=2, ttl=ttl)
+    manager.storage_service = FakeStorage()
+    return manager
+
+
+def test_templates_are_compiled_once_within_ttl():
+    metrics.reset()
+    manager = make_manager(ttl=60)
+    for _ in range(3):
+        assert manager.render_quill("gke-cluster", {"name": "a"})["main.tf"] == 'module "a" {}'
+    assert manager.storage_service.downloads == 1
+    assert manager.storage_service.etag_checks == 0
+    counters = metrics.snapshot()["counters"]
+    assert counters["quill_cache_misses"] == 1
+    assert counters["quill_cache_hits"] == 2
+
+
+def test_expired_entries_are_revalidated_by_etag():
+    manager = make_manager(ttl=0)
+    storage = manager.storage_service
+    manager.render_quill("gke-cluster", {"name": "a"})
+    manager.render_quill("gke-cluster", {"name": "a"})
+    assert storage.downloads == 1
+    assert storage.etag_checks == 1
+
+    storage.templates["main.tf"] = 'module "{{ name }}-v2" {}'
+    storage.etag = '"v2"'
+    assert manager.render_quill("gke-cluster", {"name": "a"})["main.tf"] == 'module "a-v2" {}'
+    assert storage.downloads == 2
+
+
+def test_cache_is_bounded():
+    manager = make_manager(ttl=60)
+    for kind in ("a", "b", "c"):
+        manager.get_quill(kind)
+    manager.get_quill("a")
+    assert manager.storage_service.downloads == 4
+
+
+class PrecompiledStorage(FakeStorage):
+    """Also serves the precompiled artifact published by sync_templates."""
+    def __init__(self, tmp_path):
+        super().__init__()
+        self.blobs = {}
+        path = tmp_path / "artifact.zip"
+        compile_quill(self.templates, str(path))
+        self.blobs[compiled_key("gke-cluster", "latest", source_digest(self.templates))] = path.read_bytes()
+
+    def get_blob_bytes(self, key):
+        return self.blobs.get(key)
+
+
+def test_precompiled_artifact_is_used_when_published(tmp_path):
+    metrics.reset()
+    manager = QuillManager(cache_size=2, ttl=60)
+    manager.compiled_dir = str(tmp_path / "compiled")
+    manager.storage_service = PrecompiledStorage(tmp_path)
+    assert manager.render_quill("gke-cluster", {"name": "a"})["main.tf"] == 'module "a" {}'
+    counters = metrics.snapshot()["counters"]
+    assert counters["quill_precompiled_loads"] == 1
+    assert "quill_source_compiles" not in counters
+
+
+def test_source_compile_is_the_fallback(tmp_path):
+    metrics.reset()
+    manager = QuillManager(cache_size=2, ttl=60)
+    manager.compiled_dir = str(tmp_path / "compiled")
+    storage = PrecompiledStorage(tmp_path)
+    storage.templates["main.tf"] = 'module "{{ name }}-edited" {}'
+    manager.storage_service = storage
+    assert manager.render_quill("gke-cluster", {"name": "a"})["main.tf"] == 'module "a-edited" {}'
+    counters = metrics.snapshot()["counters"]
+    assert counters["quill_source_compiles"] == 1
+    assert "quill_precompiled_loads" not in counters
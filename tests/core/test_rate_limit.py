@@ -0,0 +1,69 @@
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from porc_common import metrics
+from porc_common.errors import TFEServiceError
+from porc_core.rate_limit import TokenBucket, backoff_delay, retry_after_seconds
+from porc_core.tfe_client import AsyncTFEClient
+
+
+def test_bucket_spaces_requests_beyond_burst():
+    bucket = TokenBucket("test", rate=10, burst=2)
+    waits = [bucket.reserve() for _ in range(4)]
+
+    assert waits[:2] == [0, 0]
+    assert waits[2] == pytest.approx(0.1, abs=0.01)
+    assert waits[3] == pytest.approx(0.2, abs=0.01)
+    assert bucket.level < 0
+
+
+def test_pause_holds_back_every_request():
+    bucket = TokenBucket("test", rate=100, burst=10)
+    bucket.pause(5)
+
+    assert bucket.reserve() == pytest.approx(5, abs=0.05)
+    assert bucket.reserve() == pytest.approx(5, abs=0.05)
+
+
+def test_retry_after_and_backoff():
+    assert retry_after_seconds("3") == 3
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert retry_after_seconds("soon") is None
+    assert retry_after_seconds(None) is None
+    assert all(0 <= backoff_delay(3, 1, 5) <= 5 for _ in range(100))
+
+
+@pytest_asyncio.fixture
+async def server():
+    calls = []
+
+    async def workspace(request):
+        calls.append(request.match_info["name"])
+        if request.match_info["name"] == "limited" or len(calls) == 1:
+            return web.json_response({"errors": [{"status": "429"}]}, status=429, headers={"Retry-After": "0.05"})
+        return web.json_response({"data": {"id": "ws-1"}})
+
+    app = web.Application()
+    app.router.add_get("/api/v2/organizations/porc/workspaces/{name}", workspace)
+    test_server = TestServer(app)
+    await test_server.start_server()
+    yield str(test_server.make_url("")), calls
+    await test_server.close()
+
+
+@pytest.mark.asyncio
+async def test_client_retries_after_429(server):
+    api_url, calls = server
+    metrics.reset()
+    async with AsyncTFEClient(token="at-limits", api_url=api_url, org="porc") as tfe:
+        assert await tfe.get_workspace_id("porc-dev") == "ws-1"
+        tfe.max_retries = 2
+        with pytest.raises(TFEServiceError) as excinfo:
+            await tfe.get_workspace_id("limited")
+
+    assert excinfo.value.status_code == 429
+    assert calls == ["porc-dev", "porc-dev", "limited", "limited"]
+    assert metrics.snapshot()["counters"]["tfe_rate_limited_responses"] == 2
+    assert metrics.snapshot()["counters"]["rate_limit_throttled_seconds"] > 0
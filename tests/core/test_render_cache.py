@@ -0,0 +1,26 @@
+from porc_common import metrics
+from porc_core.render_cache import RenderCache, render_key, variables_hash
+
+
+def test_variables_hash_is_canonical():
+    assert variables_hash({"a": 1, "b": [1, 2]}) == variables_hash({"b": [1, 2], "a": 1})
+    assert variables_hash({"a": 1}) != variables_hash({"a": "1"})
+
+
+def test_key_changes_with_quill_source():
+    assert render_key("gke-cluster", "digest-1", {"a": 1}) != render_key("gke-cluster", "digest-2", {"a": 1})
+
+
+def test_cache_is_bounded_lru():
+    metrics.reset()
+    cache = RenderCache(max_entries=2)
+    cache.put("a", "bundles/sha256/a.tar.gz", "a")
+    cache.put("b", "bundles/sha256/b.tar.gz", "b")
+    assert cache.get("a") == ("bundles/sha256/a.tar.gz", "a")
+    cache.put("c", "bundles/sha256/c.tar.gz", "c")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["render_cache_evictions"] == 1
+    assert snapshot["gauges"]["render_cache_entries"] == 2
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from porc_core.run_events import RunEvents
+
+
+class CountingStateService:
+    def __init__(self, state):
+        self.state = state
+        self.reads = 0
+
+    async def get_state(self, run_id):
+        self.reads += 1
+        return dict(self.state)
+
+
+@pytest.mark.asyncio
+async def test_subscribers_share_one_upstream_watcher():
+    hub = RunEvents(poll_interval=60)
+    service = CountingStateService({"state": "planned", "workspace": "porc-dev", "metadata": {}, "updated_at": "2026-01-01T00:00:00"})
+
+    async with hub.subscribe("run-1", service) as first, hub.subscribe("run-1", service) as second:
+        assert (await first.get())[1]["state"] == "planned"
+        assert (await second.get())[1]["state"] == "planned"
+        hub.publish("run-1", "applying", metadata={"check_run_id": 1}, updated_at="2026-01-01T00:00:01")
+        seq, event = await first.get()
+        assert event == {"run_id": "run-1", "state": "applying", "workspace": "porc-dev",
+                         "metadata": {"check_run_id": 1}, "updated_at": "2026-01-01T00:00:01"}
+        assert (await second.get()) == (seq, event)
+
+    assert service.reads == 1
+    assert hub._topics == {}
+
+
+@pytest.mark.asyncio
+async def test_changes_from_other_threads_and_replicas_are_delivered_once():
+    hub = RunEvents(poll_interval=0.01)
+    service = CountingStateService({"state": "planned", "workspace": None, "metadata": {}, "updated_at": "2026-01-01T00:00:00"})
+
+    async with hub.subscribe("run-1", service) as queue:
+        await queue.get()
+        await asyncio.to_thread(hub.publish, "run-1", "applying", None, None, "2026-01-01T00:00:01")
+        assert (await queue.get())[1]["state"] == "applying"
+
+        # Written by another replica: picked up by the watcher
+        service.state = {"state": "applied", "workspace": None, "metadata": {}, "updated_at": "2026-01-01T00:00:02"}
+        assert (await asyncio.wait_for(queue.get(), 1))[1]["state"] == "applied"
+        await asyncio.sleep(0.05)
+        assert queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_watcher_stops_polling_a_settled_run():
+    hub = RunEvents(poll_interval=0.01)
+    service = CountingStateService({"state": "plan_failed", "workspace": None, "metadata": {}, "updated_at": "2026-01-01T00:00:00"})
+
+    async with hub.subscribe("run-1", service) as queue:
+        await queue.get()
+        await asyncio.sleep(0.05)
+        assert hub._topics["run-1"].watcher.done()
+
+    assert service.reads == 1
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from porc_core import deadline
+from porc_core.run_executor import RunExecutor
+
+
+class Leases:
+    def __init__(self, held):
+        self.held = held
+        self.renewals = 0
+
+    def take_lease(self, run_id, owner, ttl):
+        self.renewals += 1
+        return self.held
+
+
+@pytest.mark.asyncio
+async def test_job_runs_under_its_own_budget_and_renews_its_lease():
+    executor = RunExecutor(max_concurrent=1, lease_seconds=0.03)
+    leases = Leases(held=True)
+
+    async def job():
+        await asyncio.sleep(0.05)
+        return deadline.remaining()
+
+    with deadline.scope(0.01):
+        task = executor.submit("porc-1", job, budget=60, state_service=leases)
+    assert executor.submit("porc-1", job) is None
+
+    assert await task > 59
+    assert leases.renewals >= 1
+    assert executor.active == 0
+
+
+@pytest.mark.asyncio
+async def test_job_is_cancelled_when_its_lease_is_lost():
+    executor = RunExecutor(max_concurrent=1, lease_seconds=0.03)
+
+    task = executor.submit("porc-1", lambda: asyncio.sleep(1), state_service=Leases(held=False))
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from porc_common.errors import TFEServiceError
+from porc_core.run_poller import RunPoller
+
+
+class FakeRun:
+    """Reports the next status from a script on each check."""
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.checks = 0
+
+    async def fetch(self):
+        self.checks += 1
+        return self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+
+
+def fast_poller():
+    return RunPoller(requests_per_second=1000, backoff=1, jitter=0)
+
+
+@pytest.mark.asyncio
+async def test_waiters_on_the_same_run_share_checks(monkeypatch):
+    poller = fast_poller()
+    monkeypatch.setattr("porc_core.run_poller.RUN_PHASE_INTERVALS", {"planning": 0.01, "applying": 0.01})
+    run = FakeRun("planning", "applying", "applying", "applied")
+
+    results = await asyncio.gather(*[
+        poller.wait_run("run-1", run.fetch, targets=["applied"]) for _ in range(10)
+    ])
+
+    assert results == ["applied"] * 10
+    assert run.checks == 4
+    assert poller.outstanding == 0
+
+
+@pytest.mark.asyncio
+async def test_notify_short_circuits_polling():
+    poller = RunPoller(fallback_interval=60)
+    run = FakeRun("applying")
+
+    waiter = asyncio.ensure_future(poller.wait_run("run-1", run.fetch, targets=["applied"]))
+    await asyncio.sleep(0.05)
+    poller.notify("run-1", "applied")
+
+    assert await asyncio.wait_for(waiter, timeout=1) == "applied"
+    assert run.checks == 1
+
+
+@pytest.mark.asyncio
+async def test_failure_status_raises(monkeypatch):
+    poller = fast_poller()
+    monkeypatch.setattr("porc_core.run_poller.CONFIG_PHASE_INTERVALS", {"pending": 0.01})
+    config_version = FakeRun("pending", "errored")
+
+    with pytest.raises(TFEServiceError):
+        await poller.wait_configuration("cv-1", config_version.fetch, targets=["uploaded"], failures=["errored"])
+
+
+def test_interval_backs_off_per_phase_and_respects_fallback():
+    poller = RunPoller(backoff=2, jitter=0, max_interval=30, fallback_interval=None)
+
+    class Tracked:
+        intervals = {"planning": 5}
+        status = "planning"
+        attempts = 0
+        notifiable = True
+
+    tracked = Tracked()
+    assert poller._interval(tracked) == 5
+    tracked.attempts = 2
+    assert poller._interval(tracked) == 20
+    tracked.attempts = 5
+    assert poller._interval(tracked) == 30
+    poller.fallback_interval = 60
+    assert poller._interval(tracked) == 60
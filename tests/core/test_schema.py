@@ -0,0 +1,37 @@
+import pytest
+
+from porc_common.errors import BlueprintValidationError
+from tests.fakes import SCHEMA, make_validator
+
+VARIABLES = {
+    name: 3 if SCHEMA["properties"][name]["type"] == "integer" else "value"
+    for name in SCHEMA["required"]
+}
+
+
+def test_valid_variables_pass_and_schema_is_compiled_once():
+    validator = make_validator()
+    for _ in range(3):
+        validator.validate("gke-cluster", VARIABLES)
+    assert validator.storage_service.downloads == 1
+
+
+def test_all_errors_are_reported_together():
+    validator = make_validator()
+    variables = {**VARIABLES, "node_count": "three", "disk_size_gb": "big"}
+    del variables["region"]
+    with pytest.raises(BlueprintValidationError) as exc:
+        validator.validate("gke-cluster", variables)
+    assert exc.value.errors == [
+        "<root>: 'region' is a required property",
+        "disk_size_gb: 'big' is not of type 'integer'",
+        "node_count: 'three' is not of type 'integer'",
+    ]
+
+
+def test_kinds_without_a_schema_are_not_validated_but_warned_about(caplog):
+    validator = make_validator()
+    validator.validate("app-service", {"anything": 1})
+    assert any(r.levelname == "WARNING" and "app-service/latest" in r.getMessage() for r in caplog.records)
+    validator.validate("app-service", {"anything": 1})
+    assert validator.storage_service.downloads == 1
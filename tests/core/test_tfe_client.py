@@ -0,0 +1,118 @@
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from porc_common.errors import TFEServiceError
+from porc_core.tfe_client import AsyncTFEClient
+
+
+@pytest_asyncio.fixture
+async def tfe_api(monkeypatch):
+    """A fake TFE API; handlers are registered per test through the returned router."""
+    app = web.Application()
+    calls = []
+
+    @web.middleware
+    async def record(request, handler):
+        calls.append((request.method, request.path, dict(request.query)))
+        return await handler(request)
+
+    app.middlewares.append(record)
+    monkeypatch.setenv("TFE_RETRY_BASE_SECONDS", "0.01")
+    server = TestServer(app)
+    yield app.router, calls, server
+    await server.close()
+
+
+async def start(router, server):
+    await server.start_server()
+    return AsyncTFEClient(token="at-test", api_url=str(server.make_url("/")), org="porc")
+
+
+def run(run_id, status, message):
+    return {"id": run_id, "type": "runs", "attributes": {"status": status, "message": message}}
+
+
+@pytest.mark.asyncio
+async def test_new_plan_discards_unconfirmed_porc_runs_only(tfe_api):
+    router, calls, server = tfe_api
+
+    async def runs(request):
+        return web.json_response({"data": [run("run-old", "planned", "PORC run porc-1"),
+                                           run("run-manual", "planned", "Queued manually")]})
+
+    async def discard(request):
+        return web.json_response({}, status=202)
+
+    router.add_get("/api/v2/workspaces/ws-1/runs", runs)
+    router.add_post("/api/v2/runs/{run_id}/actions/discard", discard)
+    async with await start(router, server) as tfe:
+        discarded = await tfe.discard_unconfirmed_runs("ws-1")
+
+    assert discarded == ["run-old"]
+    assert ("POST", "/api/v2/runs/run-manual/actions/discard", {}) not in calls
+    assert "planned" in calls[0][2]["filter[status]"]
+
+
+def responses(*replies):
+    """Handler answering with the given (status, body, headers) replies in turn, repeating the last."""
+    replies = list(replies)
+
+    async def handler(request):
+        status, body, headers = replies.pop(0) if len(replies) > 1 else replies[0]
+        return web.json_response(body, status=status, headers=headers)
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_reads_are_retried_on_server_errors_and_rate_limits(tfe_api):
+    router, calls, server = tfe_api
+    router.add_get("/api/v2/runs/run-1", responses(
+        (503, {}, {}), (429, {}, {"Retry-After": "0"}), (200, {"data": run("run-1", "planned", "")}, {})))
+    async with await start(router, server) as tfe:
+        assert (await tfe.get_run("run-1"))["status"] == "planned"
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_writes_are_not_retried_on_internal_errors(tfe_api):
+    router, calls, server = tfe_api
+    router.add_post("/api/v2/runs/run-1/actions/apply", responses((500, {}, {}), (202, {}, {})))
+    async with await start(router, server) as tfe:
+        with pytest.raises(TFEServiceError) as error:
+            await tfe.apply_run("run-1")
+    assert error.value.status_code == 500
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status, message", [(401, "Authentication failed"), (404, "Resource not found")])
+async def test_client_errors_are_raised_without_retrying(tfe_api, status, message):
+    router, calls, server = tfe_api
+    router.add_get("/api/v2/runs/run-1", responses((status, {"errors": [{"status": str(status)}]}, {})))
+    async with await start(router, server) as tfe:
+        with pytest.raises(TFEServiceError) as error:
+            await tfe.get_run("run-1")
+    assert error.value.status_code == status
+    assert message in str(error.value)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_listing_follows_pagination(tfe_api):
+    router, calls, server = tfe_api
+
+    async def workspaces(request):
+        page = int(request.query["page[number]"])
+        return web.json_response({
+            "data": [{"id": f"ws-{page}", "attributes": {"name": f"porc-{page}"}}],
+            "meta": {"pagination": {"next-page": page + 1 if page < 3 else None}},
+        })
+
+    router.add_get("/api/v2/organizations/porc/workspaces", workspaces)
+    async with await start(router, server) as tfe:
+        found = await tfe.list_workspaces("porc")
+
+    assert [w["id"] for w in found] == ["ws-1", "ws-2", "ws-3"]
+    assert [c[2]["page[number]"] for c in calls] == ["1", "2", "3"]
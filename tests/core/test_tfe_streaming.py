@@ -0,0 +1,56 @@
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from porc_common.errors import TFEServiceError
+from porc_core.tfe_client import AsyncTFEClient
+
+BUNDLE = bytes(range(256)) * 8 * 1024  # 2 MiB
+
+
+@pytest_asyncio.fixture
+async def server():
+    received = {}
+
+    async def download(request):
+        return web.Response(body=BUNDLE)
+
+    async def missing(request):
+        return web.Response(status=404)
+
+    async def upload(request):
+        received["content_length"] = request.content_length
+        received["chunked"] = "chunked" in request.headers.get("Transfer-Encoding", "")
+        received["body"] = await request.read()
+        return web.Response(status=200)
+
+    app = web.Application(client_max_size=len(BUNDLE) * 2)
+    app.router.add_get("/bundle", download)
+    app.router.add_get("/missing", missing)
+    app.router.add_put("/upload", upload)
+    test_server = TestServer(app)
+    await test_server.start_server()
+    yield test_server, received
+    await test_server.close()
+
+
+@pytest.mark.asyncio
+async def test_upload_from_url_streams_with_content_length(server):
+    test_server, received = server
+    async with AsyncTFEClient(token="at-test", api_url="https://app.terraform.io", org="porc") as tfe:
+        sent = await tfe.upload_from_url(str(test_server.make_url("/upload")), str(test_server.make_url("/bundle")),
+                                         chunk_size=4096)
+
+    assert sent == len(BUNDLE)
+    assert received["content_length"] == len(BUNDLE)
+    assert not received["chunked"]
+    assert received["body"] == BUNDLE
+
+
+@pytest.mark.asyncio
+async def test_upload_from_url_reports_download_failure(server):
+    test_server, _ = server
+    async with AsyncTFEClient(token="at-test", api_url="https://app.terraform.io", org="porc") as tfe:
+        with pytest.raises(TFEServiceError):
+            await tfe.upload_from_url(str(test_server.make_url("/upload")), str(test_server.make_url("/missing")))
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from porc_core import tfe_client
+from porc_core.tfe_client import (
+    AsyncTFEClient, close_tfe_session, get_tfe_client, get_tfe_session, get_token_validation, token_fingerprint,
+    validate_token
+)
+
+
+@pytest_asyncio.fixture
+async def server():
+    calls = []
+
+    async def organization(request):
+        calls.append("organization")
+        return web.json_response({"data": {"id": "porc", "attributes": {}}})
+
+    async def account(request):
+        calls.append("account")
+        return web.json_response({"data": {"id": "user-1", "attributes": {"permissions": ["can_write"]}}})
+
+    app = web.Application()
+    app.router.add_get("/api/v2/organizations/porc", organization)
+    app.router.add_get("/api/v2/account/details", account)
+    test_server = TestServer(app)
+    await test_server.start_server()
+    tfe_client._token_validations.clear()
+    yield str(test_server.make_url("")), calls
+    await close_tfe_session()
+    await test_server.close()
+
+
+@pytest.mark.asyncio
+async def test_token_is_validated_once_per_fingerprint(server):
+    api_url, calls = server
+    clients = [get_tfe_client(token="at-one", api_url=api_url, org="porc") for _ in range(5)]
+    results = await asyncio.gather(*(validate_token(c) for c in clients))
+
+    assert all(r["valid"] for r in results)
+    assert calls == ["organization", "account"]
+    assert get_token_validation("at-one")["permissions"] == ["can_write"]
+    assert get_token_validation("at-two") is None
+    assert clients[0].session is clients[1].session
+
+    await validate_token(get_tfe_client(token="at-two", api_url=api_url, org="porc"))
+    assert len(calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_outage_during_validation_is_only_cached_briefly(server):
+    api_url, calls = server
+    unreachable = AsyncTFEClient(token="at-flaky", api_url="http://127.0.0.1:1", org="porc")
+    unreachable.max_retries = 1
+    result = await unreachable.check_token_permissions()
+    await unreachable.close()
+    assert not result["valid"] and not result["definitive"]
+    assert get_token_validation("at-flaky") == result
+
+    tfe_client._token_validations[token_fingerprint("at-flaky")] = (result, 0)  # past its expiry
+    assert get_token_validation("at-flaky") is None
+
+    healthy = AsyncTFEClient(token="at-flaky", api_url=api_url, org="porc", session=get_tfe_session())
+    assert (await validate_token(healthy))["valid"]
+    assert get_token_validation("at-flaky")["definitive"]
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from porc_common.errors import TFEServiceError
+from porc_core import workspaces
+from porc_core.workspaces import WorkspacePool, ensure_workspace_exists, workspace_name_for
+
+RECORD = {"source_repo": "Acme/Infra", "blueprint": {"kind": "gke-cluster", "name": "dev"}}
+
+
+def test_workspace_strategies():
+    assert workspace_name_for(RECORD, "dev", "environment") == "porc-dev"
+    assert workspace_name_for(RECORD, "dev", "repo") == "porc-dev-acme-infra"
+    assert workspace_name_for(RECORD, "dev", "blueprint") == "porc-dev-acme-infra-gke-cluster-dev"
+    bucket = workspace_name_for(RECORD, "dev", "hash", buckets=4)
+    assert bucket in {f"porc-dev-{i:02d}" for i in range(4)}
+    assert workspace_name_for(RECORD, "dev", "hash", buckets=4) == bucket
+
+
+def test_long_names_stay_unique_and_valid():
+    a = {"source_repo": "acme/" + "x" * 100, "blueprint": {"kind": "gke-cluster", "name": "a"}}
+    b = {"source_repo": "acme/" + "x" * 100, "blueprint": {"kind": "gke-cluster", "name": "b"}}
+    name_a, name_b = workspace_name_for(a, "dev", "blueprint"), workspace_name_for(b, "dev", "blueprint")
+    assert len(name_a) == 90
+    assert name_a != name_b
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        workspace_name_for(RECORD, "dev", "per-user")
+
+
+class FakeTFE:
+    """Workspaces that exist only once created, with slow creation."""
+    def __init__(self):
+        self.workspaces = {}
+        self.creates = 0
+        self.lookups = 0
+
+    async def get_workspace_id(self, name):
+        self.lookups += 1
+        if name not in self.workspaces:
+            raise TFEServiceError(404, f"Resource not found: {name}")
+        return self.workspaces[name]
+
+    async def create_workspace(self, name, org=None, auto_apply=False, execution_mode="remote"):
+        self.creates += 1
+        await asyncio.sleep(0.01)
+        self.workspaces[name] = f"ws-{self.creates}"
+        return self.workspaces[name]
+
+    async def list_workspaces(self, search):
+        return [{"id": i, "name": n} for n, i in self.workspaces.items() if search in n]
+
+    async def get_workspace_name(self, workspace_id):
+        return next(n for n, i in self.workspaces.items() if i == workspace_id)
+
+    async def rename_workspace(self, workspace_id, name):
+        old = next(n for n, i in self.workspaces.items() if i == workspace_id)
+        self.workspaces[name] = self.workspaces.pop(old)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_runs_create_the_workspace_once():
+    tfe = FakeTFE()
+    ids = await asyncio.gather(*(ensure_workspace_exists(tfe, "porc-dev-acme") for _ in range(5)))
+    assert ids == ["ws-1"] * 5
+    assert tfe.creates == 1
+
+
+@pytest.mark.asyncio
+async def test_workspace_ids_are_cached():
+    tfe = FakeTFE()
+    tfe.workspaces["porc-dev-cached"] = "ws-9"
+    assert await ensure_workspace_exists(tfe, "porc-dev-cached") == "ws-9"
+    assert await ensure_workspace_exists(tfe, "porc-dev-cached") == "ws-9"
+    assert tfe.lookups == 1
+
+    workspaces.workspace_ids.invalidate("porc-dev-cached")
+    await ensure_workspace_exists(tfe, "porc-dev-cached")
+    assert tfe.lookups == 2
+
+
+@pytest.mark.asyncio
+async def test_new_workspaces_are_claimed_from_the_pool(monkeypatch):
+    tfe = FakeTFE()
+    tfe.workspaces["porc-dev-pool-0123abcd"] = "ws-spare"
+    tfe.workspaces["porc-dev-pool-canary-0123abcd"] = "ws-other-pool"
+    pool = WorkspacePool(size=1)
+    monkeypatch.setattr(workspaces, "workspace_pool", pool)
+    await pool.start(tfe, "porc-dev-pool")
+    assert pool.available == 1
+    try:
+        assert await ensure_workspace_exists(tfe, "porc-dev-new-blueprint") == "ws-spare"
+        assert tfe.workspaces["porc-dev-new-blueprint"] == "ws-spare"
+        # The pool refills in the background
+        for _ in range(100):
+            if pool.available:
+                break
+            await asyncio.sleep(0.01)
+        assert pool.available == 1
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_spares_claimed_by_another_replica_are_skipped(monkeypatch):
+    tfe = FakeTFE()
+    tfe.workspaces["porc-dev-pool-0123abcd"] = "ws-spare"
+    pool = WorkspacePool(size=1)
+    await pool.start(tfe, "porc-dev-pool")
+    await pool.close()
+    await tfe.rename_workspace("ws-spare", "porc-dev-claimed-elsewhere")
+
+    assert await pool.claim(tfe, "porc-dev-new-blueprint") is None
+    assert tfe.workspaces["porc-dev-claimed-elsewhere"] == "ws-spare"
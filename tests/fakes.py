@@ -0,0 +1,62 @@
+"""In-memory stand-ins for the API's backends, shared by the API tests."""
+import json
+from pathlib import Path
+
+from porc_core.schema import SchemaValidator
+from porc_core.state import RunState
+
+RUN_ID = "porc-test-run"
+DIGEST = "a" * 64
+RECORD = {
+    "run_id": RUN_ID,
+    "blueprint": {"kind": "gke-cluster", "name": "dev", "variables": {}},
+    "external_reference": "0123456789abcdef0123456789abcdef01234567",
+    "source_repo": "acme/infra",
+    "bundle_digest": DIGEST,
+}
+
+SCHEMA = json.loads((Path(__file__).resolve().parents[1] / "quills/gke-cluster/1.0.0/schema.json").read_text())
+
+
+class FakeStateService:
+    """In-memory run states and last applied bundles."""
+    def __init__(self):
+        self.runs = {RUN_ID: {"state": RunState.BUILT.value, "metadata": {
+            "bundle_key": f"bundles/sha256/{DIGEST}.tar.gz", "bundle_digest": DIGEST, "bundle_url": "https://blob/bundle"}}}
+        self.applied = {}
+
+    async def get_state(self, run_id):
+        return dict(self.runs[run_id])
+
+    def update_state(self, run_id, state, workspace=None, metadata=None, tfe_run_id=None, lease_owner=None):
+        self.runs[run_id] = {"state": state.value, "metadata": metadata or {}}
+
+    async def get_applied_bundle(self, workspace):
+        return self.applied.get(workspace)
+
+
+class FakeGitHubClient:
+    def __init__(self):
+        self.updates = []
+
+    async def create_check_run(self, owner, repo, sha, name, run_id):
+        return {"id": 1}
+
+    async def update_check_run(self, owner, repo, check_run_id, status=None, conclusion=None, output=None):
+        self.updates.append({"status": status, "conclusion": conclusion, "output": output})
+
+
+class FakeSchemaStorage:
+    """Serves the gke-cluster schema and counts downloads."""
+    def __init__(self):
+        self.downloads = 0
+
+    def get_quill_schema(self, kind, version):
+        self.downloads += 1
+        return SCHEMA if kind == "gke-cluster" else None
+
+
+def make_validator():
+    validator = SchemaValidator(cache_size=4, ttl=60)
+    validator.storage_service = FakeSchemaStorage()
+    return validator
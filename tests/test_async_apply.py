@@ -0,0 +1,237 @@
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import pytest
+import pytest_asyncio
+
+import porc_api.main as api
+from porc_api.main import DEADLINE_HEADER, app, keep_resuming_applies, resume_applies
+from porc_common.config import DB_PATH
+from porc_core import deadline
+from porc_core.run_executor import run_executor
+from porc_core.state import RunState
+from porc_core.workspaces import workspace_ids
+from tests.fakes import RECORD, RUN_ID, FakeGitHubClient, FakeStateService
+
+
+class LockingStateService(FakeStateService):
+    def __init__(self):
+        super().__init__()
+        self.locks = {}
+
+    def acquire_lock(self, workspace, run_id):
+        return self.locks.setdefault(workspace, run_id) == run_id
+
+    def release_lock(self, workspace, run_id):
+        self.locks.pop(workspace, None)
+
+    def update_state(self, run_id, state, workspace=None, metadata=None, tfe_run_id=None, lease_owner=None):
+        lease = {k: self.runs.get(run_id, {}).get(k) for k in ("lease_owner", "lease_expires_at")}
+        super().update_state(run_id, state, workspace, metadata, tfe_run_id)
+        self.runs[run_id].update(workspace=workspace, tfe_run_id=tfe_run_id, **lease)
+        if lease_owner:
+            self.runs[run_id].update(lease_owner=lease_owner, lease_expires_at=time.time() + 60)
+
+    def take_lease(self, run_id, owner, ttl=60):
+        run = self.runs[run_id]
+        if run.get("lease_owner") not in (None, owner) and run.get("lease_expires_at", 0) > time.time():
+            return False
+        run.update(lease_owner=owner, lease_expires_at=time.time() + ttl)
+        return True
+
+    def release_lease(self, run_id, owner):
+        if self.runs[run_id].get("lease_owner") == owner:
+            self.runs[run_id].update(lease_owner="", lease_expires_at=0)
+
+    def record_applied_bundle(self, workspace, bundle_digest, run_id, identity=None):
+        self.applied[workspace] = {"bundle_digest": bundle_digest, "run_id": run_id, "workspace": workspace}
+
+    async def find_runs_in_state(self, state):
+        return [{"run_id": run_id, **run} for run_id, run in self.runs.items() if run["state"] == state.value]
+
+
+class FakeStorage:
+    def get_bundle_url(self, bundle_key):
+        return f"https://blob/{bundle_key}"
+
+
+class FakeTFE:
+    def __init__(self):
+        self.confirmed = []
+        self.discarded = []
+        self.plan_status = "planned"
+        self.apply_seconds = 0
+
+    async def get_workspace_id(self, name):
+        return "ws-1"
+
+    async def wait_for_run(self, run_id, targets=None):
+        if not targets:
+            await asyncio.sleep(self.apply_seconds)
+            deadline.check()
+        return "planned" if targets else "applied"
+
+    async def get_run(self, run_id):
+        return {"status": self.plan_status, "actions": {"is-confirmable": self.plan_status == "planned"}}
+
+    async def apply_run(self, run_id, comment=None):
+        self.confirmed.append(run_id)
+
+    async def discard_run(self, run_id, comment=None):
+        self.discarded.append(run_id)
+        return True
+
+    async def create_config_version(self, workspace_id):
+        return "cv-1", "https://upload"
+
+    async def upload_from_url(self, upload_url, source_url):
+        return 1
+
+    async def wait_for_configuration(self, config_version_id):
+        pass
+
+    async def create_run(self, workspace_id, config_version_id, message=None):
+        return "run-fresh"
+
+    async def get_apply_output(self, run_id):
+        return "Apply complete!"
+
+
+@pytest_asyncio.fixture
+async def services(monkeypatch):
+    with open(f"{DB_PATH}/{RUN_ID}.json", "w") as f:
+        json.dump({**RECORD, "bundle_key": "bundles/bundle.tar.gz"}, f)
+    state, github, tfe = LockingStateService(), FakeGitHubClient(), FakeTFE()
+    state.runs[RUN_ID] = {"state": RunState.PLANNED.value, "metadata": {"plan_id": "run-plan"}}
+    monkeypatch.setattr(api, "get_tfe_client", lambda **kwargs: tfe)
+    app.state.state_service, app.state.github_client, app.state.storage_service = state, github, FakeStorage()
+    yield state, github, tfe
+    await run_executor.close()
+    workspace_ids.invalidate(api.get_workspace_name(RECORD))
+    app.state.state_service = app.state.github_client = app.state.storage_service = None
+    os.remove(f"{DB_PATH}/{RUN_ID}.json")
+
+
+async def finish(run_id):
+    task = run_executor.get(run_id)
+    if task is not None:
+        await task
+
+
+@pytest.mark.asyncio
+async def test_apply_returns_202_and_finishes_in_background(services):
+    state, github, tfe = services
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post(f"/run/{RUN_ID}/apply")
+
+    assert response.status_code == 202
+    assert response.json()["status_url"] == f"/run/{RUN_ID}/status"
+    await finish(RUN_ID)
+    assert tfe.confirmed == ["run-plan"]
+    assert state.runs[RUN_ID]["state"] == RunState.APPLIED.value
+    assert github.updates[-1]["conclusion"] == "success"
+    assert state.locks == {}
+
+
+@pytest.mark.asyncio
+async def test_plan_still_queued_is_discarded_and_applied_afresh(services):
+    state, github, tfe = services
+    tfe.plan_status = "pending"
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post(f"/run/{RUN_ID}/apply", params={"wait": "true"})
+
+    assert response.status_code == 200
+    assert response.json()["tfe_run_id"] == "run-fresh"
+    assert tfe.discarded == ["run-plan"]
+    assert tfe.confirmed == []
+
+
+@pytest.mark.asyncio
+async def test_restart_resumes_checkpointed_apply_without_starting_another(services):
+    state, github, tfe = services
+    state.runs[RUN_ID] = {"state": RunState.APPLYING.value, "workspace": "porc-dev", "tfe_run_id": "run-plan",
+                          "lease_owner": "old-pod", "lease_expires_at": time.time() - 1,
+                          "metadata": {"plan_id": "run-plan", "check_run_id": 1, "tfe_run_id": "run-plan"}}
+
+    await resume_applies(object(), github, state)
+    await finish(RUN_ID)
+
+    assert tfe.confirmed == []
+    assert state.runs[RUN_ID]["state"] == RunState.APPLIED.value
+    assert github.updates[-1]["conclusion"] == "success"
+
+
+@pytest.mark.asyncio
+async def test_restart_leaves_applies_of_live_replicas_alone(services):
+    state, github, tfe = services
+    state.runs[RUN_ID] = {"state": RunState.APPLYING.value, "lease_owner": "other-replica",
+                          "lease_expires_at": time.time() + 60, "metadata": {"plan_id": "run-plan", "check_run_id": 1}}
+
+    await resume_applies(object(), github, state)
+
+    assert run_executor.get(RUN_ID) is None
+    assert state.runs[RUN_ID]["state"] == RunState.APPLYING.value
+
+
+@pytest.mark.asyncio
+async def test_apply_is_resumed_once_the_old_lease_expires_after_startup(services):
+    state, github, tfe = services
+    state.runs[RUN_ID] = {"state": RunState.APPLYING.value, "workspace": "porc-dev", "tfe_run_id": "run-plan",
+                          "lease_owner": "old-pod", "lease_expires_at": time.time() + 0.2,
+                          "metadata": {"plan_id": "run-plan", "check_run_id": 1, "tfe_run_id": "run-plan"}}
+
+    await resume_applies(object(), github, state)
+    assert run_executor.get(RUN_ID) is None
+
+    resumer = asyncio.ensure_future(keep_resuming_applies(object(), github, state, 0.05))
+    try:
+        for _ in range(100):
+            if state.runs[RUN_ID]["state"] == RunState.APPLIED.value:
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        resumer.cancel()
+    assert state.runs[RUN_ID]["state"] == RunState.APPLIED.value
+    assert tfe.confirmed == []
+
+
+@pytest.mark.asyncio
+async def test_shutdown_releases_the_leases_of_cancelled_applies(services):
+    state, github, tfe = services
+    tfe.apply_seconds = 10
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post(f"/run/{RUN_ID}/apply")
+    assert response.status_code == 202
+
+    await run_executor.close()
+
+    assert state.runs[RUN_ID]["state"] == RunState.APPLYING.value
+    assert state.take_lease(RUN_ID, "next-pod")
+
+
+@pytest.mark.asyncio
+async def test_background_apply_does_not_inherit_the_request_deadline(services):
+    state, github, tfe = services
+    tfe.apply_seconds = 0.1
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post(f"/run/{RUN_ID}/apply", headers={DEADLINE_HEADER: "0.05"})
+
+    assert response.status_code == 202
+    await finish(RUN_ID)
+    assert state.runs[RUN_ID]["state"] == RunState.APPLIED.value
+    assert state.runs[RUN_ID]["lease_owner"] == run_executor.owner
+
+
+@pytest.mark.asyncio
+async def test_restart_returns_unstarted_apply_to_planned(services):
+    state, github, tfe = services
+    state.runs[RUN_ID] = {"state": RunState.APPLYING.value, "metadata": {"plan_id": "run-plan", "check_run_id": 1}}
+
+    await resume_applies(object(), github, state)
+
+    assert run_executor.get(RUN_ID) is None
+    assert state.runs[RUN_ID]["state"] == RunState.PLANNED.value
+    assert state.runs[RUN_ID]["metadata"]["plan_id"] == "run-plan"
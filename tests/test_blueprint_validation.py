@@ -0,0 +1,30 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from porc_api import main
+from tests.fakes import SCHEMA, make_validator
+
+
+def on_event_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def test_submission_is_validated_against_the_rendered_version(monkeypatch):
+    validator = make_validator()
+    requested = []
+    # Fetching a schema blocks, so it must not run on the event loop
+    monkeypatch.setattr(validator.storage_service, "get_quill_schema",
+                        lambda kind, version: requested.append((version, on_event_loop())) or SCHEMA)
+    monkeypatch.setattr(main, "schema_validator", validator)
+
+    response = TestClient(main.app).post("/blueprint", json={
+        "kind": "gke-cluster", "schema_version": "v1", "variables": {},
+        "external_reference": "0" * 40, "source_repo": "acme/infra"})
+
+    assert response.status_code == 422
+    assert requested == [(main.RENDER_VERSION, False)]
@@ -0,0 +1,45 @@
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from porc_api.main import app
+from porc_common.config import DB_PATH
+from porc_common.errors import BackendUnavailableError
+from porc_core.state import RunState
+from tests.fakes import RECORD, RUN_ID, FakeStateService
+
+
+class UnavailableGitHubClient:
+    async def create_check_run(self, owner, repo, sha, name, run_id):
+        raise BackendUnavailableError("github", 12)
+
+
+@pytest.fixture
+def state():
+    with open(f"{DB_PATH}/{RUN_ID}.json", "w") as f:
+        json.dump(RECORD, f)
+    state = FakeStateService()
+    app.state.state_service, app.state.github_client, app.state.storage_service = state, UnavailableGitHubClient(), object()
+    yield state
+    app.state.state_service = app.state.github_client = app.state.storage_service = None
+    os.remove(f"{DB_PATH}/{RUN_ID}.json")
+
+
+def test_open_circuit_fails_plan_fast_and_keeps_run_plannable(state):
+    response = TestClient(app).post(f"/run/{RUN_ID}/plan")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "12"
+    assert response.json()["backend"] == "github"
+    assert state.runs[RUN_ID]["state"] == RunState.BUILT.value
+
+
+def test_admin_circuits_lists_and_resets_backends():
+    client = TestClient(app)
+    names = [c["name"] for c in client.get("/admin/circuits").json()["circuits"]]
+
+    assert {"blob", "github", "mongo", "tables", "tfe"} <= set(names)
+    assert client.post("/admin/circuits/tfe/reset").json()["state"] == "closed"
+    assert client.post("/admin/circuits/nope/reset").status_code == 404
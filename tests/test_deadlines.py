@@ -0,0 +1,49 @@
+import asyncio
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from porc_api.main import DEADLINE_HEADER, app
+from porc_common.config import DB_PATH
+from porc_core import deadline
+from porc_core.state import RunState
+from tests.fakes import RECORD, RUN_ID, FakeGitHubClient, FakeStateService
+
+
+class SlowGitHubClient(FakeGitHubClient):
+    async def create_check_run(self, owner, repo, sha, name, run_id):
+        await asyncio.sleep(0.2)
+        deadline.check()
+        return {"id": 1}
+
+
+@pytest.fixture
+def state():
+    with open(f"{DB_PATH}/{RUN_ID}.json", "w") as f:
+        json.dump(RECORD, f)
+    state = FakeStateService()
+    app.state.state_service, app.state.github_client, app.state.storage_service = state, SlowGitHubClient(), object()
+    yield state
+    app.state.state_service = app.state.github_client = app.state.storage_service = None
+    os.remove(f"{DB_PATH}/{RUN_ID}.json")
+
+
+def test_plan_out_of_time_records_deadline_and_stays_plannable(state):
+    response = TestClient(app).post(f"/run/{RUN_ID}/plan", headers={DEADLINE_HEADER: "0.1"})
+
+    assert response.status_code == 504
+    assert response.json()["deadline_seconds"] == 0.1
+    run = state.runs[RUN_ID]
+    assert run["state"] == RunState.BUILT.value
+    assert run["metadata"]["error_type"] == "deadline_exceeded"
+    assert run["metadata"]["deadline_seconds"] == 0.1
+    assert run["metadata"]["bundle_digest"] == RECORD["bundle_digest"]
+
+
+def test_invalid_deadline_header_is_rejected(state):
+    response = TestClient(app).post(f"/run/{RUN_ID}/plan", headers={DEADLINE_HEADER: "soon"})
+
+    assert response.status_code == 400
+    assert state.runs[RUN_ID]["state"] == RunState.BUILT.value
@@ -0,0 +1,68 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import porc_api.main as api
+from porc_api.main import app
+
+
+class FakeBackend:
+    """Stand-in for a storage, state or GitHub client that records being closed."""
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeGitHubClient(FakeBackend):
+    async def close(self):
+        self.closed = True
+
+
+def unavailable():
+    raise ValueError("not configured")
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    created = {"storage": FakeBackend(), "state": FakeBackend(), "github": FakeGitHubClient(), "resumed": []}
+
+    async def resume_applies(storage_service, github_client, state_service):
+        created["resumed"].append((storage_service, github_client, state_service))
+
+    monkeypatch.delenv("QUILL_PRELOAD", raising=False)
+    monkeypatch.setattr(api, "StorageService", lambda: created["storage"])
+    monkeypatch.setattr(api, "_connect_state_service", lambda: created["state"])
+    monkeypatch.setattr(api, "GitHubClient", lambda: created["github"])
+    monkeypatch.setattr(api, "get_tfe_client", unavailable)
+    monkeypatch.setattr(api, "resume_applies", resume_applies)
+    monkeypatch.setattr(api.quill_manager, "_storage_service", None)
+    monkeypatch.setattr(api.schema_validator, "_storage_service", None)
+    yield created
+    app.state.storage_service = app.state.state_service = app.state.github_client = None
+
+
+def test_backends_are_created_at_startup_and_closed_at_shutdown(backends):
+    with TestClient(app):
+        assert app.state.storage_service is backends["storage"]
+        assert app.state.state_service is backends["state"]
+        assert app.state.github_client is backends["github"]
+        assert api.quill_manager.storage_service is backends["storage"]
+        assert backends["resumed"] == [(backends["storage"], backends["github"], backends["state"])]
+        assert not any(backends[name].closed for name in ("storage", "state", "github"))
+
+    assert all(backends[name].closed for name in ("storage", "state", "github"))
+
+
+def test_unavailable_backends_do_not_stop_startup(backends, monkeypatch):
+    monkeypatch.setattr(api, "_connect_state_service", unavailable)
+    with TestClient(app) as client:
+        assert app.state.state_service is None
+        assert app.state.storage_service is backends["storage"]
+        # Applies cannot be resumed without every backend
+        assert backends["resumed"] == []
+        response = client.get("/run/porc-lifespan/status")
+
+    assert response.status_code == 503
+    assert response.json()["detail"] == "State service not configured"
+    assert backends["storage"].closed and backends["github"].closed
@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from porc_api.main import app, find_unchanged_apply, get_workspace_name
+from porc_common.config import DB_PATH
+from porc_core.state import RunState
+from tests.fakes import DIGEST, RECORD, RUN_ID, FakeGitHubClient, FakeStateService
+
+
+@pytest.fixture
+def services():
+    with open(f"{DB_PATH}/{RUN_ID}.json", "w") as f:
+        json.dump(RECORD, f)
+    state, github = FakeStateService(), FakeGitHubClient()
+    app.state.state_service, app.state.github_client, app.state.storage_service = state, github, object()
+    yield state, github
+    app.state.state_service = app.state.github_client = app.state.storage_service = None
+    os.remove(f"{DB_PATH}/{RUN_ID}.json")
+
+
+def test_unchanged_bundle_resolves_plan_as_no_op(services):
+    state, github = services
+    state.applied[get_workspace_name(RECORD)] = {
+        "bundle_digest": DIGEST, "run_id": "porc-earlier", "workspace": get_workspace_name(RECORD),
+        "applied_at": "2026-01-01T00:00:00"}
+
+    response = TestClient(app).post(f"/run/{RUN_ID}/plan")
+
+    assert response.status_code == 200
+    assert response.json()["no_changes"] is True
+    assert state.runs[RUN_ID]["state"] == RunState.PLANNED.value
+    assert state.runs[RUN_ID]["metadata"]["last_applied_run_id"] == "porc-earlier"
+    assert github.updates[-1]["conclusion"] == "success"
+    assert github.updates[-1]["output"]["title"] == "No Changes"
+
+    response = TestClient(app).post(f"/run/{RUN_ID}/apply")
+    assert response.json() == {"run_id": RUN_ID, "status": RunState.APPLIED.value, "no_changes": True}
+
+
+@pytest.mark.asyncio
+async def test_apply_of_another_blueprint_to_the_workspace_forces_a_plan():
+    state = FakeStateService()
+    workspace = get_workspace_name(RECORD)
+    state.applied[workspace] = {"bundle_digest": "b" * 64, "run_id": "porc-other", "workspace": workspace,
+                                "applied_at": "2026-01-02T00:00:00"}
+
+    assert await find_unchanged_apply(state, DIGEST, workspace) is None
+    state.applied[workspace]["bundle_digest"] = DIGEST
+    assert (await find_unchanged_apply(state, DIGEST, workspace))["run_id"] == "porc-other"
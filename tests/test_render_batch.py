@@ -0,0 +1,35 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import porc_api.main as api
+from porc_api.main import app
+
+ITEMS = [{"kind": "gke-cluster", "variables": {"name": "a"}}]
+
+
+@pytest.fixture
+def timeouts(monkeypatch):
+    seen = []
+
+    async def render_batch(items, executor, quill_manager, schema_validator=None, timeout=10):
+        seen.append(timeout)
+        return []
+
+    monkeypatch.setattr(api, "render_batch", render_batch)
+    monkeypatch.setattr(api, "get_render_pool", lambda: None)
+    return seen
+
+
+@pytest.mark.parametrize("timeout", [-1, 0, 0.01])
+def test_item_timeouts_too_short_to_render_are_rejected(timeouts, timeout):
+    response = TestClient(app).post("/render:batch", json={"items": ITEMS, "timeout_seconds": timeout})
+    assert response.status_code == 422
+    assert timeouts == []
+
+
+def test_item_timeouts_are_capped(timeouts, monkeypatch):
+    monkeypatch.setenv("RENDER_ITEM_MAX_TIMEOUT_SECONDS", "30")
+    client = TestClient(app)
+    assert client.post("/render:batch", json={"items": ITEMS, "timeout_seconds": 1000}).status_code == 200
+    assert client.post("/render:batch", json={"items": ITEMS, "timeout_seconds": 5}).status_code == 200
+    assert timeouts == [30, 5]
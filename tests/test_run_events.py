@@ -0,0 +1,69 @@
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+
+from porc_api.main import app
+from porc_common.config import DB_PATH
+from porc_core.run_events import run_events
+from porc_core.state import RunState
+from tests.fakes import RECORD, RUN_ID, FakeStateService
+
+
+@pytest.fixture
+def state():
+    with open(f"{DB_PATH}/{RUN_ID}.json", "w") as f:
+        json.dump(RECORD, f)
+    app.state.state_service = FakeStateService()
+    yield app.state.state_service
+    app.state.state_service = None
+    os.remove(f"{DB_PATH}/{RUN_ID}.json")
+
+
+def states(response):
+    return [json.loads(line[len("data: "):])["state"] for line in response.text.splitlines() if line.startswith("data: ")]
+
+
+@pytest.mark.asyncio
+async def test_events_stream_from_current_state_until_run_settles(state):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        request = asyncio.ensure_future(client.get(f"/run/{RUN_ID}/events"))
+        while RUN_ID not in run_events._topics or run_events._topics[RUN_ID].current is None:
+            await asyncio.sleep(0.01)
+        run_events.publish(RUN_ID, "applying", workspace="porc-dev")
+        run_events.publish(RUN_ID, "applied")
+        response = await asyncio.wait_for(request, 5)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    assert [e["state"] for e in events] == ["built", "applying", "applied"]
+    assert events[-1]["workspace"] == "porc-dev"
+    assert RUN_ID not in run_events._topics
+
+
+@pytest.mark.asyncio
+async def test_events_of_unknown_runs_are_not_found(state):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/run/porc-unknown/events")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_events_stream_closes_on_a_failed_plan(state):
+    state.runs[RUN_ID]["state"] = RunState.PLAN_FAILED.value
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await asyncio.wait_for(client.get(f"/run/{RUN_ID}/events"), 5)
+    assert states(response) == ["plan_failed"]
+    assert RUN_ID not in run_events._topics
+
+
+@pytest.mark.asyncio
+async def test_events_stream_of_a_stuck_run_is_capped(state, monkeypatch):
+    monkeypatch.setenv("RUN_EVENTS_MAX_SECONDS", "0.2")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await asyncio.wait_for(client.get(f"/run/{RUN_ID}/events"), 5)
+    assert states(response) == ["built"]
+    assert RUN_ID not in run_events._topics
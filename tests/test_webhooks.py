@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from porc_api.main import app
+from porc_core.state import RunState, pick_tfe_run_owner
+from porc_core.tfe_notifications import SIGNATURE_HEADER, sign
+
+TOKEN = "notification-secret"
+
+
+class FakeStateService:
+    """In-memory stand-in for StateService."""
+    def __init__(self):
+        self.runs = {}
+
+    async def get_state(self, run_id):
+        return dict(self.runs.get(run_id, {"state": RunState.SUBMITTED.value, "metadata": {}}))
+
+    def update_state(self, run_id, state, workspace=None, metadata=None, tfe_run_id=None):
+        run = self.runs.setdefault(run_id, {"metadata": {}})
+        run["state"] = state.value
+        if metadata:
+            run["metadata"] = metadata
+        if tfe_run_id:
+            run["tfe_run_id"] = tfe_run_id
+
+    async def find_run_by_tfe_run_id(self, tfe_run_id):
+        return pick_tfe_run_owner([(run_id, run["state"]) for run_id, run in self.runs.items()
+                                   if run.get("tfe_run_id") == tfe_run_id])
+
+
+def notify(client, tfe_run_id, run_status, token=TOKEN):
+    """Post a notification the way Terraform Cloud does."""
+    body = json.dumps({
+        "payload_version": 1,
+        "run_id": tfe_run_id,
+        "workspace_name": "porc-dev",
+        "notifications": [{"trigger": "run:completed", "run_status": run_status}],
+    }).encode()
+    return client.post("/webhooks/tfe", content=body, headers={SIGNATURE_HEADER: sign(body, token)})
+
+
+@pytest.fixture
+def state_service(monkeypatch):
+    monkeypatch.setenv("TFE_NOTIFICATION_TOKEN", TOKEN)
+    service = FakeStateService()
+    app.state.state_service = service
+    yield service
+    app.state.state_service = None
+
+
+def test_notification_drives_run_to_applied(state_service):
+    state_service.update_state("porc-1", RunState.APPLYING, metadata={"check_run_id": 7}, tfe_run_id="run-abc")
+    client = TestClient(app)
+
+    assert notify(client, "run-abc", "applying").json()["status"] == "ignored"
+    response = notify(client, "run-abc", "applied")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == RunState.APPLIED.value
+    assert state_service.runs["porc-1"]["state"] == RunState.APPLIED.value
+    assert state_service.runs["porc-1"]["metadata"]["check_run_id"] == 7
+
+
+def test_notification_advances_the_run_applying_a_shared_plan(state_service):
+    state_service.update_state("porc-1", RunState.PLANNED, tfe_run_id="run-abc")
+    state_service.update_state("porc-2", RunState.APPLYING, tfe_run_id="run-abc")
+    state_service.update_state("porc-3", RunState.PLANNED, tfe_run_id="run-abc")
+
+    response = notify(TestClient(app), "run-abc", "applied")
+
+    assert response.json()["run_id"] == "porc-2"
+    assert state_service.runs["porc-2"]["state"] == RunState.APPLIED.value
+    assert state_service.runs["porc-1"]["state"] == RunState.PLANNED.value
+
+
+def test_notification_with_bad_signature_is_rejected(state_service):
+    state_service.update_state("porc-1", RunState.APPLYING, tfe_run_id="run-abc")
+    response = notify(TestClient(app), "run-abc", "applied", token="wrong")
+    assert response.status_code == 401
+    assert state_service.runs["porc-1"]["state"] == RunState.APPLYING.value